@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmark the cloudlib HTTP client against an in-process local server.
+
+The client overhead section replays a recorded cassette so the cost of the
+client itself, URL handling, header merging and logging, is measured
+without any network time.
+
+Usage:
+    python cloudlib_http_benchmark.py [number_of_requests] [upload_mb]
+"""
+
+from __future__ import print_function
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import timeit
+
+possible_topdir = os.path.normpath(
+    os.path.join(os.path.abspath(os.getcwd()), os.pardir)
+)
+
+if os.path.exists(os.path.join(possible_topdir, 'cloudlib', '__init__.py')):
+    sys.path.insert(0, possible_topdir)
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as http_server
+    import SocketServer as socketserver
+except ImportError:
+    import http.server as http_server
+    import socketserver
+
+import requests
+
+from cloudlib import http
+from cloudlib import http_multipart
+from cloudlib import logger
+from cloudlib import utils
+
+
+class BenchHandler(http_server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    body = b'{"benchmark": true}'
+    # Object stores cap the throughput of a single connection, simulate it
+    upload_bytes_per_second = 100 * 1024 * 1024
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def do_PUT(self):
+        remaining = int(self.headers.get('Content-Length', 0))
+        start = time.time()
+        received = 0
+        while remaining:
+            data = self.rfile.read(min(remaining, 64 * 1024))
+            remaining -= len(data)
+            received += len(data)
+            delay = received / float(self.upload_bytes_per_second) - (
+                time.time() - start
+            )
+            if delay > 0:
+                time.sleep(delay)
+
+        self.send_response(201)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class BenchServer(socketserver.ThreadingMixIn, http_server.HTTPServer):
+    daemon_threads = True
+
+
+def start_server():
+    """Start a local HTTP server in a background thread.
+
+    :return: ``object``
+    """
+    server = BenchServer(('127.0.0.1', 0), BenchHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def timed(name, func, count):
+    """Run ``func`` ``count`` times and print the requests per second.
+
+    :param name: ``str``
+    :param func: ``callable``
+    :param count: ``int``
+    :return: ``float``
+    """
+    start = time.time()
+    for _ in range(count):
+        func()
+    elapsed = time.time() - start
+    rate = count / elapsed
+    print('%-32s %8d requests %8.3fs %10.1f req/s' % (
+        name, count, elapsed, rate
+    ))
+    return rate
+
+
+def bench_pooled_session(url, count):
+    """Compare one-shot module requests with the pooled MakeRequest."""
+    unpooled = timed(
+        'requests.get (new connection)',
+        lambda: requests.get(url),
+        count
+    )
+    with http.MakeRequest() as make_req:
+        pooled = timed(
+            'MakeRequest.get (pooled)',
+            lambda: make_req.get(url),
+            count
+        )
+    print('%-32s %8.2fx' % ('pooled speedup', pooled / unpooled))
+
+
+def per_call(name, func, count):
+    """Run ``func`` ``count`` times and print the time of a single call.
+
+    :param name: ``str``
+    :param func: ``callable``
+    :param count: ``int``
+    :return: ``float`` Microseconds per call.
+    """
+    elapsed = min(timeit.repeat(func, number=count, repeat=3))
+    usec = elapsed / count * 1000000
+    print('%-32s %8d calls %10.2f us/call' % (name, count, usec))
+    return usec
+
+
+def bench_client_overhead(url, count):
+    """Measure the time the client spends on a request besides the network.
+
+    The request is recorded once against the local server and then
+    replayed from the cassette, so the replayed requests only cost the
+    client code paths.
+    """
+    temp_dir = tempfile.mkdtemp()
+    cassette = os.path.join(temp_dir, 'overhead.json')
+    headers = {'X-Auth-Token': 'token', 'Accept': 'application/json'}
+    try:
+        with http.MakeRequest(config={'cassette': cassette}) as make_req:
+            make_req.get(url, headers=headers)
+
+        config = {'cassette': {'path': cassette, 'mode': 'replay'}}
+        with http.MakeRequest(config=config) as make_req:
+            per_call(
+                'parse_url',
+                lambda: http.parse_url(url),
+                count * 10
+            )
+            endpoint = http.Endpoint(url, params={'format': 'json'})
+            per_call(
+                'Endpoint.url',
+                lambda: endpoint.url('container', 'object'),
+                count * 10
+            )
+            per_call(
+                'dict_update (headers)',
+                lambda: utils.dict_update(make_req.headers.copy(), headers),
+                count * 10
+            )
+            log = logger.getLogger('cloudlib.benchmark')
+            per_call(
+                'log.debug (filtered)',
+                lambda: log.debug('GET %s', url),
+                count * 10
+            )
+            replayed = per_call(
+                'MakeRequest.get (replayed)',
+                lambda: make_req.get(url, headers=headers),
+                count
+            )
+
+        with http.MakeRequest() as make_req:
+            network = per_call(
+                'MakeRequest.get (local server)',
+                lambda: make_req.get(url, headers=headers),
+                count
+            )
+    finally:
+        shutil.rmtree(temp_dir)
+
+    print('%-32s %8.1f%%' % (
+        'client share of a local request', replayed / network * 100
+    ))
+
+
+def bench_multipart_upload(url, size_mb, part_mb=8, workers=8):
+    """Compare a single streamed PUT with a parallel multipart upload."""
+    temp_dir = tempfile.mkdtemp()
+    local_file = os.path.join(temp_dir, 'object')
+    with open(local_file, 'wb') as f:
+        for _ in range(size_mb):
+            f.write(os.urandom(1024 * 1024))
+
+    object_url = '%sv1/AUTH_bench/container/object' % url
+    try:
+        with http.MakeRequest() as make_req:
+            start = time.time()
+            make_req.upload(object_url, local_file=local_file)
+            single = time.time() - start
+
+        with http.MakeRequest(config={'pool_maxsize': workers}) as make_req:
+            start = time.time()
+            make_req.multipart_upload(
+                object_url,
+                local_file=local_file,
+                strategy=http_multipart.SwiftSLOStrategy(),
+                part_size=part_mb * 1024 * 1024,
+                workers=workers
+            )
+            multipart = time.time() - start
+    finally:
+        shutil.rmtree(temp_dir)
+
+    for name, elapsed in (('upload (single PUT)', single),
+                          ('multipart_upload (%s workers)' % workers,
+                           multipart)):
+        print('%-32s %8d MB %11.3fs %10.1f MB/s' % (
+            name, size_mb, elapsed, size_mb / elapsed
+        ))
+    print('%-32s %8.2fx' % ('multipart speedup', single / multipart))
+
+
+def main():
+    count = 1000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    upload_mb = 256
+    if len(sys.argv) > 2:
+        upload_mb = int(sys.argv[2])
+
+    server = start_server()
+    url = 'http://%s:%s/' % server.server_address
+    try:
+        bench_pooled_session(url=url, count=count)
+        bench_client_overhead(url=url, count=count)
+        bench_multipart_upload(url=url, size_mb=upload_mb)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,17 +16,26 @@
 >>> from cloudlib import http
 >>> make_req = http.MakeRequest()
 >>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+
+>>> # The request object can also be used as a context manager which will
+>>> # close all pooled connections once the block has completed.
+>>> with http.MakeRequest() as make_req:
+...     get_req = make_req.get('https://api.github.com/orgs/openstack')
 """
 
-import sys
-import urllib
+import functools
+import hashlib
+import json
+import os
+import re
+import threading
 
 
 # Added for python3 support
 try:
-    import httplib
+    import Queue as queue
 except ImportError:
-    import http.client as httplib
+    import queue
 
 # Added for python3 support
 try:
@@ -34,25 +43,82 @@ try:
 except ImportError:
     import urllib.parse as urlparse
 
+# Added for python3 support
+try:
+    from urllib import quote
+    from urllib import urlencode
+except ImportError:
+    from urllib.parse import quote
+    from urllib.parse import urlencode
+
 import requests
+from requests import adapters
 
+import cloudlib
+from cloudlib import http_adapter
+from cloudlib import http_auth
+from cloudlib import http_breaker
+from cloudlib import http_cache
+from cloudlib import http_cassette
+from cloudlib import http_dns
+from cloudlib import http_encoding
+from cloudlib import http_hedge
+from cloudlib import http_json
+from cloudlib import http_limits
+from cloudlib import http_metrics
+from cloudlib import http_multipart
+from cloudlib import http_retry
+from cloudlib import http_timeout
+from cloudlib import http_upload
 from cloudlib import logger
 from cloudlib import utils
 
 
+METHODS = ('post', 'put', 'get', 'delete', 'patch', 'option', 'head')
+CHUNK_SIZE = 64 * 1024
+URL_CACHE_SIZE = 1024
+
+_parsed_urls = utils.LRUCache(max_size=URL_CACHE_SIZE)
+_unparsed_urls = utils.LRUCache(max_size=URL_CACHE_SIZE)
+
+
+def _parse_url(url):
+    if url.startswith('//'):
+        return urlparse.urlparse(url, scheme='http')
+    elif '://' in url:
+        return urlparse.urlparse(url)
+    else:
+        # A URL without a scheme such as "example.com/v1"
+        return urlparse.urlparse('//' + url, scheme='http')
+
+
 def parse_url(url):
     """Return a clean URL. Remove the prefix for the Auth URL if Found.
 
-    :param url:
-    :return aurl:
+    Results are kept in a bounded LRU cache, the same few base URLs are
+    parsed over and over by clients making many requests.
+
+    :param url: ``str``
+    :return: ``object`` A ``ParseResult``.
     """
-    if url.startswith(('http', 'https', '//')):
-        if url.startswith('//'):
-            return urlparse.urlparse(url, scheme='http')
-        else:
-            return urlparse.urlparse(url)
-    else:
-        return urlparse.urlparse(urlparse.urljoin('http://', url))
+    parsed = _parsed_urls.get(url)
+    if parsed is None:
+        parsed = _parse_url(url)
+        _parsed_urls.set(url, parsed)
+    return parsed
+
+
+def unparse_url(parsed):
+    """Return the string form of a ``ParseResult``.
+
+    :param parsed: ``object``
+    :return: ``str``
+    """
+    url = _unparsed_urls.get(parsed)
+    if url is None:
+        url = urlparse.urlunparse(parsed)
+        _unparsed_urls.set(parsed, url)
+    return url
 
 
 def html_encode(path):
@@ -61,10 +127,117 @@ def html_encode(path):
     :param path: ``str``
     :return: ``str``
     """
-    if sys.version_info > (3, 2, 0):
-        return urllib.parse.quote(utils.ensure_string(path))
-    else:
-        return urllib.quote(utils.ensure_string(path))
+    return quote(utils.ensure_string(path))
+
+
+class Endpoint(object):
+
+    def __init__(self, base_url, params=None):
+        """A base URL which request URLs are built from without re-parsing.
+
+        The base URL is parsed once, building a URL only quotes the path
+        segments and encodes the query parameters.
+
+        :param base_url: ``str``
+        :param params: ``dict`` Query parameters added to every URL.
+        """
+        parsed = parse_url(base_url)
+        self.base_url = unparse_url(parsed)
+        self.params = dict(params or {})
+        self._root = unparse_url(parsed._replace(query='', fragment=''))
+        self._prefix = self._root.rstrip('/')
+        self._query = parsed.query
+
+    def __repr__(self):
+        return '<Endpoint [ %s ]>' % self.base_url
+
+    def __str__(self):
+        return self.base_url
+
+    def _path(self, segments):
+        if not segments:
+            return self._root
+        return self._prefix + '/' + '/'.join(
+            html_encode(str(s).lstrip('/')) for s in segments
+        )
+
+    def url(self, *segments, **params):
+        """Return the URL of ``segments`` below the base URL.
+
+        Segments are quoted, a ``/`` inside a segment is kept. Keyword
+        arguments are added to the query string after the endpoint
+        ``params``, a value of None removes a parameter.
+
+        :param segments: ``str``
+        :param params: ``dict``
+        :return: ``str``
+        """
+        url = self._path(segments)
+        if params:
+            _params = dict(self.params)
+            _params.update(params)
+        else:
+            _params = self.params
+
+        query = [self._query] if self._query else []
+        if _params:
+            query.append(urlencode(
+                [(k, v) for k, v in _params.items() if v is not None],
+                doseq=True
+            ))
+        query = '&'.join(q for q in query if q)
+        if query:
+            url += '?' + query
+        return url
+
+    def join(self, *segments, **params):
+        """Return an ``Endpoint`` for ``segments`` below the base URL.
+
+        :param segments: ``str``
+        :param params: ``dict``
+        :return: ``object``
+        """
+        url = self._path(segments)
+        if self._query:
+            url += '?' + self._query
+        _params = dict(self.params)
+        _params.update(params)
+        return Endpoint(url, params=_params)
+
+
+class BatchResult(object):
+    """The outcome of a single request made as part of a batch."""
+
+    def __init__(self, index, method, url, response=None, error=None):
+        """Store the response or the error for a batched request.
+
+        :param index: ``int`` Position of the request within the batch.
+        :param method: ``str``
+        :param url: ``str``
+        :param response: ``object``
+        :param error: ``Exception``
+        """
+        self.index = index
+        self.method = method
+        self.url = url
+        self.response = response
+        self.error = error
+
+    @property
+    def ok(self):
+        """Return True if the request completed without an error.
+
+        :return: ``bol``
+        """
+        return self.error is None
+
+    def __repr__(self):
+        return '<BatchResult %s %s %s [ %s ]>' % (
+            self.index,
+            self.method,
+            self.url,
+            self.error or getattr(self.response, 'status_code', None)
+        )
 
 
 class MakeRequest(object):
@@ -75,8 +248,83 @@ class MakeRequest(object):
         This class allows you to create custom request args and or enable
         debug mode.
 
-        Presently the ``config`` argument would only be used to enable
-        debug.
+        All requests are made through a single pooled session which keeps
+        connections alive between calls. The pool can be tuned using the
+        following ``config`` options:
+
+            * ``pool_connections`` the number of per host connection pools
+              to cache.
+
+            * ``pool_maxsize`` the maximum number of connections to keep
+              open for a single host.
+
+            * ``pool_block`` when True, block when the pool for a host is
+              full instead of opening a connection which will be discarded.
+
+            * ``keep_alive`` when False, connections will be closed after
+              every request.
+
+        GET responses can be cached and revalidated by setting ``cache`` to
+        a dictionary of ``cloudlib.http_cache.ResponseCache`` arguments.
+
+        Failed requests can be retried with backoff by setting ``retry`` to
+        a dictionary of ``cloudlib.http_retry.RetryPolicy`` arguments.
+
+        Requests can be paced by setting ``rate_limit`` and the number of in
+        flight requests to a single host can be capped by setting
+        ``max_per_host``, see ``cloudlib.http_limits.build_limiters``.
+
+        Streamed downloads and uploads can be capped to a number of bytes
+        per second by setting ``bandwidth``, see
+        ``cloudlib.http_limits.build_bandwidth``.
+
+        Requests to failing hosts can be refused immediately by setting
+        ``circuit_breaker``, see ``cloudlib.http_breaker.build_breaker``.
+
+        Identical GET requests made at the same time by several threads can
+        share a single network call by setting ``coalesce`` to True or to a
+        list of regular expressions matching the URLs to coalesce.
+
+        Name resolution results can be cached for the connections of this
+        client by setting ``dns_cache``, see
+        ``cloudlib.http_dns.build_dns_cache``.
+
+        Responses are requested compressed with every content coding the
+        transport can decode, gzip and deflate plus brotli and zstd when
+        their libraries are installed, and are decompressed as they are
+        streamed. Set ``compression`` to False to request identity
+        encoding. Request bodies of at least ``compress_requests`` bytes,
+        or ``http_encoding.MIN_COMPRESS_SIZE`` when it is True, are sent
+        gzip compressed.
+
+        Slow GET requests can be sent a second time, and the first response
+        used, by setting ``hedge``, see ``cloudlib.http_hedge.build_hedger``.
+        Streamed requests are never hedged, nor are requests to a host
+        which has no free ``max_per_host`` slot.
+
+        The transport used to send requests can be replaced by setting
+        ``transport`` to a ``requests`` adapter, or to a callable which is
+        given the default adapter and returns the one to use. Exchanges can
+        be recorded to a file and replayed without any network by setting
+        ``cassette``, see ``cloudlib.http_cassette.build_cassette``.
+
+        ``timeout`` applies to both connecting and reading, they can be set
+        apart with ``connect_timeout`` and ``read_timeout``. Setting
+        ``adaptive_timeout`` learns both timeouts for every host from the
+        latency of its requests, see
+        ``cloudlib.http_timeout.build_adaptive_timeout``.
+
+        A cached token can be added to every request by setting ``auth``,
+        see ``cloudlib.http_auth.build_auth``. Tokens are shared by every
+        client using the same credential key and are refreshed in the
+        background before they expire.
+
+        Callables listed in ``hooks``, a dictionary keyed by ``pre_request``
+        and ``post_request``, are called before every request with the
+        method, url, headers and kwargs and after every request with a
+        ``cloudlib.http_metrics.RequestTiming``. Setting ``metrics`` to True,
+        or to a shared ``cloudlib.http_metrics.LatencyAggregator``, collects
+        latency histograms per host and method in ``metrics``.
 
         :param config: ``dict``
         :param log_name: ``str`` This is used to log against an existing log
@@ -87,34 +335,231 @@ class MakeRequest(object):
         if self.config is None:
             self.config = {}
 
+        self.log_name = log_name
         self.log = logger.getLogger(log_name)
-        self.request_kwargs = {'timeout': self.config.get('timeout', 60)}
+        self.request_kwargs = {
+            'timeout': http_timeout.config_timeout(self.config)
+        }
         self.headers = {
             'User-Agent': 'cloudlib'
         }
 
+        if self.config.get('compression', True):
+            self.headers['Accept-Encoding'] = ', '.join(
+                http_encoding.urllib3_encodings()
+            )
+        else:
+            self.headers['Accept-Encoding'] = 'identity'
+
+        self.compress_requests = self.config.get('compress_requests')
+        if self.compress_requests is True:
+            self.compress_requests = http_encoding.MIN_COMPRESS_SIZE
+
         if isinstance(self.config, dict):
-            if 'headers'in self.config:
+            if 'headers' in self.config:
                 self.headers.update(self.config.get('headers'))
 
-            if self.config.get('debug', False):
-                httplib.HTTPConnection.debuglevel = 1
+        self.dns_cache = http_dns.build_dns_cache(
+            self.config, log_name=log_name
+        )
+        self.session = self._build_session()
+
+        self.cache = None
+        if self.config.get('cache') is not None:
+            self.cache = http_cache.ResponseCache(
+                log_name=log_name, **self.config['cache']
+            )
+
+        self.retry = None
+        if self.config.get('retry') is not None:
+            self.retry = http_retry.RetryPolicy(
+                log_name=log_name, **self.config['retry']
+            )
+
+        self.rate_limiter, self.host_limiter = http_limits.build_limiters(
+            self.config
+        )
+        self.bandwidth = http_limits.build_bandwidth(self.config)
+
+        self.breaker = http_breaker.build_breaker(
+            self.config, log_name=log_name
+        )
+
+        self.hedger = http_hedge.build_hedger(
+            self.config, log_name=log_name
+        )
+
+        self.single_flight = utils.SingleFlight()
+        self.coalesce_patterns = None
+        coalesce = self.config.get('coalesce')
+        if coalesce is True:
+            self.coalesce_patterns = [re.compile('')]
+        elif coalesce:
+            self.coalesce_patterns = [re.compile(p) for p in coalesce]
+
+        self.hooks = {'pre_request': [], 'post_request': []}
+        for event, funcs in self.config.get('hooks', {}).items():
+            for func in funcs:
+                self.add_hook(event, func)
+
+        self.metrics = self.config.get('metrics')
+        if self.metrics is True:
+            self.metrics = http_metrics.LatencyAggregator()
+        if self.metrics:
+            self.add_hook('post_request', self.metrics)
+
+        self.adaptive_timeout = http_timeout.build_adaptive_timeout(
+            self.config, log_name=log_name
+        )
+        if self.adaptive_timeout is not None:
+            self.add_hook('post_request', self.adaptive_timeout)
+
+        self.auth = http_auth.build_auth(self.config, log_name=log_name)
+        if self.auth is not None:
+            self.add_hook('pre_request', self.auth)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _build_session(self):
+        """Return a session with the transport mounted for http(s).
+
+        :return: ``object``
+        """
+        adapter = http_adapter.CloudlibAdapter(
+            debug=self.config.get('debug', False),
+            resolver=self.dns_cache,
+            pool_connections=self.config.get(
+                'pool_connections', adapters.DEFAULT_POOLSIZE
+            ),
+            pool_maxsize=self.config.get(
+                'pool_maxsize', adapters.DEFAULT_POOLSIZE
+            ),
+            pool_block=self.config.get(
+                'pool_block', adapters.DEFAULT_POOLBLOCK
+            )
+        )
+        transport = self.config.get('transport')
+        if isinstance(transport, adapters.BaseAdapter):
+            adapter = transport
+        elif callable(transport):
+            adapter = transport(adapter)
+
+        cassette = http_cassette.build_cassette(
+            self.config, log_name=self.log_name
+        )
+        if cassette is not None:
+            adapter = http_cassette.CassetteAdapter(cassette, adapter)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        if self.config.get('keep_alive', True) is False:
+            session.headers['Connection'] = 'close'
+
+        return session
+
+    def close(self):
+        """Close the session and all of its pooled connections."""
+        self.session.close()
+
+    def add_hook(self, event, func):
+        """Register ``func`` to be called on ``event``.
+
+        ``pre_request`` hooks are called with the method, url, headers and
+        kwargs of a request and may change the headers and kwargs in place.
+        ``post_request`` hooks are called with a
+        ``cloudlib.http_metrics.RequestTiming`` once a response, or an
+        error, has been received.
+
+        :param event: ``str``
+        :param func: ``callable``
+        """
+        if event not in self.hooks:
+            raise ValueError(
+                'Unknown hook event [ %s ], valid events are %s' % (
+                    event, sorted(self.hooks.keys())
+                )
+            )
+        self.hooks[event].append(func)
+
+    def _timing(self, method, url, host, body, kwargs, start, resp=None,
+                exp=None):
+        """Return the RequestTiming of a finished request.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param host: ``str``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :param start: ``float``
+        :param resp: ``object``
+        :param exp: ``Exception``
+        :return: ``object``
+        """
+        timing = http_metrics.RequestTiming(method, url, host)
+        timing.total = http_limits.monotonic() - start
+        timing.error = exp
+        timing.timeout = kwargs.get('timeout')
+        if isinstance(body, str) and not isinstance(body, bytes):
+            timing.bytes_sent = len(body.encode('utf-8'))
+        elif isinstance(body, bytes):
+            timing.bytes_sent = len(body)
+        elif isinstance(body, http_upload.UploadBody):
+            timing.bytes_sent = body.bytes_read
+
+        if resp is not None:
+            timing.status_code = resp.status_code
+            timings = getattr(resp, 'timings', None)
+            if isinstance(timings, dict):
+                for phase in ('dns', 'connect', 'tls', 'ttfb'):
+                    setattr(timing, phase, timings.get(phase))
+
+            if not kwargs.get('stream'):
+                timing.bytes_received = len(resp.content or b'')
+            elif resp.headers.get('Content-Length', '').isdigit():
+                timing.bytes_received = int(resp.headers['Content-Length'])
+        return timing
+
+    def _post_request(self, *args, **kwargs):
+        timing = self._timing(*args, **kwargs)
+        for hook in self.hooks['post_request']:
+            hook(timing)
 
     @staticmethod
     def _get_url(url):
         """Returns a URL string.
 
         If the ``url`` parameter is a ParsedResult from `urlparse` the full url
-        will be unparsed and made into a string. Otherwise the ``url``
-        parameter is returned as is.
+        will be unparsed and made into a string. An ``Endpoint`` is returned
+        as its URL. Otherwise the ``url`` parameter is returned as is.
 
         :param url: ``str`` || ``object``
         """
         if isinstance(url, urlparse.ParseResult):
-            return urlparse.urlunparse(url)
+            return unparse_url(url)
+        elif isinstance(url, Endpoint):
+            return url.url()
         else:
             return url
 
+    @staticmethod
+    def _session_method(method):
+        """Return the name of the session method for an HTTP ``method``.
+
+        :param method: ``str``
+        :return: ``str``
+        """
+        method = method.lower()
+        if method == 'option':
+            return 'options'
+        else:
+            return method
+
     def _report_error(self, request, exp):
         """When making the request, if an error happens, log it."""
         message = (
@@ -123,7 +568,177 @@ class MakeRequest(object):
         self.log.fatal(message)
         raise requests.RequestException(message)
 
-    def _request(self, method, url, headers=None, body=None, kwargs=None):
+    def _call(self, method, func, url, headers, body, kwargs):
+        """Call a session method once the breaker and limiters allow it.
+
+        For streamed responses the host slot is released once the response
+        headers have been received. The slot, and any half-open trial of the
+        breaker, are also given back when a ``pre_request`` hook raises.
+
+        :param method: ``str``
+        :param func: ``callable``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :return: ``object``
+        """
+        host = urlparse.urlsplit(url).netloc
+        if self.breaker is not None:
+            generation = self.breaker.before(host)
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        if self.host_limiter is not None:
+            self.host_limiter.acquire(host)
+
+        start = None
+        try:
+            for hook in self.hooks['pre_request']:
+                hook(method, url, headers, kwargs)
+
+            start = http_limits.monotonic()
+            if body is None:
+                resp = func(url, headers=headers, **kwargs)
+            else:
+                resp = func(url, data=body, headers=headers, **kwargs)
+        except Exception as exp:
+            if start is None:
+                # A hook failed and the request was never sent
+                if self.breaker is not None:
+                    self.breaker.record(host, generation=generation)
+                raise
+            if self.breaker is not None:
+                self.breaker.record(host, exp=exp, generation=generation)
+            if self.hooks['post_request']:
+                self._post_request(
+                    method, url, host, body, kwargs, start, exp=exp
+                )
+            raise
+        else:
+            if self.breaker is not None:
+                self.breaker.record(host, resp=resp, generation=generation)
+            if self.hooks['post_request']:
+                self._post_request(
+                    method, url, host, body, kwargs, start, resp=resp
+                )
+            return resp
+        finally:
+            if self.host_limiter is not None:
+                self.host_limiter.release(host)
+
+    def _send(self, method, url, headers, body, kwargs, retry=True):
+        """Send a request through the session.
+
+        If a retry policy is configured, failed attempts are retried
+        according to it. Bodies which can not be replayed, such as files or
+        generators, are never retried, a ``cloudlib.http_upload.FileBody``
+        is rewound before every retry.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :param retry: ``bol`` Apply the retry policy, False when the caller
+                              retries the request on its own.
+        :return: ``object``
+        """
+        session_method = self._session_method(method)
+        func = getattr(self.session, session_method)
+        retry = self.retry if retry else None
+        rewind = getattr(body, 'rewindable', False)
+        if body is not None and not rewind and \
+                not isinstance(body, (bytes, str, dict)):
+            retry = None
+        elif retry is not None:
+            retry.start()
+
+        attempt = 0
+        while True:
+            if attempt and rewind:
+                body.rewind()
+            try:
+                resp = self._call(
+                    method, func, url, headers, body, kwargs
+                )
+            except http_retry.RETRY_EXCEPTIONS as exp:
+                if retry is None or not retry.retry(
+                        session_method, attempt, exp=exp):
+                    raise
+            else:
+                if retry is None or not retry.retry(
+                        session_method, attempt, resp=resp):
+                    return resp
+                resp.close()
+            attempt += 1
+
+    @staticmethod
+    def _full_url(url, kwargs):
+        """Return ``url`` with any ``params`` from ``kwargs`` encoded in it.
+
+        :param url: ``str``
+        :param kwargs: ``dict``
+        :return: ``str``
+        """
+        if kwargs.get('params'):
+            return requests.Request(
+                'GET', url, params=kwargs['params']
+            ).prepare().url
+        else:
+            return url
+
+    def _compress_body(self, method, body, headers):
+        """Return ``body`` gzip compressed if ``compress_requests`` is set.
+
+        Text and bytes are compressed when they are at least
+        ``compress_requests`` long. Streamed bodies are compressed as they
+        are sent, which always uses chunked transfer encoding. Dictionaries
+        and bodies which already have a ``Content-Encoding`` are sent as
+        they are.
+
+        :param method: ``str``
+        :param body: ``object``
+        :param headers: ``dict``
+        :return: ``object``
+        """
+        if self.compress_requests is None or body is None or \
+                method.lower() not in ('post', 'put', 'patch') or \
+                'Content-Encoding' in headers:
+            return body
+
+        if isinstance(body, str) and not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        if isinstance(body, bytes):
+            if len(body) < self.compress_requests:
+                return body
+            body = http_encoding.gzip_compress(body)
+        elif isinstance(body, http_upload.UploadBody):
+            body = http_encoding.iter_gzip(body)
+        else:
+            return body
+
+        headers['Content-Encoding'] = 'gzip'
+        return body
+
+    def _coalesce(self, url, coalesce):
+        """Return True if concurrent identical GETs of ``url`` are shared.
+
+        :param url: ``str``
+        :param coalesce: ``bol`` || ``None`` Per call override.
+        :return: ``bol``
+        """
+        if coalesce is not None:
+            return coalesce
+        elif self.coalesce_patterns is None:
+            return False
+        else:
+            return any(p.search(url) for p in self.coalesce_patterns)
+
+    def _request(self, method, url, headers=None, body=None, kwargs=None,
+                 coalesce=None, retry=True):
         """Make a request.
 
         To make a request pass the ``method`` and the ``url``. Valid methods
@@ -133,25 +748,932 @@ class MakeRequest(object):
         :param headers: ``dict``
         :param body: ``object``
         :param kwargs: ``dict``
+        :param coalesce: ``bol`` Share the response of identical concurrent
+                                 GET requests, overrides the ``coalesce``
+                                 config option.
+        :param retry: ``bol`` Apply the retry policy of the client.
         """
         _kwargs = utils.dict_update(self.request_kwargs.copy(), kwargs)
         _headers = utils.dict_update(self.headers.copy(), headers)
         _url = self._get_url(url=url)
+        body = self._compress_body(method, body, _headers)
+
+        if self.adaptive_timeout is not None and \
+                not (isinstance(kwargs, dict) and 'timeout' in kwargs):
+            _kwargs['timeout'] = self.adaptive_timeout.timeout(
+                urlparse.urlsplit(_url).netloc, _kwargs['timeout']
+            )
+
+        if method.lower() == 'get' and not _kwargs.get('stream') and \
+                self._coalesce(_url, coalesce):
+            key = (
+                self._full_url(_url, _kwargs),
+                tuple(sorted(_headers.items())),
+                tuple(sorted(
+                    (k, repr(v)) for k, v in _kwargs.items() if k != 'params'
+                ))
+            )
+            resp, shared = self.single_flight.do(
+                key, self._perform, method, _url, _headers, body, _kwargs,
+                retry
+            )
+            if shared:
+                self.log.debug('Coalesced GET %s', _url)
+            return resp
+        else:
+            return self._perform(
+                method, _url, _headers, body, _kwargs, retry
+            )
+
+    def _perform(self, method, url, headers, body, kwargs, retry=True):
+        """Make a request, answering it from the cache when possible.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :param retry: ``bol``
+        """
+        cache_key = cache_entry = None
+        if self.cache is not None and method.lower() == 'get' and \
+                not kwargs.get('stream'):
+            # The auth hook sets its header after the key is built
+            cache_key = self.cache.key(
+                method,
+                self._full_url(url, kwargs),
+                headers,
+                identity=getattr(self.auth, 'key', None)
+            )
+            cache_entry = self.cache.get(cache_key)
+            if cache_entry is not None:
+                headers.update(cache_entry.conditional_headers())
 
         try:
-            func = getattr(requests, method.lower())
-            if body is None:
-                resp = func(_url, headers=_headers, **_kwargs)
+            if self.hedger is not None and method.lower() == 'get' and \
+                    not kwargs.get('stream'):
+                host = urlparse.urlsplit(url).netloc
+                ready = None
+                if self.host_limiter is not None:
+                    ready = functools.partial(
+                        self.host_limiter.available, host
+                    )
+                resp = self.hedger.run(
+                    host=host,
+                    func=lambda: self._send(
+                        method, url, headers.copy(), body, kwargs, retry
+                    ),
+                    ready=ready
+                )
             else:
-                resp = func(_url, data=body, headers=_headers, **_kwargs)
+                resp = self._send(
+                    method=method,
+                    url=url,
+                    headers=headers,
+                    body=body,
+                    kwargs=kwargs,
+                    retry=retry
+                )
             self.log.debug(
                 '%s %s %s', resp.status_code, resp.reason, resp.request
             )
         except AttributeError as exp:
             self._report_error(request=method.upper(), exp=exp)
         else:
+            if cache_key is not None:
+                resp = self.cache.update(cache_key, cache_entry, resp)
             return resp
 
+    def _batch_request(self, index, item):
+        """Make a single batched request and return a BatchResult.
+
+        :param index: ``int``
+        :param item: ``tuple`` (method, url, headers, body)
+        :return: ``object``
+        """
+        method, url, headers, body = (tuple(item) + (None, None))[:4]
+        try:
+            resp = self._request(
+                method=method, url=url, headers=headers, body=body
+            )
+        except Exception as exp:
+            return BatchResult(index, method, url, error=exp)
+        else:
+            return BatchResult(index, method, url, response=resp)
+
+    def _batch_worker(self, work_q, result_q):
+        """Process batched requests until a ``None`` sentinel is found.
+
+        :param work_q: ``Queue.Queue`` object.
+        :param result_q: ``Queue.Queue`` object.
+        """
+        while True:
+            job = work_q.get()
+            if job is None:
+                break
+            result_q.put(self._batch_request(*job))
+
+    def batch(self, requests_list, workers=None, ordered=False):
+        """Make many requests concurrently, yielding results as they finish.
+
+        Every item in ``requests_list`` is a tuple of
+        ``(method, url, headers, body)`` where ``headers`` and ``body`` are
+        optional. The requests run on a bounded pool of threads which share
+        the connection pool of this object. ``workers`` defaults to the
+        ``batch_workers`` config option, falling back to ``pool_maxsize``.
+
+        Failures do not stop the batch, they are returned as a
+        ``BatchResult`` with the ``error`` attribute set. When ``ordered`` is
+        True results are yielded in the order of ``requests_list``, otherwise
+        they are yielded as soon as they complete.
+
+        :param requests_list: ``iterable``
+        :param workers: ``int``
+        :param ordered: ``bol``
+        :yield: ``object``
+        """
+        if workers is None:
+            workers = self.config.get(
+                'batch_workers',
+                self.config.get('pool_maxsize', adapters.DEFAULT_POOLSIZE)
+            )
+
+        work_q = queue.Queue()
+        result_q = queue.Queue()
+        threads = []
+        for _ in range(workers):
+            thread = threading.Thread(
+                target=self._batch_worker, args=(work_q, result_q)
+            )
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        # Only keep a bounded number of requests queued so that large or
+        # lazy iterables are not read into memory all at once.
+        jobs = enumerate(requests_list)
+        pending = 0
+        completed = {}
+        next_index = 0
+        try:
+            for job in jobs:
+                work_q.put(job)
+                pending += 1
+                if pending >= workers * 2:
+                    break
+
+            while pending:
+                result = result_q.get()
+                pending -= 1
+                for job in jobs:
+                    work_q.put(job)
+                    pending += 1
+                    break
+
+                if ordered is False:
+                    yield result
+                else:
+                    completed[result.index] = result
+                    while next_index in completed:
+                        yield completed.pop(next_index)
+                        next_index += 1
+        finally:
+            # Drop anything not yet started if the caller stopped early.
+            while True:
+                try:
+                    work_q.get_nowait()
+                except queue.Empty:
+                    break
+
+            for _ in threads:
+                work_q.put(None)
+
+    @property
+    def _throttle(self):
+        if self.bandwidth is not None:
+            return self.bandwidth.acquire
+
+    def _iter_content(self, resp):
+        """Yield the blocks of a streamed response within the bandwidth cap.
+
+        :param resp: ``object``
+        :yield: ``bytes``
+        """
+        chunk_size = self.config.get('chunk_size', CHUNK_SIZE)
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            if chunk:
+                if self.bandwidth is not None:
+                    self.bandwidth.acquire(len(chunk))
+                yield chunk
+
+    def _check_digest(self, md5sum, digest, local_file, cleanup):
+        """Raise MD5CheckMismatch if ``md5sum`` is set and does not match.
+
+        On a mismatch all of the files in ``cleanup`` are removed.
+
+        :param md5sum: ``str``
+        :param digest: ``str``
+        :param local_file: ``str``
+        :param cleanup: ``list``
+        """
+        if md5sum is not None and md5sum != digest:
+            for path in cleanup:
+                os.remove(path)
+            msg = 'Hash comparison - CheckSumm Mis-Match "%s" != "%s" for' \
+                  ' [ %s ]' % (md5sum, digest, local_file)
+            self.log.debug(msg)
+            raise cloudlib.MD5CheckMismatch(msg)
+
+    def download(self, url, local_file, md5sum=None, headers=None,
+                 kwargs=None, hash_type='md5'):
+        """Stream a response body to a local file, hashing it as it arrives.
+
+        The body is read in ``chunk_size`` blocks, taken from the config or
+        ``CHUNK_SIZE``, and every block is written to disk and fed into the
+        hasher in the same pass, at the pace allowed by ``bandwidth``. The
+        file is written next to ``local_file`` and only moved into place
+        once complete. If ``md5sum`` is provided and does not match the
+        downloaded content the partial file is removed and
+        ``cloudlib.MD5CheckMismatch`` is raised.
+
+        :param url: ``str``
+        :param local_file: ``str``
+        :param md5sum: ``str`` Expected hex digest of the content.
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param hash_type: ``str`` Any algorithm supported by ``hashlib``.
+        :return: ``str`` Hex digest of the downloaded content.
+        """
+        _kwargs = utils.dict_update({'stream': True}, kwargs)
+        resp = self._request(
+            method='get',
+            url=url,
+            headers=headers,
+            kwargs=_kwargs
+        )
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exp:
+            resp.close()
+            self._report_error(request='GET', exp=exp)
+
+        file_hash = hashlib.new(hash_type)
+        part_file = '%s.part' % local_file
+        try:
+            with open(part_file, 'wb') as f:
+                for chunk in self._iter_content(resp):
+                    f.write(chunk)
+                    file_hash.update(chunk)
+        except Exception:
+            os.remove(part_file)
+            raise
+        finally:
+            resp.close()
+
+        digest = file_hash.hexdigest()
+        self._check_digest(md5sum, digest, local_file, [part_file])
+
+        os.rename(part_file, local_file)
+        self.log.debug(
+            'Downloaded [ %s ] to [ %s ] %s %s',
+            url, local_file, hash_type, digest
+        )
+        return digest
+
+    def upload(self, url, local_file=None, iterator=None, method='put',
+               headers=None, kwargs=None, hash_type='md5', progress=None,
+               use_mmap=False):
+        """Stream a local file, or the blocks of an iterator, to ``url``.
+
+        The body is never read into memory as a whole. A ``local_file`` is
+        read in ``chunk_size`` blocks, taken from the config or
+        ``CHUNK_SIZE``, and sent with a ``Content-Length``. An ``iterator``
+        is sent using chunked transfer encoding. Every block is hashed and
+        reported to ``progress`` as it is sent, at the pace allowed by
+        ``bandwidth``.
+
+        :param url: ``str``
+        :param local_file: ``str``
+        :param iterator: ``object`` Iterable of bytes, used when no
+                                    ``local_file`` is given.
+        :param method: ``str`` One of post, put or patch.
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param hash_type: ``str`` Any algorithm supported by ``hashlib``.
+        :param progress: ``callable`` Called with the bytes sent so far and
+                                      the total size, ``None`` if unknown.
+        :param use_mmap: ``bol`` Read ``local_file`` through a memory map.
+        :return: ``tuple`` (response, hex digest of the sent content)
+        """
+        if method.lower() not in ('post', 'put', 'patch'):
+            raise ValueError('Can not upload using [ %s ]' % method)
+
+        if local_file is not None:
+            body = http_upload.FileBody(
+                local_file,
+                chunk_size=self.config.get('chunk_size', CHUNK_SIZE),
+                use_mmap=use_mmap,
+                hash_type=hash_type,
+                progress=progress,
+                throttle=self._throttle
+            )
+        elif iterator is not None:
+            body = http_upload.IterBody(
+                iterator,
+                hash_type=hash_type,
+                progress=progress,
+                throttle=self._throttle
+            )
+        else:
+            raise ValueError('Either local_file or iterator is required')
+
+        with body:
+            resp = self._request(
+                method=method,
+                url=url,
+                headers=headers,
+                body=body,
+                kwargs=kwargs
+            )
+
+        digest = body.hexdigest()
+        self.log.debug(
+            'Uploaded %s bytes to [ %s ] %s %s',
+            body.bytes_read, url, hash_type, digest
+        )
+        return resp, digest
+
+    def _upload_part(self, url, local_file, part, strategy, context,
+                     retry, headers=None, kwargs=None, use_mmap=False,
+                     progress=None):
+        """Upload one part of a file, retrying it on its own if it fails.
+
+        The part is sent without the retry policy of the client so every
+        attempt is counted against ``retry`` alone.
+
+        :param url: ``str``
+        :param local_file: ``str``
+        :param part: ``object``
+        :param strategy: ``object``
+        :param context: ``object``
+        :param retry: ``object`` RetryPolicy used for the part.
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param use_mmap: ``bol``
+        :param progress: ``callable``
+        """
+        part_url, params = strategy.part_request(url, part, context)
+        _kwargs = utils.dict_update({'params': params}, kwargs)
+        method = strategy.part_method
+        retry.start()
+        while True:
+            part.attempts += 1
+            body = http_upload.FileBody(
+                local_file,
+                chunk_size=self.config.get('chunk_size', CHUNK_SIZE),
+                use_mmap=use_mmap,
+                progress=progress,
+                offset=part.offset,
+                length=part.size,
+                throttle=self._throttle
+            )
+            try:
+                with body:
+                    resp = self._request(
+                        method=method,
+                        url=part_url,
+                        headers=headers,
+                        body=body,
+                        kwargs=_kwargs,
+                        retry=False
+                    )
+            except http_retry.RETRY_EXCEPTIONS as exp:
+                if not retry.retry(method, part.attempts - 1, exp=exp):
+                    raise
+            else:
+                if resp.status_code < 300:
+                    part.digest = body.hexdigest()
+                    strategy.part_done(part, resp)
+                    return
+                resp.close()
+                if not retry.retry(method, part.attempts - 1, resp=resp):
+                    raise requests.HTTPError(
+                        '%s returned %s' % (part, resp.status_code)
+                    )
+
+    def multipart_upload(self, url, local_file, strategy, part_size=None,
+                         workers=None, headers=None, kwargs=None,
+                         retry=None, use_mmap=False, progress=None):
+        """Upload a large file as parts sent concurrently.
+
+        The file is split into parts of ``part_size`` bytes, taken from the
+        ``part_size`` config option or ``http_multipart.PART_SIZE``, which
+        are streamed from disk on a bounded pool of ``workers`` threads.
+        ``workers`` defaults to the ``batch_workers`` config option, falling
+        back to ``pool_maxsize``. Every part is retried on its own using a
+        ``cloudlib.http_retry.RetryPolicy`` built from ``retry``.
+
+        How parts are addressed and assembled is decided by ``strategy``, a
+        ``cloudlib.http_multipart.MultipartStrategy``. If any part fails
+        the strategy aborts the upload and a ``RequestException`` is raised.
+
+        :param url: ``str``
+        :param local_file: ``str``
+        :param strategy: ``object``
+        :param part_size: ``int``
+        :param workers: ``int``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param retry: ``dict`` RetryPolicy arguments for every part.
+        :param use_mmap: ``bol`` Read the parts through a memory map.
+        :param progress: ``callable`` Called with the bytes sent so far and
+                                      the size of the file.
+        :return: ``object`` The response of the complete call.
+        """
+        if part_size is None:
+            part_size = self.config.get(
+                'part_size', http_multipart.PART_SIZE
+            )
+        if workers is None:
+            workers = self.config.get(
+                'batch_workers',
+                self.config.get('pool_maxsize', adapters.DEFAULT_POOLSIZE)
+            )
+        part_retry = http_retry.RetryPolicy(
+            log_name=self.log_name, **(retry or {})
+        )
+
+        size = os.path.getsize(local_file)
+        parts = http_multipart.split_parts(size, part_size)
+        context = strategy.initiate(self, url, headers=headers)
+
+        lock = threading.Lock()
+        sent = {}
+
+        def part_progress(part):
+            if progress is None:
+                return None
+
+            def report(part_sent, total):
+                with lock:
+                    sent[part.number] = part_sent
+                    total_sent = sum(sent.values())
+                progress(total_sent, size)
+            return report
+
+        work_q = queue.Queue()
+        errors = []
+
+        def worker():
+            while True:
+                part = work_q.get()
+                if part is None or errors:
+                    break
+                try:
+                    self._upload_part(
+                        url=url,
+                        local_file=local_file,
+                        part=part,
+                        strategy=strategy,
+                        context=context,
+                        retry=part_retry,
+                        headers=headers,
+                        kwargs=kwargs,
+                        use_mmap=use_mmap,
+                        progress=part_progress(part)
+                    )
+                except Exception as exp:
+                    errors.append(exp)
+
+        for part in parts:
+            work_q.put(part)
+
+        threads = []
+        for _ in range(min(workers, len(parts))):
+            work_q.put(None)
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            try:
+                strategy.abort(self, url, parts, context, headers=headers)
+            except Exception as exp:
+                self.log.warn('Failed to abort upload of [ %s ] %s', url, exp)
+            self._report_error(
+                request=strategy.part_method.upper(),
+                exp='%s of %s parts failed, %s' % (
+                    len(errors), len(parts), errors[0]
+                )
+            )
+
+        resp = strategy.complete(self, url, parts, context, headers=headers)
+        self.log.debug(
+            'Uploaded [ %s ] to [ %s ] in %s parts %s',
+            local_file, url, len(parts), resp.status_code
+        )
+        return resp
+
+    @staticmethod
+    def _write_at(fd, offset, data, lock):
+        """Write ``data`` to ``fd`` at ``offset`` without moving other writers.
+
+        Uses ``os.pwrite`` when the platform has it, otherwise the seek and
+        write are serialized with ``lock``.
+
+        :param fd: ``int``
+        :param offset: ``int``
+        :param data: ``bytes``
+        :param lock: ``threading.Lock`` object.
+        """
+        view = memoryview(data)
+        while view:
+            if hasattr(os, 'pwrite'):
+                written = os.pwrite(fd, view, offset)
+            else:
+                with lock:
+                    os.lseek(fd, offset, os.SEEK_SET)
+                    written = os.write(fd, view)
+            view = view[written:]
+            offset += written
+
+    @staticmethod
+    def _load_range_state(state_file, url, size, validator):
+        """Return a saved ranged download state if it matches the object.
+
+        :param state_file: ``str``
+        :param url: ``str``
+        :param size: ``int``
+        :param validator: ``str`` ETag or Last-Modified of the object.
+        :return: ``dict`` || ``None``
+        """
+        try:
+            with open(state_file, 'r') as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if [state.get('url'), state.get('size'), state.get('validator')] \
+                == [url, size, validator]:
+            return state
+
+    @staticmethod
+    def _save_range_state(state_file, state):
+        """Atomically write the ranged download state file.
+
+        :param state_file: ``str``
+        :param state: ``dict``
+        """
+        tmp_file = '%s.tmp' % state_file
+        with open(tmp_file, 'w') as f:
+            json.dump(state, f)
+        os.rename(tmp_file, state_file)
+
+    def _fetch_segment(self, url, fd, segment, lock, headers=None,
+                       kwargs=None):
+        """Fetch one byte range of an object into its place in ``fd``.
+
+        :param url: ``str``
+        :param fd: ``int``
+        :param segment: ``list`` [first byte, last byte]
+        :param lock: ``threading.Lock`` object.
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        start, end = segment
+        _headers = utils.dict_update(
+            {'Range': 'bytes=%s-%s' % (start, end)}, headers
+        )
+        _kwargs = utils.dict_update({'stream': True}, kwargs)
+        resp = self._request(
+            method='get', url=url, headers=_headers, kwargs=_kwargs
+        )
+        try:
+            if resp.status_code != 206:
+                raise requests.HTTPError(
+                    'Range request for bytes %s-%s returned %s' % (
+                        start, end, resp.status_code
+                    )
+                )
+
+            offset = start
+            for chunk in self._iter_content(resp):
+                self._write_at(fd, offset, chunk, lock)
+                offset += len(chunk)
+
+            if offset != end + 1:
+                raise requests.ConnectionError(
+                    'Range request for bytes %s-%s ended at %s' % (
+                        start, end, offset
+                    )
+                )
+        finally:
+            resp.close()
+
+    def ranged_download(self, url, local_file, segments=4, md5sum=None,
+                        headers=None, kwargs=None, hash_type='md5',
+                        workers=None):
+        """Download an object as concurrent HTTP Range requests.
+
+        The object is split into ``segments`` byte ranges which are fetched
+        on a bounded pool of ``workers`` threads and written at their
+        offsets into a preallocated ``.part`` file. ``workers`` defaults to
+        the ``batch_workers`` config option, falling back to
+        ``pool_maxsize``. Completed segments are recorded in a ``.state``
+        sidecar file, so if the transfer is interrupted calling this method
+        again will only fetch the segments which are missing. The state is
+        discarded if the size, ETag or Last-Modified of the object changed.
+
+        If the server does not advertise ``Accept-Ranges: bytes`` or a
+        ``Content-Length`` this falls back to ``download``. Ranges are
+        requested with identity encoding because byte offsets of a
+        compressed representation can not be written into the file.
+
+        :param url: ``str``
+        :param local_file: ``str``
+        :param segments: ``int``
+        :param md5sum: ``str`` Expected hex digest of the content.
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param hash_type: ``str`` Any algorithm supported by ``hashlib``.
+        :param workers: ``int``
+        :return: ``str`` Hex digest of the downloaded content.
+        """
+        if workers is None:
+            workers = self.config.get(
+                'batch_workers',
+                self.config.get('pool_maxsize', adapters.DEFAULT_POOLSIZE)
+            )
+        _url = self._get_url(url=url)
+        range_headers = utils.dict_update(
+            dict(headers or {}), {'Accept-Encoding': 'identity'}
+        )
+        head = self._request(
+            method='head',
+            url=_url,
+            headers=range_headers,
+            kwargs=utils.dict_update({'allow_redirects': True}, kwargs)
+        )
+        size = int(head.headers.get('Content-Length', 0))
+        accept_ranges = head.headers.get('Accept-Ranges', '').lower()
+        if head.status_code != 200 or accept_ranges != 'bytes' or \
+                size == 0 or segments < 2:
+            return self.download(
+                url=_url,
+                local_file=local_file,
+                md5sum=md5sum,
+                headers=headers,
+                kwargs=kwargs,
+                hash_type=hash_type
+            )
+
+        part_file = '%s.part' % local_file
+        state_file = '%s.state' % local_file
+        validator = head.headers.get(
+            'ETag', head.headers.get('Last-Modified')
+        )
+        state = self._load_range_state(state_file, _url, size, validator)
+        if state is None or not os.path.isfile(part_file):
+            segment_size = -(-size // segments)
+            state = {
+                'url': _url,
+                'size': size,
+                'validator': validator,
+                'segments': [
+                    [start, min(start + segment_size, size) - 1]
+                    for start in range(0, size, segment_size)
+                ],
+                'done': []
+            }
+            with open(part_file, 'wb') as f:
+                f.truncate(size)
+            self._save_range_state(state_file, state)
+        else:
+            self.log.info(
+                'Resuming [ %s ] %s of %s segments complete',
+                _url, len(state['done']), len(state['segments'])
+            )
+
+        lock = threading.Lock()
+        work_q = queue.Queue()
+        errors = []
+
+        def worker():
+            while True:
+                index = work_q.get()
+                if index is None:
+                    break
+                try:
+                    self._fetch_segment(
+                        url=_url,
+                        fd=fd,
+                        segment=state['segments'][index],
+                        lock=lock,
+                        headers=range_headers,
+                        kwargs=kwargs
+                    )
+                except Exception as exp:
+                    errors.append(exp)
+                else:
+                    with lock:
+                        state['done'].append(index)
+                        self._save_range_state(state_file, state)
+
+        missing = [
+            index for index in range(len(state['segments']))
+            if index not in state['done']
+        ]
+        for index in missing:
+            work_q.put(index)
+
+        fd = os.open(part_file, os.O_RDWR)
+        try:
+            threads = []
+            for _ in range(min(workers, len(missing))):
+                work_q.put(None)
+                thread = threading.Thread(target=worker)
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+            for thread in threads:
+                thread.join()
+        finally:
+            os.close(fd)
+
+        if errors:
+            self._report_error(
+                request='GET',
+                exp='%s of %s segments failed, %s' % (
+                    len(errors), len(state['segments']), errors[0]
+                )
+            )
+
+        file_hash = hashlib.new(hash_type)
+        with open(part_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                file_hash.update(chunk)
+
+        digest = file_hash.hexdigest()
+        self._check_digest(
+            md5sum, digest, local_file, [part_file, state_file]
+        )
+
+        os.rename(part_file, local_file)
+        os.remove(state_file)
+        self.log.debug(
+            'Downloaded [ %s ] to [ %s ] in %s segments %s %s',
+            _url, local_file, len(state['segments']), hash_type, digest
+        )
+        return digest
+
+    def _fetch_page(self, url, params, items, headers=None, kwargs=None):
+        """Return a page response and the list of items found in it.
+
+        :param url: ``str``
+        :param params: ``dict``
+        :param items: ``str`` || ``callable`` || ``None``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :return: ``tuple``
+        """
+        _kwargs = utils.dict_update({'params': params}, kwargs)
+        resp = self.get(url, headers=headers, kwargs=_kwargs)
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exp:
+            self._report_error(request='GET', exp=exp)
+
+        if callable(items):
+            page_items = items(resp)
+        elif items is None:
+            page_items = http_json.loads(resp.content)
+        else:
+            page_items = http_json.loads(resp.content).get(items)
+        return resp, page_items or []
+
+    def paginate(self, url, headers=None, kwargs=None, items=None,
+                 next_page=None, marker_param=None, marker_key='id',
+                 offset_param=None, limit=None, limit_param='limit',
+                 prefetch=False):
+        """Yield the items of a list endpoint one at a time, page by page.
+
+        Pages are requested lazily as the items are consumed. ``items``
+        selects the items of a page, it can be the key holding them in the
+        JSON body, a callable which is given the response, or None when the
+        body is the list itself.
+
+        The next page is found using the first of these which applies:
+
+            * ``next_page`` a callable given the response and its items
+              which returns the URL of the next page or None.
+
+            * ``marker_param`` the query parameter set to the
+              ``marker_key`` field of the last item of the previous page.
+
+            * ``offset_param`` the query parameter set to the number of
+              items seen so far.
+
+            * The ``Link`` header of the response with ``rel="next"``.
+
+        When ``limit`` is set it is sent as ``limit_param`` and a page with
+        fewer items than ``limit`` is treated as the last page. When
+        ``prefetch`` is True the next page is fetched in a background
+        thread while the items of the current page are being consumed.
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param items: ``str`` || ``callable``
+        :param next_page: ``callable``
+        :param marker_param: ``str``
+        :param marker_key: ``str``
+        :param offset_param: ``str``
+        :param limit: ``int``
+        :param limit_param: ``str``
+        :param prefetch: ``bol``
+        :yield: ``object``
+        """
+        _kwargs = utils.dict_update({}, kwargs)
+        params = dict(_kwargs.pop('params', None) or {})
+        if limit is not None:
+            params[limit_param] = limit
+
+        def following(resp, page_items, page_url, page_params):
+            if next_page is not None:
+                next_url = next_page(resp, page_items)
+                if next_url:
+                    return next_url, {}
+                return None
+            elif marker_param or offset_param:
+                if not page_items or (limit and len(page_items) < limit):
+                    return None
+                _params = dict(page_params)
+                if marker_param:
+                    _params[marker_param] = page_items[-1][marker_key]
+                else:
+                    _params[offset_param] = int(
+                        _params.get(offset_param, 0)
+                    ) + len(page_items)
+                return page_url, _params
+            else:
+                link = resp.links.get('next', {}).get('url')
+                if link:
+                    return urlparse.urljoin(page_url, link), {}
+                return None
+
+        def fetch(page):
+            return self._fetch_page(
+                url=page[0],
+                params=page[1],
+                items=items,
+                headers=headers,
+                kwargs=_kwargs
+            )
+
+        def fetch_background(page):
+            result = {}
+
+            def run():
+                try:
+                    result['page'] = fetch(page)
+                except Exception as exp:
+                    result['error'] = exp
+
+            thread = threading.Thread(target=run)
+            thread.daemon = True
+            thread.start()
+            return thread, result
+
+        page = (self._get_url(url=url), params)
+        current = fetch(page)
+        while True:
+            resp, page_items = current
+            next_page_args = following(resp, page_items, *page)
+            pending = None
+            if prefetch and next_page_args is not None:
+                pending = fetch_background(next_page_args)
+
+            for item in page_items:
+                yield item
+
+            if next_page_args is None:
+                break
+
+            page = next_page_args
+            if pending is not None:
+                thread, result = pending
+                thread.join()
+                if 'error' in result:
+                    raise result['error']
+                current = result['page']
+            else:
+                current = fetch(page)
+
     def post(self, url, headers=None, body=None, kwargs=None):
         """Make a POST request.
 
@@ -238,7 +1760,7 @@ class MakeRequest(object):
             kwargs=kwargs
         )
 
-    def get(self, url, headers=None, kwargs=None):
+    def get(self, url, headers=None, kwargs=None, coalesce=None):
         """Make a GET request.
 
         To make a GET request pass, ``url``
@@ -246,14 +1768,78 @@ class MakeRequest(object):
         :param url: ``str``
         :param headers: ``dict``
         :param kwargs: ``dict``
+        :param coalesce: ``bol``
         """
         return self._request(
             method='get',
             url=url,
             headers=headers,
-            kwargs=kwargs
+            kwargs=kwargs,
+            coalesce=coalesce
         )
 
+    def get_json(self, url, headers=None, kwargs=None, key=None,
+                 stream=False):
+        """Make a GET request and return the decoded JSON body.
+
+        The body is decoded with orjson when it is installed. With
+        ``stream`` True the body is downloaded in ``chunk_size`` blocks and
+        an iterator is returned which yields the elements of the top level
+        array, or of the array at ``key``, as soon as each one has arrived.
+        Without ``stream``, ``key`` selects a value of the top level object.
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param key: ``str``
+        :param stream: ``bol``
+        :return: ``object``
+        """
+        if stream:
+            return self._iter_json(
+                url=url, headers=headers, kwargs=kwargs, key=key
+            )
+
+        resp = self.get(url, headers=headers, kwargs=kwargs)
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exp:
+            self._report_error(request='GET', exp=exp)
+
+        data = http_json.loads(resp.content)
+        if key is not None:
+            return data.get(key)
+        return data
+
+    def _iter_json(self, url, headers=None, kwargs=None, key=None):
+        """Yield the elements of a JSON array while the body streams in.
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        :param key: ``str``
+        :yield: ``object``
+        """
+        _kwargs = utils.dict_update({'stream': True}, kwargs)
+        resp = self._request(
+            method='get',
+            url=url,
+            headers=headers,
+            kwargs=_kwargs
+        )
+        try:
+            resp.raise_for_status()
+        except requests.HTTPError as exp:
+            resp.close()
+            self._report_error(request='GET', exp=exp)
+
+        try:
+            blocks = self._iter_content(resp)
+            for item in http_json.iter_items(blocks, key=key):
+                yield item
+        finally:
+            resp.close()
+
     def option(self, url, headers=None, kwargs=None):
         """Make a OPTION request.
 
@@ -0,0 +1,206 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Transport adapter used by ``cloudlib.http.MakeRequest``.
+
+The adapter instruments the connections it opens so the time spent on DNS
+resolution, the TCP connect and the TLS handshake of every request can be
+reported, and it keeps connection debugging local to the adapter instead of
+changing ``httplib.HTTPConnection.debuglevel`` for the whole process.
+"""
+
+import socket
+import threading
+
+from requests import adapters
+from urllib3 import connection
+from urllib3 import connectionpool
+from urllib3 import exceptions
+
+from cloudlib import http_limits
+
+
+# urllib3 < 2.0 does not have a dedicated resolution error
+NameResolutionError = getattr(
+    exceptions, 'NameResolutionError', exceptions.NewConnectionError
+)
+
+_local = threading.local()
+
+
+def system_resolver(host, port):
+    """Return the addresses of ``host`` using the system resolver.
+
+    :param host: ``str``
+    :param port: ``int``
+    :return: ``list``
+    """
+    addresses = []
+    for info in socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM):
+        address = info[4][0]
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+def resolution_error(conn, reason):
+    """Return the urllib3 exception for a failed name resolution.
+
+    :param conn: ``object``
+    :param reason: ``Exception``
+    :return: ``Exception``
+    """
+    if NameResolutionError is exceptions.NewConnectionError:
+        return NameResolutionError(conn, reason)
+    else:
+        return NameResolutionError(conn.host, conn, reason)
+
+
+def is_ip_address(host):
+    """Return True if ``host`` is an IPv4 or IPv6 address literal.
+
+    :param host: ``str``
+    :return: ``bol``
+    """
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host.strip('[]'))
+        except (socket.error, ValueError):
+            continue
+        else:
+            return True
+    else:
+        return False
+
+
+class TimedConnectionMixin(object):
+    """Record the DNS and connect time of new connections."""
+
+    resolver = staticmethod(system_resolver)
+
+    def _new_conn(self):
+        timings = getattr(_local, 'timings', None)
+        host = self._dns_host
+        if is_ip_address(host):
+            addresses = [host]
+            resolved = start = http_limits.monotonic()
+        else:
+            start = http_limits.monotonic()
+            try:
+                addresses = self.resolver(host, self.port)
+            except socket.gaierror as exp:
+                raise resolution_error(self, exp)
+            resolved = http_limits.monotonic()
+            if not addresses:
+                raise resolution_error(
+                    self, socket.gaierror('No addresses found for %s' % host)
+                )
+
+        error = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    sock = super(TimedConnectionMixin, self)._new_conn()
+                except (exceptions.NewConnectionError,
+                        exceptions.ConnectTimeoutError) as exp:
+                    error = exp
+                else:
+                    break
+            else:
+                raise error
+        finally:
+            self._dns_host = host
+
+        if timings is not None:
+            timings['dns'] += resolved - start
+            timings['connect'] += http_limits.monotonic() - resolved
+        return sock
+
+
+class TimedHTTPConnection(TimedConnectionMixin, connection.HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, connection.HTTPSConnection):
+
+    def connect(self):
+        timings = getattr(_local, 'timings', None)
+        if timings is None:
+            return super(TimedHTTPSConnection, self).connect()
+
+        # Everything which is not DNS or the TCP connect is the handshake
+        start = http_limits.monotonic()
+        before = timings['dns'] + timings['connect']
+        super(TimedHTTPSConnection, self).connect()
+        elapsed = http_limits.monotonic() - start
+        timings['tls'] += max(
+            elapsed - (timings['dns'] + timings['connect'] - before), 0
+        )
+
+
+class CloudlibAdapter(adapters.HTTPAdapter):
+
+    __attrs__ = adapters.HTTPAdapter.__attrs__ + ['debug', 'resolver']
+
+    def __init__(self, debug=False, resolver=None, **kwargs):
+        """An HTTPAdapter which reports connection timings.
+
+        Every response returned by ``send`` has a ``timings`` dictionary
+        with the seconds spent on ``dns``, ``connect``, ``tls`` and ``ttfb``,
+        the time until the response headers were received. The first three
+        are 0 when a pooled connection was reused.
+
+        :param debug: ``bol`` Print the HTTP conversation of connections
+                              opened by this adapter.
+        :param resolver: ``callable`` Called with a host and port, returns a
+                                      list of addresses to connect to.
+        """
+        self.debug = debug
+        self.resolver = resolver or system_resolver
+        super(CloudlibAdapter, self).__init__(**kwargs)
+
+    def _pool_class(self, pool_cls, connection_cls):
+        attrs = {
+            'debuglevel': 1 if self.debug else 0,
+            'resolver': staticmethod(self.resolver)
+        }
+        return type(pool_cls.__name__, (pool_cls,), {
+            'ConnectionCls': type(
+                connection_cls.__name__, (connection_cls,), attrs
+            )
+        })
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(CloudlibAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': self._pool_class(
+                connectionpool.HTTPConnectionPool, TimedHTTPConnection
+            ),
+            'https': self._pool_class(
+                connectionpool.HTTPSConnectionPool, TimedHTTPSConnection
+            )
+        }
+
+    def send(self, request, **kwargs):
+        timings = {'dns': 0.0, 'connect': 0.0, 'tls': 0.0}
+        _local.timings = timings
+        start = http_limits.monotonic()
+        try:
+            resp = super(CloudlibAdapter, self).send(request, **kwargs)
+        finally:
+            _local.timings = None
+        timings['ttfb'] = http_limits.monotonic() - start
+        resp.timings = timings
+        return resp
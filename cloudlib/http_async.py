@@ -0,0 +1,717 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> import asyncio
+>>> from cloudlib import http_async
+>>> async def main():
+...     async with http_async.AsyncMakeRequest() as make_req:
+...         return await make_req.get('https://api.github.com/orgs/openstack')
+>>> get_req = asyncio.run(main())
+
+This module requires Python 3.7 or greater.
+"""
+
+import asyncio
+import collections
+import ssl
+
+from urllib import parse as urlparse
+
+import requests
+from requests import adapters
+from requests import structures
+
+from cloudlib import http
+from cloudlib import http_breaker
+from cloudlib import http_encoding
+from cloudlib import http_json
+from cloudlib import http_limits
+from cloudlib import http_timeout
+from cloudlib import logger
+from cloudlib import utils
+
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+
+# Credentials are not sent on to another origin when redirected
+AUTH_HEADERS = ('Authorization', 'X-Auth-Token')
+
+# Describe a request body, dropped when a redirect turns it into a GET
+BODY_HEADERS = ('Content-Type', 'Content-Length', 'Transfer-Encoding')
+
+
+class AsyncResponse(object):
+    def __init__(self, method, url, status_code, reason, headers, content):
+        """A completed HTTP response read from an asyncio transport.
+
+        The attributes mirror the commonly used parts of a
+        ``requests.Response`` object.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param status_code: ``int``
+        :param reason: ``str``
+        :param headers: ``dict``
+        :param content: ``bytes``
+        """
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.request = '<Request [%s]>' % method.upper()
+        self.history = []
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
+
+    @property
+    def encoding(self):
+        content_type = self.headers.get('Content-Type', '')
+        for param in content_type.split(';')[1:]:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'charset' and value:
+                return value.strip('"\'')
+        else:
+            return 'utf-8'
+
+    def json(self):
+        """Return the response body decoded from JSON.
+
+        :return: ``object``
+        """
+        if self.encoding.lower().replace('-', '') == 'utf8':
+            return http_json.loads(self.content)
+        return http_json.loads(self.text)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(
+                '%s %s for url: %s' % (self.status_code, self.reason, self.url)
+            )
+
+
+class AsyncMakeRequest(object):
+
+    def __init__(self, config=None, log_name=__name__):
+        """Make HTTP requests from within an asyncio event loop.
+
+        This class mirrors ``cloudlib.http.MakeRequest`` and uses the same
+        ``config`` options, ``headers``, ``timeout`` and ``debug``. When
+        ``connect_timeout`` and ``read_timeout`` are set their sum bounds
+        each request.
+        Connections are kept alive and reused per host, the number of open
+        connections to a single host is limited by ``pool_maxsize``.
+
+        The ``rate_limit``, ``max_per_host`` and ``circuit_breaker`` options
+        are also supported, limiter and breaker objects can be shared with
+        ``MakeRequest`` instances running in other threads.
+
+        Compressed responses are requested and decoded as they are read
+        unless ``compression`` is False.
+
+        :param config: ``dict``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+
+        self.config = config
+        if self.config is None:
+            self.config = {}
+
+        self.log = logger.getLogger(log_name)
+        self.request_kwargs = {
+            'timeout': http_timeout.config_timeout(self.config)
+        }
+        self.headers = {
+            'User-Agent': 'cloudlib'
+        }
+        self.debug = False
+
+        if self.config.get('compression', True):
+            self.headers['Accept-Encoding'] = ', '.join(
+                http_encoding.supported_encodings()
+            )
+        else:
+            self.headers['Accept-Encoding'] = 'identity'
+
+        if isinstance(self.config, dict):
+            if 'headers' in self.config:
+                self.headers.update(self.config.get('headers'))
+
+            if self.config.get('debug', False):
+                self.debug = True
+
+        self.pool_maxsize = self.config.get(
+            'pool_maxsize', adapters.DEFAULT_POOLSIZE
+        )
+        self.keep_alive = self.config.get('keep_alive', True)
+        self._idle = collections.defaultdict(list)
+        self._limits = {}
+        self._ssl_contexts = {}
+        self.rate_limiter, self.host_limiter = http_limits.build_limiters(
+            self.config
+        )
+        self.breaker = http_breaker.build_breaker(
+            self.config, log_name=log_name
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """Close all idle pooled connections."""
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    def _report_error(self, request, exp):
+        """When making the request, if an error happens, log it."""
+        message = (
+            "Failure to perform %s due to [ %s ]" % (request, exp)
+        )
+        self.log.fatal(message)
+        raise requests.RequestException(message)
+
+    def _limit(self, key):
+        """Return the semaphore bounding open connections for a host.
+
+        :param key: ``tuple``
+        :return: ``object``
+        """
+        if key not in self._limits:
+            self._limits[key] = asyncio.Semaphore(self.pool_maxsize)
+        return self._limits[key]
+
+    async def _acquire_limits(self, host):
+        """Wait until the configured limiters allow a request to ``host``.
+
+        :param host: ``str``
+        """
+        if self.rate_limiter is not None:
+            wait = self.rate_limiter.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        if self.host_limiter is not None:
+            loop = asyncio.get_event_loop()
+            while True:
+                slot_free = loop.create_future()
+
+                def wake(future=slot_free):
+                    loop.call_soon_threadsafe(
+                        lambda: future.done() or future.set_result(None)
+                    )
+
+                if self.host_limiter.try_acquire(host, waiter=wake):
+                    return
+                await slot_free
+
+    def _ssl_context(self, verify):
+        """Return the TLS context of this client for ``verify``.
+
+        Contexts are created once since loading the CA bundle is slow and
+        blocks the event loop.
+
+        :param verify: ``bol``
+        :return: ``object``
+        """
+        verify = verify is not False
+        if verify not in self._ssl_contexts:
+            ssl_context = ssl.create_default_context()
+            if not verify:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+            self._ssl_contexts[verify] = ssl_context
+        return self._ssl_contexts[verify]
+
+    async def _connect(self, key, verify=True):
+        """Return a pooled connection for a host or open a new one.
+
+        :param key: ``tuple`` (scheme, host, port)
+        :param verify: ``bol``
+        :return: ``tuple``
+        """
+        idle = self._idle[key]
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer
+            writer.close()
+
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == 'https':
+            ssl_context = self._ssl_context(verify)
+
+        return await asyncio.open_connection(
+            host=host,
+            port=port,
+            ssl=ssl_context,
+            server_hostname=host if ssl_context else None
+        )
+
+    def _release(self, key, connection, reusable):
+        """Return a connection to the pool or close it.
+
+        :param key: ``tuple``
+        :param connection: ``tuple``
+        :param reusable: ``bol``
+        """
+        if reusable and self.keep_alive:
+            self._idle[key].append(connection)
+        else:
+            connection[1].close()
+
+    @staticmethod
+    def _encode_body(body, headers):
+        """Return the body as bytes, form encoding dictionaries.
+
+        Anything other than text, bytes or a dictionary raises TypeError.
+
+        :param body: ``object``
+        :param headers: ``dict``
+        :return: ``bytes``
+        """
+        if body is None:
+            return b''
+        elif isinstance(body, dict):
+            headers.setdefault(
+                'Content-Type', 'application/x-www-form-urlencoded'
+            )
+            body = urlparse.urlencode(body)
+
+        if isinstance(body, str):
+            return body.encode('utf-8')
+        elif isinstance(body, (bytes, bytearray, memoryview)):
+            return bytes(body)
+        else:
+            raise TypeError(
+                'Unsupported body type %s' % type(body).__name__
+            )
+
+    @staticmethod
+    async def _read_body(reader, method, status_code, headers, decoder=None):
+        """Read a response body based on its framing headers.
+
+        When a ``decoder`` is given the body is decompressed block by block
+        as it is read.
+
+        :return: ``tuple`` (body, reusable)
+        """
+        if method == 'HEAD' or status_code in (204, 304) or \
+                100 <= status_code < 200:
+            return b'', True
+
+        if decoder is None:
+            decode = None
+        else:
+            decode = decoder.decompress
+
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Consume any trailers up to the terminating blank line
+                    while (await reader.readline()) not in (b'\r\n', b''):
+                        pass
+                    if decoder is not None:
+                        chunks.append(decoder.flush())
+                    return b''.join(chunks), True
+                chunk = await reader.readexactly(size)
+                chunks.append(decode(chunk) if decode else chunk)
+                await reader.readexactly(2)
+        elif 'Content-Length' in headers:
+            length = int(headers['Content-Length'])
+            if decoder is None:
+                return await reader.readexactly(length), True
+            chunks = []
+            while length:
+                chunk = await reader.readexactly(
+                    min(length, http.CHUNK_SIZE)
+                )
+                length -= len(chunk)
+                chunks.append(decode(chunk))
+            chunks.append(decoder.flush())
+            return b''.join(chunks), True
+        else:
+            content = await reader.read()
+            if decoder is not None:
+                content = decode(content) + decoder.flush()
+            return content, False
+
+    @staticmethod
+    def _origin(url):
+        """Return the scheme, host and port a request to ``url`` goes to.
+
+        :param url: ``str``
+        :return: ``tuple``
+        """
+        parsed = urlparse.urlsplit(url)
+        scheme = parsed.scheme or 'http'
+        port = parsed.port or (443 if scheme == 'https' else 80)
+        return scheme, parsed.hostname, port
+
+    @staticmethod
+    def _drop_headers(headers, names):
+        """Return a copy of ``headers`` without any of ``names``.
+
+        :param headers: ``dict``
+        :param names: ``list``
+        :return: ``dict``
+        """
+        names = [name.lower() for name in names]
+        return dict(
+            (k, v) for k, v in headers.items() if k.lower() not in names
+        )
+
+    async def _exchange(self, method, url, headers, body, verify):
+        """Send a single request and read its response.
+
+        :return: ``object``
+        """
+        parsed = urlparse.urlsplit(url)
+        key = self._origin(url)
+
+        path = parsed.path or '/'
+        if parsed.query:
+            path = '%s?%s' % (path, parsed.query)
+
+        _headers = structures.CaseInsensitiveDict(headers)
+        payload = self._encode_body(body, _headers)
+        _headers.setdefault('Host', parsed.netloc)
+        _headers.setdefault('Accept-Encoding', 'identity')
+        if payload or method in ('POST', 'PUT', 'PATCH'):
+            _headers['Content-Length'] = str(len(payload))
+        if not self.keep_alive:
+            _headers['Connection'] = 'close'
+
+        head = ['%s %s HTTP/1.1' % (method, path)]
+        head.extend('%s: %s' % (k, v) for k, v in _headers.items())
+        raw = ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + payload
+
+        return await self._exchange_limited(
+            method, url, key, raw, payload, verify
+        )
+
+    async def _exchange_limited(self, method, url, key, raw, payload, verify):
+        """Write a prepared request on a pooled connection and read the reply.
+
+        :return: ``object``
+        """
+        async with self._limit(key):
+            connection = await self._connect(key, verify=verify)
+            reader, writer = connection
+            reusable = False
+            try:
+                writer.write(raw)
+                await writer.drain()
+
+                status_line = await reader.readline()
+                if not status_line:
+                    raise requests.ConnectionError(
+                        'Connection closed by [ %s ]' % key[1]
+                    )
+                status_parts = status_line.decode(
+                    'latin-1'
+                ).rstrip('\r\n').split(' ', 2)
+                status = int(status_parts[1])
+                reason = status_parts[2] if len(status_parts) > 2 else ''
+                if self.debug:
+                    self.log.debug('send: %r', raw[:len(raw) - len(payload)])
+                    self.log.debug('reply: %r', status_line)
+                resp_headers = structures.CaseInsensitiveDict()
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    name, value = name.strip(), value.strip()
+                    if name in resp_headers:
+                        value = '%s, %s' % (resp_headers[name], value)
+                    resp_headers[name] = value
+
+                try:
+                    decoder = http_encoding.get_decoder(
+                        resp_headers.get('Content-Encoding')
+                    )
+                except ValueError:
+                    decoder = None
+                content, reusable = await self._read_body(
+                    reader, method, status, resp_headers, decoder
+                )
+                if 'close' in resp_headers.get('Connection', '').lower():
+                    reusable = False
+            finally:
+                self._release(key, connection, reusable)
+
+        return AsyncResponse(
+            method=method,
+            url=url,
+            status_code=status,
+            reason=reason,
+            headers=resp_headers,
+            content=content
+        )
+
+    async def _send(self, method, url, headers, body, kwargs):
+        """Send a single request once the circuit breaker allows it.
+
+        The rate limit and host slot are taken before the request timeout
+        starts, time spent waiting for them locally is not counted against
+        it. Transport errors are raised as the ``requests`` exception types.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :return: ``object``
+        """
+        host = urlparse.urlsplit(url).netloc
+        if self.breaker is not None:
+            generation = self.breaker.before(host)
+
+        try:
+            await self._acquire_limits(host)
+        except BaseException:
+            # The request was never sent
+            if self.breaker is not None:
+                self.breaker.record(host, generation=generation)
+            raise
+
+        # The whole exchange is bounded by the connect and read timeouts
+        timeout = http_timeout.total_timeout(kwargs.get('timeout'))
+        try:
+            try:
+                resp = await asyncio.wait_for(
+                    self._exchange(
+                        method, url, headers, body, kwargs.get('verify', True)
+                    ),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise requests.Timeout(
+                    'Request to [ %s ] timed out after %ss' % (url, timeout)
+                )
+            except requests.RequestException:
+                raise
+            except (OSError, asyncio.IncompleteReadError) as exp:
+                raise requests.ConnectionError(exp)
+        except BaseException as exp:
+            if self.breaker is not None:
+                self.breaker.record(host, exp=exp, generation=generation)
+            raise
+        else:
+            if self.breaker is not None:
+                self.breaker.record(host, resp=resp, generation=generation)
+            return resp
+        finally:
+            if self.host_limiter is not None:
+                self.host_limiter.release(host)
+
+    async def _request(self, method, url, headers=None, body=None,
+                       kwargs=None):
+        """Make a request.
+
+        To make a request pass the ``method`` and the ``url``. Valid methods
+        are, ``['post', 'put', 'get', 'delete', 'patch', 'option', 'head']``.
+
+        The supported ``kwargs`` are ``timeout``, ``params``, ``verify`` and
+        ``allow_redirects``. The ``Authorization`` and ``X-Auth-Token``
+        headers are not sent on when a redirect changes the scheme, host or
+        port.
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        """
+        _kwargs = utils.dict_update(self.request_kwargs.copy(), kwargs)
+        _headers = utils.dict_update(self.headers.copy(), headers)
+        _url = http.MakeRequest._get_url(url=url)
+
+        if method.lower() not in http.METHODS:
+            self._report_error(
+                request=method.upper(),
+                exp='unsupported method "%s"' % method
+            )
+        _method = http.MakeRequest._session_method(method).upper()
+
+        params = _kwargs.get('params')
+        if params:
+            _url = '%s%s%s' % (
+                _url, '&' if '?' in _url else '?', urlparse.urlencode(params)
+            )
+
+        allow_redirects = _kwargs.get('allow_redirects', _method != 'HEAD')
+        history = []
+        while True:
+            resp = await self._send(_method, _url, _headers, body, _kwargs)
+
+            location = resp.headers.get('Location')
+            if not all([allow_redirects, location,
+                        resp.status_code in REDIRECT_CODES]):
+                break
+            elif len(history) >= requests.models.DEFAULT_REDIRECT_LIMIT:
+                raise requests.TooManyRedirects(
+                    'Exceeded %s redirects.' % len(history)
+                )
+
+            history.append(resp)
+            next_url = urlparse.urljoin(_url, location)
+            if self._origin(next_url) != self._origin(_url):
+                _headers = self._drop_headers(_headers, AUTH_HEADERS)
+            _url = next_url
+
+            if resp.status_code == 303 or \
+                    resp.status_code in (301, 302) and _method == 'POST':
+                _method, body = 'GET', None
+                _headers = self._drop_headers(_headers, BODY_HEADERS)
+
+        self.log.debug(
+            '%s %s %s', resp.status_code, resp.reason, resp.request
+        )
+        resp.history = history
+        return resp
+
+    async def post(self, url, headers=None, body=None, kwargs=None):
+        """Make a POST request.
+
+        To make a POST request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='post',
+            url=url,
+            headers=headers,
+            body=body,
+            kwargs=kwargs
+        )
+
+    async def head(self, url, headers=None, kwargs=None):
+        """Make a HEAD request.
+
+        To make a HEAD request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='head',
+            url=url,
+            headers=headers,
+            kwargs=kwargs
+        )
+
+    async def patch(self, url, headers=None, body=None, kwargs=None):
+        """Make a PATCH request.
+
+        To make a PATCH request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='patch',
+            url=url,
+            headers=headers,
+            body=body,
+            kwargs=kwargs
+        )
+
+    async def put(self, url, headers=None, body=None, kwargs=None):
+        """Make a PUT request.
+
+        To make a PUT request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='put',
+            url=url,
+            headers=headers,
+            body=body,
+            kwargs=kwargs
+        )
+
+    async def delete(self, url, headers=None, kwargs=None):
+        """Make a DELETE request.
+
+        To make a DELETE request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='delete',
+            url=url,
+            headers=headers,
+            kwargs=kwargs
+        )
+
+    async def get(self, url, headers=None, kwargs=None):
+        """Make a GET request.
+
+        To make a GET request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='get',
+            url=url,
+            headers=headers,
+            kwargs=kwargs
+        )
+
+    async def option(self, url, headers=None, kwargs=None):
+        """Make a OPTION request.
+
+        To make a OPTION request pass, ``url``
+
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        return await self._request(
+            method='option',
+            url=url,
+            headers=headers,
+            kwargs=kwargs
+        )
@@ -0,0 +1,353 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> def fetch():
+...     resp = http.MakeRequest().post(
+...         'https://identity.example.com/v3/tokens', body=credentials
+...     )
+...     return resp.headers['X-Subject-Token'], 3600
+>>> config = {
+...     'auth': {
+...         'fetch': fetch,
+...         'key': 'identity.example.com/admin',
+...         'cache_dir': '/var/cache/cloudlib/tokens',
+...         'header': 'X-Auth-Token',
+...         'scheme': None
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://compute.example.com/v2.1/servers')
+>>> print(make_req.auth.stats)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cloudlib import logger
+from cloudlib import utils
+
+# fcntl is not available on every platform, without it the on disk cache is
+# used without locking
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Tokens are shared by every provider of a process which uses the same key
+_tokens = utils.LRUCache(max_size=1024)
+_single_flight = utils.SingleFlight()
+
+
+class Token(object):
+    def __init__(self, value, expires, created):
+        """A cached token.
+
+        :param value: ``str``
+        :param expires: ``float`` Epoch seconds.
+        :param created: ``float`` Epoch seconds.
+        """
+        self.value = value
+        self.expires = expires
+        self.created = created
+        self.refreshing = False
+        self.next_refresh = None
+
+    def to_dict(self):
+        return {
+            'value': self.value,
+            'expires': self.expires,
+            'created': self.created
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['value'], data['expires'], data['created'])
+
+
+class TokenProvider(object):
+
+    def __init__(self, fetch, key='default', ttl=3600, refresh_ahead=0.8,
+                 refresh_backoff=30, cache_dir=None, header='Authorization',
+                 scheme='Bearer', log_name=__name__):
+        """Add a cached token to every request.
+
+        ``fetch`` is called without arguments to obtain a new token. It may
+        return the token, a tuple of (token, expires_in) or a dictionary
+        with ``access_token`` and ``expires_in`` as returned by OAuth2
+        token endpoints. Tokens without an expiry are kept ``ttl`` seconds.
+
+        Tokens are cached in memory for the process under ``key``, which
+        identifies the credential, so every provider using the same key
+        shares them. With ``cache_dir`` set they are also written to a file
+        in that directory, guarded by a file lock, so other processes reuse
+        them instead of requesting their own. Concurrent fetches of a key
+        share a single call.
+
+        A token used after ``refresh_ahead`` of its lifetime is fetched
+        again in the background while the cached token keeps being used,
+        so requests only wait on the first fetch or after a token expired.
+        When a background refresh fails the cached token is kept and the
+        refresh is not tried again for ``refresh_backoff`` seconds.
+
+        Instances are ``pre_request`` hooks of ``http.MakeRequest``.
+
+        :param fetch: ``callable``
+        :param key: ``str``
+        :param ttl: ``float``
+        :param refresh_ahead: ``float`` Between 0 and 1.
+        :param refresh_backoff: ``float``
+        :param cache_dir: ``str``
+        :param header: ``str``
+        :param scheme: ``str`` Prefix of the header value, None to send the
+                               token alone.
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.fetch = fetch
+        self.key = key
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.refresh_backoff = refresh_backoff
+        self.cache_dir = cache_dir
+        self.header = header
+        self.scheme = scheme
+        self.clock = time.time
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'disk_hits': 0,
+            'fetches': 0,
+            'refreshes': 0,
+            'errors': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the token counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    @property
+    def cache_file(self):
+        """Return the file caching the token of ``key``, if any.
+
+        :return: ``str`` || ``None``
+        """
+        if self.cache_dir is None:
+            return None
+        name = hashlib.sha256(self.key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, '%s.json' % name)
+
+    def _due(self, token, now):
+        """Return True once ``token`` should be refreshed.
+
+        :param token: ``object``
+        :param now: ``float``
+        :return: ``bol``
+        """
+        lifetime = token.expires - token.created
+        return now - token.created >= lifetime * self.refresh_ahead
+
+    def _fetch(self, now):
+        """Return a new token from ``fetch``.
+
+        :param now: ``float``
+        :return: ``object``
+        """
+        self._count('fetches')
+        result = self.fetch()
+        expires_in = self.ttl
+        if isinstance(result, dict):
+            value = result['access_token']
+            expires_in = result.get('expires_in', expires_in)
+        elif isinstance(result, tuple):
+            value, expires_in = result
+        else:
+            value = result
+        return Token(value, now + float(expires_in), now)
+
+    def _read_file(self, f):
+        try:
+            f.seek(0)
+            return Token.from_dict(json.load(f))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def _write_file(self, token):
+        """Atomically write ``token`` to the cache file.
+
+        :param token: ``object``
+        """
+        tmp_file = '%s.%s.tmp' % (self.cache_file, os.getpid())
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(token.to_dict(), f)
+        os.rename(tmp_file, self.cache_file)
+
+    def _load_shared(self, now, refreshing):
+        """Return a token from the cache file, fetching one when needed.
+
+        The lock file is held while fetching so processes sharing the
+        directory make a single fetch between them.
+
+        :param now: ``float``
+        :param refreshing: ``bol``
+        :return: ``object``
+        """
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        with open('%s.lock' % self.cache_file, 'a+') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.cache_file, 'r') as f:
+                        token = self._read_file(f)
+                except (IOError, OSError):
+                    token = None
+
+                # Another process may have refreshed the token already
+                if token is not None and token.expires > now and \
+                        not (refreshing and self._due(token, now)):
+                    self._count('disk_hits')
+                    return token
+
+                token = self._fetch(now)
+                self._write_file(token)
+                return token
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _load(self, refreshing=False):
+        """Obtain a token and cache it in memory.
+
+        A failed background refresh keeps the cached token until it
+        expires.
+
+        :param refreshing: ``bol``
+        :return: ``object``
+        """
+        now = self.clock()
+        try:
+            if self.cache_dir is not None:
+                token = self._load_shared(now, refreshing)
+            else:
+                token = self._fetch(now)
+        except Exception as exp:
+            self._count('errors')
+            if refreshing:
+                self.log.warn('Failed to refresh token [ %s ] %s',
+                              self.key, exp)
+                return None
+            raise
+        _tokens.set(self.key, token)
+        return token
+
+    def _refresh(self, token):
+        def run():
+            try:
+                refreshed, _ = _single_flight.do(self.key, self._load, True)
+            except Exception:
+                # Joined a fetch which failed, it has been reported already
+                refreshed = None
+            if refreshed is None:
+                token.next_refresh = self.clock() + self.refresh_backoff
+            token.refreshing = False
+
+        self._count('refreshes')
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _should_refresh(self, token, now):
+        with self._lock:
+            if token.refreshing or not self._due(token, now):
+                return False
+            elif token.next_refresh is not None and now < token.next_refresh:
+                return False
+            token.refreshing = True
+            return True
+
+    def token(self):
+        """Return a valid token for ``key``.
+
+        :return: ``str``
+        """
+        now = self.clock()
+        token = _tokens.get(self.key)
+        if token is not None and token.expires > now:
+            self._count('hits')
+            if self._should_refresh(token, now):
+                self._refresh(token)
+            return token.value
+
+        self._count('misses')
+        token, _ = _single_flight.do(self.key, self._load)
+        if token is None:
+            # Joined a background refresh which failed, fetch it ourselves
+            token = self._load()
+        return token.value
+
+    def invalidate(self):
+        """Forget the token of ``key``, for example after it was revoked."""
+        _tokens.pop(self.key)
+        cache_file = self.cache_file
+        if cache_file is not None and os.path.exists(cache_file):
+            os.remove(cache_file)
+
+    def __call__(self, method, url, headers, kwargs):
+        """Set the token header of a request.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param kwargs: ``dict``
+        """
+        value = self.token()
+        if self.scheme:
+            value = '%s %s' % (self.scheme, value)
+        headers[self.header] = value
+
+
+def build_auth(config, log_name=__name__):
+    """Return the token provider described by ``config``.
+
+    ``auth`` may be a ``TokenProvider`` or a dictionary of its arguments.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    auth = config.get('auth')
+    if isinstance(auth, dict):
+        auth = TokenProvider(log_name=log_name, **auth)
+    return auth or None
@@ -0,0 +1,238 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'circuit_breaker': {
+...         'failure_threshold': 5,
+...         'recovery_timeout': 30
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.breaker.states())
+"""
+
+import threading
+import time
+
+import requests
+
+from cloudlib import http_retry
+from cloudlib import logger
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+FAILURE_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised when a request is refused because its circuit is open."""
+    pass
+
+
+class Circuit(object):
+    def __init__(self):
+        """The state of the circuit for a single host."""
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trials = 0
+        self.rejected = 0
+        self.generation = 0
+
+    def as_dict(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'opened_at': self.opened_at,
+            'rejected': self.rejected
+        }
+
+
+class CircuitBreaker(object):
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30,
+                 half_open_max=1, failure_statuses=FAILURE_STATUSES,
+                 log_name=__name__):
+        """Stop sending requests to hosts which keep failing.
+
+        Every host starts ``closed``. After ``failure_threshold``
+        consecutive failures, connection errors, timeouts or a status in
+        ``failure_statuses``, the circuit is ``open`` and requests to the
+        host raise ``CircuitOpenError`` without touching the network. Once
+        ``recovery_timeout`` seconds have passed the circuit is
+        ``half-open`` and up to ``half_open_max`` trial requests are let
+        through, a success closes the circuit and a failure opens it again.
+        Outcomes of requests let through before the circuit last changed
+        state are ignored until it is closed again, so a slow request sent
+        while it was closed can not close an open circuit.
+
+        :param failure_threshold: ``int``
+        :param recovery_timeout: ``float``
+        :param half_open_max: ``int``
+        :param failure_statuses: ``list``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max = half_open_max
+        self.failure_statuses = failure_statuses
+        self.clock = time.time
+
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, host):
+        if host not in self._circuits:
+            self._circuits[host] = Circuit()
+        return self._circuits[host]
+
+    def state(self, host):
+        """Return the state of the circuit for ``host``.
+
+        :param host: ``str``
+        :return: ``str``
+        """
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return CLOSED
+            elif circuit.state == OPEN and self._recovered(circuit):
+                return HALF_OPEN
+            else:
+                return circuit.state
+
+    def states(self):
+        """Return the circuit details of every known host.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return dict(
+                (host, circuit.as_dict())
+                for host, circuit in self._circuits.items()
+            )
+
+    def _recovered(self, circuit):
+        return self.clock() - circuit.opened_at >= self.recovery_timeout
+
+    def before(self, host):
+        """Raise CircuitOpenError if a request to ``host`` is not allowed.
+
+        :param host: ``str``
+        :return: ``int`` Generation of the circuit, passed to ``record``.
+        """
+        with self._lock:
+            circuit = self._circuit(host)
+            if circuit.state == OPEN and self._recovered(circuit):
+                circuit.state = HALF_OPEN
+                circuit.trials = 0
+                circuit.generation += 1
+                self.log.info('Circuit for [ %s ] is half-open', host)
+
+            if circuit.state == CLOSED:
+                return circuit.generation
+            elif circuit.state == HALF_OPEN and \
+                    circuit.trials < self.half_open_max:
+                circuit.trials += 1
+                return circuit.generation
+
+            circuit.rejected += 1
+        raise CircuitOpenError(
+            'Circuit for [ %s ] is %s after %s failures' % (
+                host, circuit.state, circuit.failures
+            )
+        )
+
+    def _open(self, host, circuit):
+        circuit.state = OPEN
+        circuit.opened_at = self.clock()
+        circuit.generation += 1
+        self.log.warn(
+            'Circuit for [ %s ] is open after %s failures',
+            host, circuit.failures
+        )
+
+    def record(self, host, resp=None, exp=None, generation=None):
+        """Record the outcome of a request allowed by ``before``.
+
+        Without ``resp`` or ``exp`` the request was never sent, the outcome
+        is neutral and only a half-open trial is given back. Outcomes from
+        an earlier ``generation`` than the current one are ignored unless
+        the circuit is closed.
+
+        :param host: ``str``
+        :param resp: ``object``
+        :param exp: ``Exception``
+        :param generation: ``int`` As returned by ``before``, defaults to
+                                   the current generation.
+        """
+        if exp is not None:
+            failed = isinstance(exp, http_retry.RETRY_EXCEPTIONS)
+            neutral = not failed
+        elif resp is None:
+            failed = False
+            neutral = True
+        else:
+            failed = resp.status_code in self.failure_statuses
+            neutral = False
+
+        with self._lock:
+            circuit = self._circuit(host)
+            if generation is not None and \
+                    generation != circuit.generation and \
+                    circuit.state != CLOSED:
+                return
+            elif circuit.state == HALF_OPEN:
+                circuit.trials = max(circuit.trials - 1, 0)
+
+            if neutral:
+                return
+            elif failed:
+                circuit.failures += 1
+                if circuit.state == HALF_OPEN:
+                    self._open(host, circuit)
+                elif circuit.state == CLOSED and \
+                        circuit.failures >= self.failure_threshold:
+                    self._open(host, circuit)
+            else:
+                if circuit.state != CLOSED:
+                    circuit.generation += 1
+                    self.log.info('Circuit for [ %s ] is closed', host)
+                circuit.state = CLOSED
+                circuit.failures = 0
+                circuit.opened_at = None
+
+
+def build_breaker(config, log_name=__name__):
+    """Return the circuit breaker described by ``config``.
+
+    ``circuit_breaker`` may be a ``CircuitBreaker`` or a dictionary of its
+    arguments.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    breaker = config.get('circuit_breaker')
+    if isinstance(breaker, dict):
+        breaker = CircuitBreaker(log_name=log_name, **breaker)
+    return breaker
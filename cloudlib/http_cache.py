@@ -0,0 +1,373 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'cache': {
+...         'memory_max_bytes': 64 * 1024 * 1024,
+...         'cache_dir': '/var/cache/myapp/http',
+...         'disk_max_bytes': 1024 * 1024 * 1024,
+...         'vary_headers': ['Accept', 'Authorization']
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.cache.stats)
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests import structures
+
+from cloudlib import logger
+from cloudlib import utils
+
+
+VARY_HEADERS = ('Accept', 'Accept-Encoding', 'Authorization')
+
+# The stored content is already decoded, these would describe the encoded
+# body which was received.
+ENCODING_HEADERS = ('Content-Encoding', 'Content-Length', 'Transfer-Encoding')
+
+
+class CacheEntry(object):
+    def __init__(self, url, status_code, reason, headers, content):
+        """A stored response which can be revalidated.
+
+        :param url: ``str``
+        :param status_code: ``int``
+        :param reason: ``str``
+        :param headers: ``dict``
+        :param content: ``bytes``
+        """
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = structures.CaseInsensitiveDict(headers)
+        self.content = content
+
+    def __len__(self):
+        return len(self.content)
+
+    @classmethod
+    def from_response(cls, resp):
+        """Return an entry built from a ``requests.Response``.
+
+        :param resp: ``object``
+        :return: ``object``
+        """
+        headers = structures.CaseInsensitiveDict(resp.headers)
+        for header in ENCODING_HEADERS:
+            headers.pop(header, None)
+        return cls(
+            url=resp.url,
+            status_code=resp.status_code,
+            reason=resp.reason,
+            headers=dict(headers),
+            content=resp.content
+        )
+
+    @classmethod
+    def load(cls, data):
+        """Return an entry from the bytes written by ``dump``.
+
+        :param data: ``bytes``
+        :return: ``object``
+        """
+        meta, content = data.split(b'\n', 1)
+        return cls(content=content, **json.loads(meta.decode('utf-8')))
+
+    def dump(self):
+        """Return the entry serialized as bytes.
+
+        :return: ``bytes``
+        """
+        meta = json.dumps({
+            'url': self.url,
+            'status_code': self.status_code,
+            'reason': self.reason,
+            'headers': dict(self.headers)
+        })
+        return meta.encode('utf-8') + b'\n' + self.content
+
+    def conditional_headers(self):
+        """Return the headers used to revalidate this entry.
+
+        :return: ``dict``
+        """
+        headers = {}
+        if 'ETag' in self.headers:
+            headers['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            headers['If-Modified-Since'] = self.headers['Last-Modified']
+        return headers
+
+    def to_response(self, not_modified=None):
+        """Return the entry as a ``requests.Response``.
+
+        :param not_modified: ``object`` The 304 response which revalidated
+                                        this entry, its headers are merged
+                                        over the stored headers.
+        :return: ``object``
+        """
+        resp = requests.Response()
+        resp.url = self.url
+        resp.status_code = self.status_code
+        resp.reason = self.reason
+        resp.headers = structures.CaseInsensitiveDict(self.headers)
+        resp._content = self.content
+        if not_modified is not None:
+            resp.headers.update(not_modified.headers)
+            resp.request = not_modified.request
+            resp.elapsed = not_modified.elapsed
+            # 304 replies do not carry a body so drop the framing headers
+            # which would describe one.
+            resp.headers.pop('Content-Length', None)
+            resp.headers.pop('Transfer-Encoding', None)
+        resp.encoding = requests.utils.get_encoding_from_headers(resp.headers)
+        return resp
+
+
+class DiskCache(object):
+    def __init__(self, cache_dir, max_bytes):
+        """Store cache entries as files bounded by their total size.
+
+        Entries already found in ``cache_dir`` are loaded into the index,
+        oldest first, so that the size bound is honored across restarts.
+
+        :param cache_dir: ``str``
+        :param max_bytes: ``int``
+        """
+        self.cache_dir = cache_dir
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        self.index = utils.LRUCache(max_size=max_bytes, size_func=int)
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp'):
+                os.remove(path)
+            else:
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._evict(self.index.set(name, size))
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _evict(self, evicted):
+        for name, _ in evicted:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def get(self, name):
+        """Return the stored entry or None.
+
+        :param name: ``str``
+        :return: ``object``
+        """
+        if self.index.get(name) is None:
+            return None
+
+        try:
+            with open(self._path(name), 'rb') as f:
+                return CacheEntry.load(f.read())
+        except (IOError, OSError, ValueError):
+            self.index.pop(name)
+            return None
+
+    def set(self, name, entry):
+        """Write an entry to disk, evicting old entries as needed.
+
+        :param name: ``str``
+        :param entry: ``object``
+        :return: ``int`` Number of evicted entries.
+        """
+        data = entry.dump()
+        tmp_file = '%s.%s.tmp' % (
+            self._path(name), threading.current_thread().ident
+        )
+        with open(tmp_file, 'wb') as f:
+            f.write(data)
+        os.rename(tmp_file, self._path(name))
+
+        evicted = self.index.set(name, len(data))
+        if name not in self.index:
+            evicted.append((name, len(data)))
+        self._evict(evicted)
+        return len(evicted)
+
+
+class ResponseCache(object):
+
+    def __init__(self, memory_max_bytes=64 * 1024 * 1024, cache_dir=None,
+                 disk_max_bytes=1024 * 1024 * 1024, vary_headers=None,
+                 log_name=__name__):
+        """Cache GET responses and revalidate them with conditional requests.
+
+        Responses carrying an ``ETag`` or ``Last-Modified`` header are
+        stored in an in memory LRU tier bounded by ``memory_max_bytes`` and,
+        when ``cache_dir`` is set, in an on disk tier bounded by
+        ``disk_max_bytes``. Stored responses are revalidated using
+        ``If-None-Match`` and ``If-Modified-Since`` and the stored body is
+        served when the server replies with ``304 Not Modified``.
+
+        Entries are keyed on the method, the URL, the value of every
+        request header listed in ``vary_headers`` and the identity of the
+        credential used by the client, if any.
+
+        :param memory_max_bytes: ``int``
+        :param cache_dir: ``str``
+        :param disk_max_bytes: ``int``
+        :param vary_headers: ``list``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.memory = utils.LRUCache(max_size=memory_max_bytes, size_func=len)
+        if cache_dir is not None:
+            self.disk = DiskCache(
+                cache_dir=cache_dir, max_bytes=disk_max_bytes
+            )
+        else:
+            self.disk = None
+
+        if vary_headers is None:
+            vary_headers = VARY_HEADERS
+        self.vary_headers = vary_headers
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'stores': 0,
+            'disk_evictions': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the cache counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            stats = self._stats.copy()
+        stats['memory_evictions'] = self.memory.evictions
+        stats['memory_bytes'] = self.memory.size
+        return stats
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def key(self, method, url, headers=None, identity=None):
+        """Return the cache key for a request.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param headers: ``dict``
+        :param identity: ``str`` Credential the request is sent with, for
+                                 headers added after the key is built.
+        :return: ``str``
+        """
+        _headers = structures.CaseInsensitiveDict(headers or {})
+        parts = [method.upper(), url]
+        parts.extend(
+            '%s=%s' % (h.lower(), _headers.get(h, ''))
+            for h in self.vary_headers
+        )
+        if identity is not None:
+            parts.append('identity=%s' % identity)
+        return hashlib.sha256(
+            '\n'.join(parts).encode('utf-8')
+        ).hexdigest()
+
+    def get(self, key):
+        """Return the stored entry for ``key`` or None.
+
+        :param key: ``str``
+        :return: ``object``
+        """
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count('memory_hits')
+            return entry
+        elif self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._count('disk_hits')
+                self.memory.set(key, entry)
+                return entry
+
+    def set(self, key, entry):
+        """Store ``entry`` in every cache tier.
+
+        :param key: ``str``
+        :param entry: ``object``
+        """
+        self._count('stores')
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self._count('disk_evictions', self.disk.set(key, entry))
+
+    @staticmethod
+    def cacheable(resp):
+        """Return True if a response can be stored and revalidated.
+
+        :param resp: ``object``
+        :return: ``bol``
+        """
+        cache_control = resp.headers.get('Cache-Control', '').lower()
+        return all([
+            resp.status_code == 200,
+            'no-store' not in cache_control,
+            'ETag' in resp.headers or 'Last-Modified' in resp.headers
+        ])
+
+    def update(self, key, entry, resp):
+        """Return the response to hand back to the caller.
+
+        A ``304`` reply for a stored ``entry`` is answered from the cache,
+        any other cacheable reply is stored.
+
+        :param key: ``str``
+        :param entry: ``object`` The entry which was revalidated, or None.
+        :param resp: ``object``
+        :return: ``object``
+        """
+        if resp.status_code == 304 and entry is not None:
+            self._count('hits')
+            self.log.debug('Cache hit for [ %s ]', entry.url)
+            return entry.to_response(not_modified=resp)
+
+        self._count('misses')
+        if self.cacheable(resp):
+            self.set(key, CacheEntry.from_response(resp))
+        return resp
+
+    def clear(self):
+        """Remove every entry from the memory tier."""
+        self.memory.clear()
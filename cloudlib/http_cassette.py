@@ -0,0 +1,353 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> # The first run records the exchanges, later runs replay them without
+>>> # touching the network.
+>>> config = {'cassette': 'fixtures/github.json.gz'}
+>>> with http.MakeRequest(config=config) as make_req:
+...     get_req = make_req.get('https://api.github.com/orgs/openstack')
+
+>>> # Fail on any request which was not recorded.
+>>> config = {
+...     'cassette': {'path': 'fixtures/github.json.gz', 'mode': 'replay'}
+... }
+"""
+
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+
+import requests
+from requests import adapters
+from urllib3 import response as urllib3_response
+
+from cloudlib import logger
+
+
+MODES = ('once', 'record', 'replay', 'append')
+VERSION = 1
+
+
+class CassetteMiss(requests.RequestException):
+    """Raised when a request is not found in a cassette being replayed."""
+
+
+def body_digest(body):
+    """Return the sha1 of a request body, None for streamed bodies.
+
+    :param body: ``object``
+    :return: ``str`` || ``None``
+    """
+    if body is None:
+        body = b''
+    elif isinstance(body, str) and not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        return None
+    return hashlib.sha1(body).hexdigest()
+
+
+def encode_body(body):
+    """Return a JSON friendly form of ``body``.
+
+    :param body: ``bytes``
+    :return: ``dict``
+    """
+    try:
+        return {'text': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'base64': base64.b64encode(body).decode('ascii')}
+
+
+def decode_body(data):
+    """Return the bytes stored by ``encode_body``.
+
+    :param data: ``dict``
+    :return: ``bytes``
+    """
+    if 'base64' in data:
+        return base64.b64decode(data['base64'])
+    return data['text'].encode('utf-8')
+
+
+class Cassette(object):
+
+    def __init__(self, path, mode='once', match_body=False,
+                 log_name=__name__):
+        """A file of recorded HTTP exchanges.
+
+        Requests are matched on their method and full URL, and on the
+        digest of their body when ``match_body`` is True. Identical
+        requests are replayed in the order they were recorded, the last
+        recording being repeated once the others have been used. Request
+        headers are never written so credentials do not end up on disk.
+
+        ``mode`` is one of:
+
+            * ``once`` replay when ``path`` exists, otherwise record.
+
+            * ``record`` always use the network and overwrite ``path``.
+
+            * ``replay`` never use the network, requests which were not
+              recorded raise ``CassetteMiss``.
+
+            * ``append`` replay what was recorded and record the rest.
+
+        Cassettes whose path ends with ``.gz`` are gzip compressed.
+
+        :param path: ``str``
+        :param mode: ``str``
+        :param match_body: ``bol``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        if mode not in MODES:
+            raise ValueError(
+                'Unknown cassette mode [ %s ], valid modes are %s' % (
+                    mode, list(MODES)
+                )
+            )
+
+        self.log = logger.getLogger(log_name)
+        self.path = path
+        self.match_body = match_body
+        if mode == 'once':
+            mode = 'replay' if os.path.exists(path) else 'record'
+        self.mode = mode
+
+        self.interactions = []
+        self._played = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stats = {'played': 0, 'recorded': 0, 'misses': 0}
+        if self.mode != 'record' and os.path.exists(path):
+            self.load()
+
+    @property
+    def stats(self):
+        """Return a copy of the cassette counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            stats = self._stats.copy()
+        stats['interactions'] = len(self.interactions)
+        return stats
+
+    @property
+    def recording(self):
+        return self.mode in ('record', 'append')
+
+    def _open(self, mode):
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, mode)
+        return open(self.path, mode)
+
+    def load(self):
+        """Read the interactions stored in ``path``."""
+        with self._open('rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        with self._lock:
+            self.interactions = data['interactions']
+            self._played = {}
+
+    def save(self):
+        """Write the interactions to ``path`` if new ones were recorded."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.dumps(
+                {'version': VERSION, 'interactions': self.interactions},
+                separators=(',', ':')
+            )
+            self._dirty = False
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with self._open('wb') as f:
+            f.write(data.encode('utf-8'))
+        self.log.debug(
+            'Saved %s interactions to [ %s ]',
+            len(self.interactions), self.path
+        )
+
+    def key(self, request):
+        """Return the values a recorded request is matched on.
+
+        :param request: ``object`` A ``requests.PreparedRequest``.
+        :return: ``dict``
+        """
+        key = {'method': request.method, 'url': request.url}
+        if self.match_body:
+            key['body'] = body_digest(request.body)
+        return key
+
+    def play(self, request):
+        """Return the recorded response to ``request``.
+
+        :param request: ``object`` A ``requests.PreparedRequest``.
+        :return: ``dict`` || ``None``
+        """
+        key = self.key(request)
+        with self._lock:
+            found = [
+                i for i in self.interactions
+                if all(i['request'].get(k) == v for k, v in key.items())
+            ]
+            if not found:
+                self._stats['misses'] += 1
+                return None
+
+            name = json.dumps(key, sort_keys=True)
+            index = min(self._played.get(name, 0), len(found) - 1)
+            self._played[name] = index + 1
+            self._stats['played'] += 1
+            return found[index]['response']
+
+    def record(self, request, response):
+        """Store the response to ``request``.
+
+        :param request: ``object`` A ``requests.PreparedRequest``.
+        :param response: ``dict``
+        """
+        request_data = {'method': request.method, 'url': request.url}
+        request_data['body'] = body_digest(request.body)
+        with self._lock:
+            self.interactions.append(
+                {'request': request_data, 'response': response}
+            )
+            self._stats['recorded'] += 1
+            self._dirty = True
+
+
+class CassetteAdapter(adapters.BaseAdapter):
+
+    def __init__(self, cassette, adapter=None):
+        """A transport answering requests from a ``Cassette``.
+
+        Requests which are not replayed are sent through ``adapter`` and,
+        when the cassette is recording, their response is stored. The
+        cassette is saved when the adapter is closed.
+
+        :param cassette: ``object``
+        :param adapter: ``object`` The transport used to reach the network.
+        """
+        super(CassetteAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter or adapters.HTTPAdapter()
+
+    def _build_response(self, request, data):
+        """Return a ``requests.Response`` for a recorded response.
+
+        :param request: ``object``
+        :param data: ``dict``
+        :return: ``object``
+        """
+        raw = urllib3_response.HTTPResponse(
+            body=io.BytesIO(decode_body(data['body'])),
+            headers=data['headers'],
+            status=data['status_code'],
+            reason=data['reason'],
+            preload_content=False,
+            decode_content=True,
+            request_method=request.method
+        )
+        resp = self.adapter.build_response(request, raw)
+        resp.timings = {'dns': 0.0, 'connect': 0.0, 'tls': 0.0, 'ttfb': 0.0}
+        return resp
+
+    def _record(self, request, **kwargs):
+        """Send ``request`` and store its response.
+
+        The body is stored as it was received, still content encoded, and
+        the response handed back is built from what was stored so replays
+        behave the same way.
+
+        :param request: ``object``
+        :return: ``object``
+        """
+        resp = self.adapter.send(request, **kwargs)
+        try:
+            body = resp.raw.read(decode_content=False)
+        except Exception:
+            resp.close()
+            raise
+        resp.raw.release_conn()
+
+        headers = [
+            [name, value] for name, value in resp.raw.headers.items()
+            if name.lower() not in ('transfer-encoding', 'content-length')
+        ]
+        if request.method != 'HEAD':
+            headers.append(['Content-Length', str(len(body))])
+        elif 'Content-Length' in resp.headers:
+            headers.append(['Content-Length', resp.headers['Content-Length']])
+
+        data = {
+            'status_code': resp.status_code,
+            'reason': resp.reason,
+            'headers': headers,
+            'body': encode_body(body)
+        }
+        self.cassette.record(request, data)
+        replay = self._build_response(request, data)
+        replay.timings = getattr(resp, 'timings', replay.timings)
+        replay.elapsed = resp.elapsed
+        return replay
+
+    def send(self, request, **kwargs):
+        data = None
+        if self.cassette.mode != 'record':
+            data = self.cassette.play(request)
+
+        if data is not None:
+            return self._build_response(request, data)
+        elif self.cassette.recording:
+            return self._record(request, **kwargs)
+        else:
+            raise CassetteMiss(
+                'No recorded response to %s %s in [ %s ]' % (
+                    request.method, request.url, self.cassette.path
+                ),
+                request=request
+            )
+
+    def close(self):
+        self.cassette.save()
+        self.adapter.close()
+
+
+def build_cassette(config, log_name=__name__):
+    """Return the cassette described by ``config``.
+
+    ``cassette`` may be a ``Cassette``, a dictionary of its arguments or
+    the path of the cassette file.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    cassette = config.get('cassette')
+    if isinstance(cassette, str):
+        cassette = Cassette(path=cassette, log_name=log_name)
+    elif isinstance(cassette, dict):
+        cassette = Cassette(log_name=log_name, **cassette)
+    return cassette or None
@@ -0,0 +1,276 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'dns_cache': {
+...         'ttl': 60,
+...         'negative_ttl': 5,
+...         'refresh': True
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.dns_cache.stats)
+
+>>> # When dnspython is installed the TTL of the DNS records is used.
+>>> from cloudlib import http_dns
+>>> config = {
+...     'dns_cache': {'resolver': http_dns.dnspython_resolver}
+... }
+"""
+
+import socket
+import threading
+
+from cloudlib import http_adapter
+from cloudlib import http_limits
+from cloudlib import logger
+from cloudlib import utils
+
+# dnspython is optional, it is only needed to honor the TTL of records
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:
+    dns = None
+
+
+def dnspython_resolver(host, port):
+    """Resolve ``host`` with dnspython, returning the record TTL.
+
+    :param host: ``str``
+    :param port: ``int``
+    :return: ``tuple`` (addresses, ttl)
+    """
+    if dns is None:
+        raise ImportError('dnspython is required to use dnspython_resolver')
+
+    resolver = dns.resolver.Resolver()
+    resolve = getattr(resolver, 'resolve', getattr(resolver, 'query', None))
+    addresses = []
+    ttls = []
+    for rdtype in ('A', 'AAAA'):
+        try:
+            answer = resolve(host, rdtype)
+        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN):
+            continue
+        except dns.exception.DNSException as exp:
+            raise socket.gaierror(str(exp))
+        ttls.append(answer.rrset.ttl)
+        addresses.extend(record.address for record in answer)
+
+    if not addresses:
+        raise socket.gaierror('No addresses found for %s' % host)
+    return addresses, min(ttls)
+
+
+class DNSEntry(object):
+    def __init__(self, addresses, error, ttl, now):
+        """The cached outcome of resolving a host.
+
+        :param addresses: ``list``
+        :param error: ``Exception`` Set for negative entries.
+        :param ttl: ``float``
+        :param now: ``float``
+        """
+        self.addresses = addresses
+        self.error = error
+        self.created = now
+        self.expires = now + ttl
+        self.refreshing = False
+        self.next_refresh = None
+
+
+class DNSCache(object):
+
+    def __init__(self, ttl=60, negative_ttl=5, max_size=1024, refresh=False,
+                 refresh_ahead=0.8, resolver=None, log_name=__name__):
+        """Cache name resolution results for the connections of a client.
+
+        Addresses are kept for the TTL returned by ``resolver`` or, when it
+        only returns a list of addresses as the system resolver does, for
+        ``ttl`` seconds. Failed lookups are remembered for
+        ``negative_ttl`` seconds so a missing host does not hit the
+        resolver on every request. Concurrent lookups of a host share a
+        single query.
+
+        With ``refresh`` True an entry used after ``refresh_ahead`` of its
+        lifetime is resolved again in the background, while the cached
+        addresses keep being returned, so busy hosts never wait on DNS. A
+        failed refresh is not tried again for ``negative_ttl`` seconds.
+
+        Instances are callable with a host and port and are passed as the
+        ``resolver`` of ``cloudlib.http_adapter.CloudlibAdapter``.
+
+        :param ttl: ``float``
+        :param negative_ttl: ``float``
+        :param max_size: ``int`` Maximum number of cached hosts.
+        :param refresh: ``bol``
+        :param refresh_ahead: ``float`` Between 0 and 1.
+        :param resolver: ``callable`` Called with a host and port, returns
+                                      a list of addresses or a tuple of
+                                      (addresses, ttl).
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.refresh = refresh
+        self.refresh_ahead = refresh_ahead
+        self.resolver = resolver or http_adapter.system_resolver
+        self.clock = http_limits.monotonic
+
+        self._entries = utils.LRUCache(max_size=max_size)
+        self._single_flight = utils.SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'negative_hits': 0,
+            'refreshes': 0,
+            'errors': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the cache counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            stats = self._stats.copy()
+        stats['entries'] = len(self._entries)
+        stats['evictions'] = self._entries.evictions
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _resolve(self, host, port, refreshing=False):
+        """Query the resolver and cache the outcome.
+
+        A failed background refresh keeps the addresses already cached
+        until they expire.
+
+        :param host: ``str``
+        :param port: ``int``
+        :param refreshing: ``bol``
+        :return: ``object``
+        """
+        try:
+            result = self.resolver(host, port)
+        except socket.gaierror as exp:
+            self._count('errors')
+            if refreshing:
+                self.log.warn('Failed to refresh [ %s ] %s', host, exp)
+                return None
+            entry = DNSEntry(None, exp, self.negative_ttl, self.clock())
+        else:
+            if isinstance(result, tuple):
+                addresses, ttl = result
+            else:
+                addresses, ttl = result, self.ttl
+            entry = DNSEntry(list(addresses), None, ttl, self.clock())
+        self._entries.set((host, port), entry)
+        return entry
+
+    def _refresh(self, host, port, entry):
+        def run():
+            refreshed = None
+            try:
+                refreshed = self._resolve(host, port, refreshing=True)
+            finally:
+                if refreshed is None:
+                    entry.next_refresh = self.clock() + self.negative_ttl
+                entry.refreshing = False
+
+        self._count('refreshes')
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def _should_refresh(self, entry, now):
+        with self._lock:
+            if entry.refreshing or entry.error is not None:
+                return False
+            elif entry.next_refresh is not None and now < entry.next_refresh:
+                return False
+            lifetime = entry.expires - entry.created
+            if now - entry.created < lifetime * self.refresh_ahead:
+                return False
+            entry.refreshing = True
+            return True
+
+    def __call__(self, host, port):
+        """Return the addresses of ``host``.
+
+        :param host: ``str``
+        :param port: ``int``
+        :return: ``list``
+        """
+        now = self.clock()
+        entry = self._entries.get((host, port))
+        if entry is not None and entry.expires > now:
+            if entry.error is not None:
+                self._count('negative_hits')
+                raise entry.error
+
+            self._count('hits')
+            if self.refresh and self._should_refresh(entry, now):
+                self._refresh(host, port, entry)
+            return list(entry.addresses)
+
+        self._count('misses')
+        entry, _ = self._single_flight.do(
+            (host, port), self._resolve, host, port
+        )
+        if entry.error is not None:
+            raise entry.error
+        return list(entry.addresses)
+
+    def invalidate(self, host, port=None):
+        """Forget the cached addresses of ``host``.
+
+        :param host: ``str``
+        :param port: ``int`` When not set every port is forgotten.
+        """
+        for key in self._entries.keys():
+            if key[0] == host and (port is None or key[1] == port):
+                self._entries.pop(key)
+
+    def clear(self):
+        """Forget every cached host."""
+        self._entries.clear()
+
+
+def build_dns_cache(config, log_name=__name__):
+    """Return the DNS cache described by ``config``.
+
+    ``dns_cache`` may be a ``DNSCache``, a dictionary of its arguments or
+    True to use the defaults.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    dns_cache = config.get('dns_cache')
+    if dns_cache is True:
+        dns_cache = DNSCache(log_name=log_name)
+    elif isinstance(dns_cache, dict):
+        dns_cache = DNSCache(log_name=log_name, **dns_cache)
+    return dns_cache or None
@@ -0,0 +1,234 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'compression': True,
+...     'compress_requests': 64 * 1024
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> post_req = make_req.post('https://example.com/catalog', body=catalog)
+
+>>> # Decode a compressed stream incrementally.
+>>> from cloudlib import http_encoding
+>>> decoder = http_encoding.get_decoder('gzip')
+>>> data = decoder.decompress(compressed) + decoder.flush()
+"""
+
+import zlib
+
+from urllib3 import response as urllib3_response
+
+# brotli and zstandard are optional, they are advertised when installed
+try:
+    import brotlicffi as brotli
+except ImportError:
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Smallest request body compressed when ``compress_requests`` is True
+MIN_COMPRESS_SIZE = 1024
+
+
+def supported_encodings():
+    """Return the content codings which ``get_decoder`` can decode.
+
+    :return: ``list``
+    """
+    encodings = ['gzip', 'deflate']
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    return encodings
+
+
+def urllib3_encodings():
+    """Return the content codings decoded by the installed urllib3.
+
+    :return: ``list``
+    """
+    encodings = ['gzip', 'deflate']
+    if getattr(urllib3_response, 'brotli', None) is not None:
+        encodings.append('br')
+    if getattr(urllib3_response, 'HAS_ZSTD', False):
+        encodings.append('zstd')
+    return encodings
+
+
+class DeflateDecoder(object):
+    def __init__(self):
+        """Decode zlib wrapped deflate, falling back to raw deflate."""
+        self._first = True
+        self._data = b''
+        self._obj = zlib.decompressobj()
+
+    def decompress(self, data):
+        if not self._first:
+            return self._obj.decompress(data)
+
+        # Some servers send raw deflate data without the zlib header
+        self._data += data
+        try:
+            decoded = self._obj.decompress(data)
+        except zlib.error:
+            self._first = False
+            self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._obj.decompress(self._data)
+        else:
+            if decoded:
+                self._first = False
+                self._data = b''
+            return decoded
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class GzipDecoder(object):
+    def __init__(self):
+        """Decode gzip data, including several concatenated members."""
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data):
+        decoded = []
+        while data:
+            decoded.append(self._obj.decompress(data))
+            data = self._obj.unused_data
+            if data:
+                self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b''.join(decoded)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class BrotliDecoder(object):
+    def __init__(self):
+        """Decode brotli data."""
+        self._obj = brotli.Decompressor()
+        self._decompress = getattr(
+            self._obj, 'process', getattr(self._obj, 'decompress', None)
+        )
+
+    def decompress(self, data):
+        return self._decompress(data)
+
+    def flush(self):
+        return b''
+
+
+class ZstdDecoder(object):
+    def __init__(self):
+        """Decode zstd data."""
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        return self._obj.decompress(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+
+class MultiDecoder(object):
+    def __init__(self, decoders):
+        """Undo several codings, ``decoders`` in the order they run.
+
+        :param decoders: ``list``
+        """
+        self.decoders = decoders
+
+    def decompress(self, data):
+        for decoder in self.decoders:
+            data = decoder.decompress(data)
+        return data
+
+    def flush(self):
+        data = b''
+        for decoder in self.decoders:
+            data = decoder.decompress(data) + decoder.flush()
+        return data
+
+
+DECODERS = {
+    'gzip': GzipDecoder,
+    'x-gzip': GzipDecoder,
+    'deflate': DeflateDecoder
+}
+if brotli is not None:
+    DECODERS['br'] = BrotliDecoder
+if zstandard is not None:
+    DECODERS['zstd'] = ZstdDecoder
+
+
+def get_decoder(content_encoding):
+    """Return a streaming decoder for a ``Content-Encoding`` header.
+
+    :param content_encoding: ``str``
+    :return: ``object`` || ``None`` None when the content is not encoded.
+    """
+    codings = [
+        c.strip().lower() for c in (content_encoding or '').split(',')
+        if c.strip() and c.strip().lower() != 'identity'
+    ]
+    if not codings:
+        return None
+
+    decoders = []
+    # Codings are listed in the order they were applied
+    for coding in reversed(codings):
+        if coding not in DECODERS:
+            raise ValueError('Unsupported content encoding [ %s ]' % coding)
+        decoders.append(DECODERS[coding]())
+
+    if len(decoders) == 1:
+        return decoders[0]
+    return MultiDecoder(decoders)
+
+
+def gzip_compress(data, level=6):
+    """Return ``data`` compressed as gzip.
+
+    :param data: ``bytes``
+    :param level: ``int``
+    :return: ``bytes``
+    """
+    obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return obj.compress(data) + obj.flush()
+
+
+def iter_gzip(iterable, level=6):
+    """Compress the blocks of ``iterable`` as a gzip stream.
+
+    :param iterable: ``object``
+    :param level: ``int``
+    :yield: ``bytes``
+    """
+    obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for data in iterable:
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        compressed = obj.compress(data)
+        if compressed:
+            yield compressed
+    yield obj.flush()
@@ -0,0 +1,268 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'hedge': {
+...         'percentile': 95,
+...         'min_delay': 0.01,
+...         'ratio': 0.05
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.hedger.stats)
+"""
+
+import threading
+
+# Added for python3 support
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from cloudlib import http_limits
+from cloudlib import http_metrics
+from cloudlib import http_retry
+from cloudlib import logger
+
+
+class Race(object):
+    def __init__(self):
+        """The results of a request and its hedge.
+
+        Once the race is decided results are no longer accepted, the
+        responses of the requests which lost are closed as they arrive.
+        """
+        self.decided = False
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+
+    def put(self, index, resp, exp):
+        """Hand in the outcome of request ``index``.
+
+        :param index: ``int``
+        :param resp: ``object``
+        :param exp: ``Exception``
+        """
+        with self._lock:
+            if not self.decided:
+                self._results.put((index, resp, exp))
+                return
+        if resp is not None:
+            resp.close()
+
+    def get(self, timeout=None):
+        """Return the next outcome, raising Queue.Empty after ``timeout``.
+
+        :param timeout: ``float``
+        :return: ``tuple`` (index, resp, exp)
+        """
+        return self._results.get(timeout=timeout)
+
+    def decide(self):
+        """End the race, closing the responses which were not used."""
+        with self._lock:
+            self.decided = True
+        while True:
+            try:
+                _, resp, _ = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if resp is not None:
+                resp.close()
+
+
+class Hedger(object):
+
+    def __init__(self, percentile=95, min_samples=20, delay=None,
+                 min_delay=0.005, max_delay=None, ratio=0.1,
+                 min_per_second=1, log_name=__name__):
+        """Send a second copy of slow idempotent requests.
+
+        If a request has not answered after the ``percentile`` latency of
+        its host a duplicate is sent and whichever answers first is
+        returned. The response of the loser is closed as soon as it
+        arrives so its connection goes back to the pool.
+
+        Until ``min_samples`` requests to a host have completed ``delay``
+        is used instead, by default nothing is hedged before then. The
+        delay is kept between ``min_delay`` and ``max_delay``. Hedges are
+        limited to ``ratio`` of the recent requests, plus
+        ``min_per_second``, so a slow host does not see its load doubled.
+        A hedge which could not be sent right away, as told by the
+        ``ready`` callable given to ``run``, is skipped, and one which did
+        not start before the race was decided is never sent.
+
+        :param percentile: ``float``
+        :param min_samples: ``int``
+        :param delay: ``float``
+        :param min_delay: ``float``
+        :param max_delay: ``float``
+        :param ratio: ``float``
+        :param min_per_second: ``int``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = http_retry.RetryBudget(
+            ratio=ratio, min_per_second=min_per_second
+        )
+
+        self._latency = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'hedged': 0,
+            'hedge_wins': 0,
+            'budget_exhausted': 0,
+            'not_ready': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the hedging counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _histogram(self, host):
+        with self._lock:
+            if host not in self._latency:
+                self._latency[host] = http_metrics.Histogram()
+            return self._latency[host]
+
+    def observe(self, host, seconds):
+        """Record the latency of a completed request to ``host``.
+
+        :param host: ``str``
+        :param seconds: ``float``
+        """
+        self._histogram(host).observe(seconds)
+
+    def delay(self, host):
+        """Return the seconds to wait before hedging a request to ``host``.
+
+        :param host: ``str``
+        :return: ``float`` || ``None`` None when the request is not hedged.
+        """
+        histogram = self._histogram(host)
+        if histogram.count < self.min_samples:
+            delay = self.default_delay
+        else:
+            delay = histogram.percentile(self.percentile)
+
+        if delay is None:
+            return None
+        delay = max(delay, self.min_delay)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+        return delay
+
+    def _start(self, host, func, race, index):
+        def run():
+            if race.decided:
+                # The race was over before this request was sent
+                return
+            start = http_limits.monotonic()
+            try:
+                resp = func()
+            except Exception as exp:
+                race.put(index, None, exp)
+            else:
+                self.observe(host, http_limits.monotonic() - start)
+                race.put(index, resp, None)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+
+    def run(self, host, func, ready=None):
+        """Call ``func``, calling it again if it is slower than the delay.
+
+        :param host: ``str``
+        :param func: ``callable`` Sends the request and returns a response.
+        :param ready: ``callable`` Returns False when a hedge could not be
+                                   sent right away, for example because
+                                   the host has no free connection slot.
+        :return: ``object`` The first response received.
+        """
+        self._count('requests')
+        self.budget.request()
+        delay = self.delay(host)
+        if delay is None:
+            start = http_limits.monotonic()
+            resp = func()
+            self.observe(host, http_limits.monotonic() - start)
+            return resp
+
+        race = Race()
+        self._start(host, func, race, 0)
+        try:
+            index, resp, exp = race.get(timeout=delay)
+        except queue.Empty:
+            if ready is not None and not ready():
+                self._count('not_ready')
+                index, resp, exp = race.get()
+            elif not self.budget.withdraw():
+                self._count('budget_exhausted')
+                index, resp, exp = race.get()
+            else:
+                self._count('hedged')
+                self.log.debug(
+                    'Hedging request to [ %s ] after %.3fs', host, delay
+                )
+                self._start(host, func, race, 1)
+                index, resp, exp = race.get()
+                # Use the hedge if the original failed first
+                if exp is not None:
+                    index, resp, exp = race.get()
+        race.decide()
+
+        if exp is not None:
+            raise exp
+        if index == 1:
+            self._count('hedge_wins')
+        return resp
+
+
+def build_hedger(config, log_name=__name__):
+    """Return the hedger described by ``config``.
+
+    ``hedge`` may be a ``Hedger``, a dictionary of its arguments or True
+    to use the defaults.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    hedger = config.get('hedge')
+    if hedger is True:
+        hedger = Hedger(log_name=log_name)
+    elif isinstance(hedger, dict):
+        hedger = Hedger(log_name=log_name, **hedger)
+    return hedger or None
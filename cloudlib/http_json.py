@@ -0,0 +1,230 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> make_req = http.MakeRequest()
+>>> org = make_req.get_json('https://api.github.com/orgs/openstack')
+
+>>> # Yield the items of a large listing while the body is downloading.
+>>> for item in make_req.get_json(url, key='items', stream=True):
+...     print(item['id'])
+
+>>> # The incremental parser also works on any iterable of blocks.
+>>> from cloudlib import http_json
+>>> with open('listing.json', 'rb') as f:
+...     for item in http_json.iter_items(iter(lambda: f.read(65536), b'')):
+...         print(item)
+"""
+
+import codecs
+import json
+import re
+
+# orjson is optional, the standard library is used when it is missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER_TAIL = re.compile(r'[0-9eE.+\-]*')
+
+
+def backend():
+    """Return the name of the library used by ``loads``.
+
+    :return: ``str``
+    """
+    if orjson is not None:
+        return 'orjson'
+    return 'json'
+
+
+def loads(data):
+    """Decode a JSON document.
+
+    :param data: ``bytes`` || ``str``
+    :return: ``object``
+    :raises: ``ValueError`` When ``data`` is not valid JSON.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+class JSONStream(object):
+
+    def __init__(self, blocks):
+        """Parse a JSON document as its blocks arrive.
+
+        Only the values handed back are built as Python objects, the rest
+        of the document is held as text until it has been consumed.
+
+        :param blocks: ``object`` Iterable of ``bytes`` or ``str``.
+        """
+        self.blocks = iter(blocks)
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+
+    def _fill(self):
+        """Read the next block into the buffer.
+
+        :return: ``bol`` False once the input is exhausted.
+        """
+        if self.eof:
+            return False
+
+        # Drop the consumed text so the buffer only holds what is pending
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        for block in self.blocks:
+            if isinstance(block, bytes):
+                block = self._utf8.decode(block)
+            if block:
+                self.buffer += block
+                return True
+
+        self.buffer += self._utf8.decode(b'', final=True)
+        self.eof = True
+        return False
+
+    def _error(self, msg):
+        return ValueError('%s at position %s' % (msg, self.pos))
+
+    def peek(self):
+        """Return the next non whitespace character.
+
+        :return: ``str`` An empty string at the end of the document.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume ``char`` or raise ``ValueError``.
+
+        :param char: ``str``
+        """
+        if self.peek() != char:
+            raise self._error('Expecting %r' % char)
+        self.pos += 1
+
+    def value(self):
+        """Decode and consume the next value.
+
+        :return: ``object``
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # The value is not complete yet
+                if not self._fill():
+                    raise
+                continue
+
+            # A number at the end of the buffer may continue in the next
+            # block, "1.5e" is read as 1.5 until the exponent arrives
+            tail = NUMBER_TAIL.match(self.buffer, end).end()
+            if tail == len(self.buffer) and self._fill():
+                continue
+
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield the elements of the array starting at the current position.
+
+        :yield: ``object``
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            elif char != ',':
+                self.pos -= 1
+                raise self._error('Expecting "," or "]"')
+
+    def find(self, key):
+        """Consume the current object up to the value of ``key``.
+
+        :param key: ``str``
+        :return: ``bol`` False when the object does not hold ``key``.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return False
+
+        while True:
+            if self.peek() != '"':
+                raise self._error('Expecting property name')
+            name = self.value()
+            self.expect(':')
+            if name == key:
+                return True
+
+            self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return False
+            elif char != ',':
+                self.pos -= 1
+                raise self._error('Expecting "," or "}"')
+
+
+def iter_items(blocks, key=None):
+    """Yield the elements of a top level array, or of the array at ``key``.
+
+    Elements are decoded one at a time while ``blocks`` is consumed so the
+    complete document is never held in memory. ``key`` may be a dotted path
+    to reach an array held in nested objects. Nothing is yielded when
+    ``key`` is missing.
+
+    :param blocks: ``object`` Iterable of ``bytes`` or ``str``.
+    :param key: ``str``
+    :yield: ``object``
+    """
+    stream = JSONStream(blocks)
+    if key:
+        for name in key.split('.'):
+            if not stream.find(name):
+                return
+        if stream.peek() == 'n':
+            return
+
+    for item in stream.items():
+        yield item
@@ -0,0 +1,272 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'rate_limit': {'rate': 50, 'burst': 100},
+...     'max_per_host': 8
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+
+>>> # Limiters can be shared between clients by passing the objects.
+>>> from cloudlib import http_limits
+>>> bucket = http_limits.TokenBucket(rate=50, burst=100)
+>>> make_req = http.MakeRequest(config={'rate_limit': bucket})
+
+>>> # Cap transfers to 10 MB/s for this client and 50 MB/s for every
+>>> # client sharing the bucket.
+>>> shared = http_limits.TokenBucket(rate=50 * 1024 * 1024)
+>>> config = {'bandwidth': [10 * 1024 * 1024, shared]}
+>>> make_req = http.MakeRequest(config=config)
+"""
+
+import collections
+import threading
+import time
+
+
+# Added for python2 support
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate, burst=None):
+        """Pace work to ``rate`` tokens per second with bursts of ``burst``.
+
+        The bucket is safe to share between threads and between asyncio
+        tasks. Callers reserve tokens up front and are told how long to
+        wait, so waiters are served in the order they arrived and large
+        requests, such as a block of bytes, are paced correctly even when
+        they are bigger than ``burst``.
+
+        :param rate: ``float`` Tokens added per second.
+        :param burst: ``float`` Maximum number of saved tokens, defaults to
+                                ``rate``.
+        """
+        self.rate = float(rate)
+        if burst is None:
+            burst = rate
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.sleep = time.sleep
+
+        self._last = monotonic()
+        self._lock = threading.Lock()
+        self._stats = {
+            'acquired': 0,
+            'throttled': 0,
+            'wait_seconds': 0.0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the bucket counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def reserve(self, tokens=1):
+        """Take ``tokens`` and return the seconds to wait before using them.
+
+        :param tokens: ``float``
+        :return: ``float``
+        """
+        with self._lock:
+            now = monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self.tokens -= tokens
+
+            self._stats['acquired'] += tokens
+            if self.tokens >= 0:
+                return 0.0
+
+            wait = -self.tokens / self.rate
+            self._stats['throttled'] += 1
+            self._stats['wait_seconds'] += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` may be used.
+
+        :param tokens: ``float``
+        :return: ``float`` Seconds spent waiting.
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+class HostLimiter(object):
+
+    def __init__(self, max_per_host):
+        """Cap the number of in flight requests to every host.
+
+        Threads block in ``acquire``. Asyncio tasks, or anything else which
+        can not block, use ``try_acquire`` with a ``waiter`` callback which
+        is called once a slot for the host may be free.
+
+        :param max_per_host: ``int``
+        """
+        self.max_per_host = max_per_host
+        self._cond = threading.Condition()
+        self._active = collections.defaultdict(int)
+        self._waiters = collections.defaultdict(list)
+
+    def active(self, host):
+        """Return the number of in flight requests for ``host``.
+
+        :param host: ``str``
+        :return: ``int``
+        """
+        with self._cond:
+            return self._active.get(host, 0)
+
+    def available(self, host):
+        """Return True if a slot for ``host`` is free.
+
+        :param host: ``str``
+        :return: ``bol``
+        """
+        with self._cond:
+            return self._active.get(host, 0) < self.max_per_host
+
+    def try_acquire(self, host, waiter=None):
+        """Take a slot for ``host`` without blocking.
+
+        :param host: ``str``
+        :param waiter: ``callable`` Called when a slot is released if no
+                                    slot was available.
+        :return: ``bol``
+        """
+        with self._cond:
+            if self._active[host] < self.max_per_host:
+                self._active[host] += 1
+                return True
+            elif waiter is not None:
+                self._waiters[host].append(waiter)
+            return False
+
+    def acquire(self, host):
+        """Block until a slot for ``host`` is available and take it.
+
+        :param host: ``str``
+        """
+        with self._cond:
+            while self._active[host] >= self.max_per_host:
+                self._cond.wait()
+            self._active[host] += 1
+
+    def release(self, host):
+        """Give back a slot for ``host``.
+
+        :param host: ``str``
+        """
+        with self._cond:
+            self._active[host] -= 1
+            if self._active[host] <= 0:
+                del self._active[host]
+            waiters = self._waiters.pop(host, [])
+            self._cond.notify_all()
+
+        for waiter in waiters:
+            waiter()
+
+
+class Bandwidth(object):
+
+    def __init__(self, buckets):
+        """Cap the bytes per second of transfers.
+
+        Every block of data takes its size in tokens from each of
+        ``buckets`` and waits for the slowest of them. A bucket created
+        for a single client caps that client, passing the same
+        ``TokenBucket`` to several clients caps all of them together.
+
+        :param buckets: ``list`` ``TokenBucket`` objects, one token per byte.
+        """
+        self.buckets = buckets
+        self.sleep = time.sleep
+
+    def acquire(self, size):
+        """Block until ``size`` bytes may be transferred.
+
+        :param size: ``int``
+        :return: ``float`` Seconds spent waiting.
+        """
+        wait = max(bucket.reserve(size) for bucket in self.buckets)
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+def build_bandwidth(config):
+    """Return the bandwidth limit described by ``config``.
+
+    ``bandwidth`` may be a number of bytes per second, which allows bursts
+    of a tenth of a second, a dictionary of ``TokenBucket`` arguments, a
+    ``TokenBucket`` shared with other clients, or a list of these to apply
+    several limits at once.
+
+    :param config: ``dict``
+    :return: ``object`` || ``None``
+    """
+    limits = config.get('bandwidth')
+    if not limits:
+        return None
+    elif not isinstance(limits, (list, tuple)):
+        limits = [limits]
+
+    buckets = []
+    for limit in limits:
+        if isinstance(limit, dict):
+            limit = TokenBucket(**limit)
+        elif not isinstance(limit, TokenBucket):
+            limit = TokenBucket(rate=limit, burst=limit / 10.0)
+        buckets.append(limit)
+    return Bandwidth(buckets)
+
+
+def build_limiters(config):
+    """Return the rate and host limiters described by ``config``.
+
+    ``rate_limit`` may be a ``TokenBucket`` or a dictionary of its
+    arguments and ``max_per_host`` may be a ``HostLimiter`` or an integer.
+
+    :param config: ``dict``
+    :return: ``tuple`` (rate_limiter, host_limiter)
+    """
+    rate_limiter = config.get('rate_limit')
+    if isinstance(rate_limiter, dict):
+        rate_limiter = TokenBucket(**rate_limiter)
+
+    host_limiter = config.get('max_per_host')
+    if isinstance(host_limiter, bool):
+        raise ValueError(
+            'max_per_host must be an integer or a HostLimiter, not %s' % (
+                host_limiter
+            )
+        )
+    elif isinstance(host_limiter, int):
+        host_limiter = HostLimiter(max_per_host=host_limiter)
+
+    return rate_limiter, host_limiter
@@ -0,0 +1,228 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> make_req = http.MakeRequest(config={'metrics': True})
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.metrics.snapshot())
+
+>>> # Any callable can be used as a hook.
+>>> def log_slow(timing):
+...     if timing.total > 1:
+...         print('slow request %s' % timing.as_dict())
+>>> make_req.add_hook('post_request', log_slow)
+"""
+
+import bisect
+import math
+import threading
+
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+
+class RequestTiming(object):
+    def __init__(self, method, url, host):
+        """The timing breakdown of a single request.
+
+        All times are in seconds. ``dns``, ``connect`` and ``tls`` are 0
+        when a pooled connection was reused and ``None`` when the transport
+        did not report them.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param host: ``str``
+        """
+        self.method = method.upper()
+        self.url = url
+        self.host = host
+        self.status_code = None
+        self.error = None
+        self.dns = None
+        self.connect = None
+        self.tls = None
+        self.ttfb = None
+        self.total = None
+        self.bytes_sent = None
+        self.bytes_received = None
+        self.timeout = None
+
+    def as_dict(self):
+        return {
+            'method': self.method,
+            'url': self.url,
+            'host': self.host,
+            'status_code': self.status_code,
+            'error': str(self.error) if self.error else None,
+            'dns': self.dns,
+            'connect': self.connect,
+            'tls': self.tls,
+            'ttfb': self.ttfb,
+            'total': self.total,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'timeout': self.timeout
+        }
+
+
+class Histogram(object):
+
+    def __init__(self, minimum=0.0001, maximum=300, growth=1.1):
+        """A fixed memory histogram of positive values with log buckets.
+
+        Bucket boundaries grow by ``growth`` from ``minimum`` to
+        ``maximum`` so percentiles are accurate to within ``growth - 1`` of
+        the true value regardless of how many values are recorded.
+
+        :param minimum: ``float``
+        :param maximum: ``float``
+        :param growth: ``float``
+        """
+        steps = int(math.ceil(math.log(maximum / minimum, growth)))
+        self.bounds = [minimum * growth ** i for i in range(steps + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """Record a value.
+
+        :param value: ``float``
+        """
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, percent):
+        """Return an estimate of the value at ``percent``.
+
+        :param percent: ``float`` Between 0 and 100.
+        :return: ``float`` || ``None``
+        """
+        with self._lock:
+            if self.count == 0:
+                return None
+
+            rank = percent / 100.0 * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if count and seen >= rank:
+                    break
+
+            if index == 0:
+                value = self.min
+            elif index == len(self.bounds):
+                value = self.max
+            else:
+                # Interpolate within the bucket on a log scale
+                low, high = self.bounds[index - 1], self.bounds[index]
+                fraction = (rank - (seen - count)) / float(count)
+                value = low * (high / low) ** fraction
+            return min(max(value, self.min), self.max)
+
+    @property
+    def mean(self):
+        if self.count:
+            return self.sum / self.count
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99)
+        }
+
+
+class LatencyAggregator(object):
+
+    def __init__(self):
+        """Aggregate request timings per host and method.
+
+        Instances are callable and are meant to be used as a
+        ``post_request`` hook of ``cloudlib.http.MakeRequest``. An instance
+        can be shared by many clients.
+        """
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, host, method):
+        key = (host, method.upper())
+        with self._lock:
+            if key not in self._series:
+                self._series[key] = {
+                    'phases': dict((p, Histogram()) for p in PHASES),
+                    'requests': 0,
+                    'errors': 0,
+                    'bytes_sent': 0,
+                    'bytes_received': 0
+                }
+            return self._series[key]
+
+    def __call__(self, timing):
+        series = self._get_series(timing.host, timing.method)
+        for phase in PHASES:
+            value = getattr(timing, phase)
+            if value is not None:
+                series['phases'][phase].observe(value)
+
+        with self._lock:
+            series['requests'] += 1
+            if timing.error is not None:
+                series['errors'] += 1
+            series['bytes_sent'] += timing.bytes_sent or 0
+            series['bytes_received'] += timing.bytes_received or 0
+
+    def histogram(self, host, method, phase='total'):
+        """Return the histogram of a phase for a host and method.
+
+        :param host: ``str``
+        :param method: ``str``
+        :param phase: ``str``
+        :return: ``object``
+        """
+        return self._get_series(host, method)['phases'][phase]
+
+    def snapshot(self):
+        """Return the aggregated timings keyed by "host METHOD".
+
+        :return: ``dict``
+        """
+        with self._lock:
+            series = list(self._series.items())
+
+        snapshot = {}
+        for (host, method), data in series:
+            item = dict(
+                (k, v) for k, v in data.items() if k != 'phases'
+            )
+            for phase, histogram in data['phases'].items():
+                item[phase] = histogram.as_dict()
+            snapshot['%s %s' % (host, method)] = item
+        return snapshot
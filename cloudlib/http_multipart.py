@@ -0,0 +1,262 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> from cloudlib import http_multipart
+>>> make_req = http.MakeRequest(config={'headers': {'X-Auth-Token': token}})
+>>> resp = make_req.multipart_upload(
+...     'https://swift.example.com/v1/AUTH_test/backups/backup.tar.gz',
+...     local_file='/var/backups/backup.tar.gz',
+...     strategy=http_multipart.SwiftSLOStrategy(),
+...     part_size=64 * 1024 * 1024,
+...     workers=8
+... )
+
+>>> # Other services are supported by writing a strategy.
+>>> class MyStrategy(http_multipart.MultipartStrategy):
+...     def part_request(self, url, part, context):
+...         return '%s/parts/%s' % (url, part.number), None
+...     def complete(self, make_req, url, parts, context, headers=None):
+...         return make_req.post(url + '/complete', headers=headers)
+"""
+
+import json
+from xml.etree import ElementTree
+
+# Added for python3 support
+try:
+    import urlparse
+except ImportError:
+    import urllib.parse as urlparse
+
+
+PART_SIZE = 16 * 1024 * 1024
+
+
+class Part(object):
+    def __init__(self, number, offset, size):
+        """A byte range of a file uploaded as one request.
+
+        :param number: ``int`` Starting at 1.
+        :param offset: ``int``
+        :param size: ``int``
+        """
+        self.number = number
+        self.offset = offset
+        self.size = size
+        self.etag = None
+        self.digest = None
+        self.attempts = 0
+
+    def __repr__(self):
+        return 'Part(%s, offset=%s, size=%s)' % (
+            self.number, self.offset, self.size
+        )
+
+
+def split_parts(size, part_size=PART_SIZE):
+    """Return the parts needed to upload ``size`` bytes.
+
+    :param size: ``int``
+    :param part_size: ``int``
+    :return: ``list``
+    """
+    if size == 0:
+        return [Part(1, 0, 0)]
+
+    return [
+        Part(number, offset, min(part_size, size - offset))
+        for number, offset in enumerate(range(0, size, part_size), 1)
+    ]
+
+
+class MultipartStrategy(object):
+    """Describe how an object store expects a multipart upload.
+
+    ``initiate`` is called once and returns a context, such as an upload
+    id, which is passed to every other call. Every part is then sent to the
+    url and params returned by ``part_request`` and once all parts are
+    stored ``complete`` is called. If the upload fails ``abort`` is called
+    to clean up the parts which were stored.
+    """
+
+    # Method used to send every part
+    part_method = 'put'
+
+    def initiate(self, make_req, url, headers=None):
+        """Start an upload and return its context.
+
+        :param make_req: ``object``
+        :param url: ``str``
+        :param headers: ``dict``
+        :return: ``object``
+        """
+        return None
+
+    def part_request(self, url, part, context):
+        """Return the url and query params used to send ``part``.
+
+        :param url: ``str``
+        :param part: ``object``
+        :param context: ``object``
+        :return: ``tuple`` (url, params)
+        """
+        raise NotImplementedError
+
+    def part_done(self, part, resp):
+        """Record what the service returned for a stored part.
+
+        :param part: ``object``
+        :param resp: ``object``
+        """
+        part.etag = resp.headers.get('ETag', '').strip('"') or part.digest
+
+    def complete(self, make_req, url, parts, context, headers=None):
+        """Assemble the stored ``parts`` into the object at ``url``.
+
+        :param make_req: ``object``
+        :param url: ``str``
+        :param parts: ``list``
+        :param context: ``object``
+        :param headers: ``dict``
+        :return: ``object`` The response of the final request.
+        """
+        raise NotImplementedError
+
+    def abort(self, make_req, url, parts, context, headers=None):
+        """Remove the stored ``parts`` of a failed upload.
+
+        :param make_req: ``object``
+        :param url: ``str``
+        :param parts: ``list``
+        :param context: ``object``
+        :param headers: ``dict``
+        """
+        pass
+
+
+class SwiftSLOStrategy(MultipartStrategy):
+
+    def __init__(self, segment_container=None, account_depth=2):
+        """Upload an OpenStack Swift Static Large Object.
+
+        Parts are stored as objects named ``<object>/<number>`` in
+        ``segment_container``, which defaults to ``<container>_segments``,
+        and a manifest listing them is stored at the object url.
+
+        :param segment_container: ``str``
+        :param account_depth: ``int`` Number of path elements before the
+                                      container, ``/v1/AUTH_account``.
+        """
+        self.segment_container = segment_container
+        self.account_depth = account_depth
+
+    def _split(self, url):
+        parsed = urlparse.urlsplit(url)
+        path = parsed.path.lstrip('/').split('/')
+        account = path[:self.account_depth]
+        container = path[self.account_depth]
+        obj = '/'.join(path[self.account_depth + 1:])
+        return parsed, account, container, obj
+
+    def segment_path(self, url, part):
+        """Return the container and object path of a segment.
+
+        :param url: ``str``
+        :param part: ``object``
+        :return: ``str``
+        """
+        _, _, container, obj = self._split(url)
+        return '/%s/%s/%08d' % (
+            self.segment_container or '%s_segments' % container,
+            obj,
+            part.number
+        )
+
+    def part_request(self, url, part, context):
+        parsed, account, _, _ = self._split(url)
+        path = '/%s%s' % ('/'.join(account), self.segment_path(url, part))
+        return urlparse.urlunsplit(
+            (parsed.scheme, parsed.netloc, path, '', '')
+        ), None
+
+    def complete(self, make_req, url, parts, context, headers=None):
+        manifest = [
+            {
+                'path': self.segment_path(url, part),
+                'etag': part.etag,
+                'size_bytes': part.size
+            }
+            for part in parts
+        ]
+        return make_req.put(
+            url,
+            headers=headers,
+            body=json.dumps(manifest),
+            kwargs={'params': {'multipart-manifest': 'put'}}
+        )
+
+    def abort(self, make_req, url, parts, context, headers=None):
+        for part in parts:
+            if part.etag is not None:
+                make_req.delete(
+                    self.part_request(url, part, context)[0], headers=headers
+                )
+
+
+class S3Strategy(MultipartStrategy):
+    """Upload an object using the S3 multipart upload API.
+
+    Requests are not signed, add the authentication headers using a
+    ``pre_request`` hook of the client.
+    """
+
+    namespace = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+    def initiate(self, make_req, url, headers=None):
+        resp = make_req.post(
+            url, headers=headers, kwargs={'params': {'uploads': ''}}
+        )
+        resp.raise_for_status()
+        root = ElementTree.fromstring(resp.content)
+        for element in root.iter():
+            if element.tag.split('}')[-1] == 'UploadId':
+                return element.text
+        raise ValueError('No UploadId returned for [ %s ]' % url)
+
+    def part_request(self, url, part, context):
+        return url, {'partNumber': part.number, 'uploadId': context}
+
+    def complete(self, make_req, url, parts, context, headers=None):
+        root = ElementTree.Element(
+            'CompleteMultipartUpload', xmlns=self.namespace
+        )
+        for part in parts:
+            element = ElementTree.SubElement(root, 'Part')
+            ElementTree.SubElement(element, 'PartNumber').text = str(
+                part.number
+            )
+            ElementTree.SubElement(element, 'ETag').text = '"%s"' % part.etag
+        return make_req.post(
+            url,
+            headers=headers,
+            body=ElementTree.tostring(root),
+            kwargs={'params': {'uploadId': context}}
+        )
+
+    def abort(self, make_req, url, parts, context, headers=None):
+        make_req.delete(
+            url, headers=headers, kwargs={'params': {'uploadId': context}}
+        )
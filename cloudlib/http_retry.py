@@ -0,0 +1,237 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'retry': {
+...         'total': 5,
+...         'backoff_factor': 0.5,
+...         'backoff_max': 30
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.retry.stats)
+"""
+
+import collections
+import email.utils
+import random
+import threading
+import time
+
+import requests
+
+from cloudlib import logger
+
+
+RETRY_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (requests.ConnectionError, requests.Timeout)
+
+
+class RetryBudget(object):
+
+    def __init__(self, ratio=0.2, min_per_second=10, ttl=10):
+        """Limit retries to a fraction of the recent request volume.
+
+        A retry is allowed while the number of retries made within the last
+        ``ttl`` seconds is lower than ``ratio`` of the requests made in the
+        same window plus ``min_per_second`` retries per second. When an
+        upstream is failing every call this stops retries from multiplying
+        the load sent to it.
+
+        :param ratio: ``float``
+        :param min_per_second: ``int``
+        :param ttl: ``int`` Length of the window in seconds.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.ttl = ttl
+        self._requests = collections.deque()
+        self._retries = collections.deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for events in (self._requests, self._retries):
+            while events and events[0] <= now - self.ttl:
+                events.popleft()
+
+    def request(self):
+        """Record that a request was made."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            self._requests.append(now)
+
+    def withdraw(self):
+        """Return True and record a retry if the budget allows one.
+
+        :return: ``bol``
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            allowed = self.min_per_second * self.ttl
+            allowed += self.ratio * len(self._requests)
+            if len(self._retries) < allowed:
+                self._retries.append(now)
+                return True
+            else:
+                return False
+
+
+# Shared by every retry policy which is not given its own budget.
+BUDGET = RetryBudget()
+
+
+def parse_retry_after(value):
+    """Return the number of seconds requested by a Retry-After header.
+
+    :param value: ``str`` Either a number of seconds or an HTTP date.
+    :return: ``float`` || ``None``
+    """
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(email.utils.mktime_tz(date) - time.time(), 0)
+
+
+class RetryPolicy(object):
+
+    def __init__(self, total=3, backoff_factor=0.5, backoff_max=30,
+                 statuses=RETRY_STATUSES, methods=RETRY_METHODS,
+                 respect_retry_after=True, budget=None, log_name=__name__):
+        """Retry failed requests with exponential backoff and full jitter.
+
+        Requests using one of ``methods`` are retried up to ``total`` times
+        when they raise a connection error or timeout or when the response
+        status is in ``statuses``. Between attempts the policy sleeps for a
+        random time between zero and ``backoff_factor * 2 ** attempt``
+        capped at ``backoff_max``. When ``respect_retry_after`` is True a
+        ``Retry-After`` header on the response is used instead.
+
+        Every retry is withdrawn from ``budget``, which defaults to the
+        process wide ``BUDGET``, and no retry is made once it is exhausted.
+
+        :param total: ``int``
+        :param backoff_factor: ``float``
+        :param backoff_max: ``float``
+        :param statuses: ``list``
+        :param methods: ``list``
+        :param respect_retry_after: ``bol``
+        :param budget: ``object``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.statuses = statuses
+        self.methods = [m.upper() for m in methods]
+        self.respect_retry_after = respect_retry_after
+        if budget is None:
+            budget = BUDGET
+        self.budget = budget
+        self.sleep = time.sleep
+
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'retries': 0,
+            'backoff_seconds': 0.0,
+            'budget_exhausted': 0,
+            'gave_up': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the retry counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def backoff(self, attempt, resp=None):
+        """Return the number of seconds to wait before the next attempt.
+
+        :param attempt: ``int`` Number of the attempt which just failed,
+                                starting at 0.
+        :param resp: ``object``
+        :return: ``float``
+        """
+        if self.respect_retry_after and resp is not None:
+            retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.backoff_max)
+
+        ceiling = min(self.backoff_max, self.backoff_factor * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def start(self):
+        """Record the first attempt of a request against the budget."""
+        self._count('requests')
+        self.budget.request()
+
+    def retry(self, method, attempt, resp=None, exp=None):
+        """Return True, after backing off, if a request should be retried.
+
+        :param method: ``str``
+        :param attempt: ``int`` Number of the attempt which just failed,
+                                starting at 0.
+        :param resp: ``object``
+        :param exp: ``Exception``
+        :return: ``bol``
+        """
+        if method.upper() not in self.methods:
+            return False
+        elif exp is not None:
+            if not isinstance(exp, RETRY_EXCEPTIONS):
+                return False
+        elif resp is None or resp.status_code not in self.statuses:
+            return False
+
+        if attempt >= self.total:
+            self._count('gave_up')
+            return False
+        elif not self.budget.withdraw():
+            self._count('budget_exhausted')
+            self.log.warn('Retry budget exhausted, not retrying %s', method)
+            return False
+
+        delay = self.backoff(attempt=attempt, resp=resp)
+        self.log.debug(
+            'Retrying %s attempt %s in %.3fs due to [ %s ]',
+            method,
+            attempt + 1,
+            delay,
+            exp or resp.status_code
+        )
+        self._count('retries')
+        self._count('backoff_seconds', delay)
+        self.sleep(delay)
+        return True
@@ -0,0 +1,339 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> from cloudlib import http_scheduler
+>>> make_req = http.MakeRequest(config={'pool_maxsize': 8})
+>>> scheduler = http_scheduler.PriorityScheduler(make_req, workers=8)
+>>> for path in bulk_paths:
+...     scheduler.submit('get', base_url + path, priority='bulk')
+>>> # Interactive requests overtake the queued bulk requests.
+>>> request = scheduler.submit('get', user_url, priority='interactive')
+>>> resp = request.result(timeout=10)
+>>> print(scheduler.stats['interactive']['wait'])
+>>> scheduler.close()
+"""
+
+import collections
+import threading
+
+# Added for python3 support
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from cloudlib import http_limits
+from cloudlib import http_metrics
+from cloudlib import logger
+
+
+PRIORITIES = {
+    'interactive': 16,
+    'normal': 4,
+    'bulk': 1
+}
+
+
+class SchedulerClosed(Exception):
+    """Raised when a request is submitted to a closed scheduler."""
+
+
+class ScheduledRequest(object):
+
+    def __init__(self, method, url, priority, headers=None, body=None,
+                 kwargs=None):
+        """A request waiting in, or completed by, a ``PriorityScheduler``.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param priority: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        """
+        self.method = method
+        self.url = url
+        self.priority = priority
+        self.headers = headers
+        self.body = body
+        self.kwargs = kwargs
+        self.response = None
+        self.error = None
+        self.submitted = http_limits.monotonic()
+        self.started = None
+        self.finished = None
+        self._done = threading.Event()
+
+    def __repr__(self):
+        return '<ScheduledRequest %s %s %s>' % (
+            self.priority, self.method, self.url
+        )
+
+    @property
+    def wait(self):
+        """Return the seconds spent queued, None until the request starts.
+
+        :return: ``float`` || ``None``
+        """
+        if self.started is not None:
+            return self.started - self.submitted
+
+    def done(self):
+        """Return True once the request has completed.
+
+        :return: ``bol``
+        """
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the request and return its response.
+
+        :param timeout: ``float``
+        :return: ``object``
+        :raises: The error raised by the request, or ``queue.Empty`` when
+                 ``timeout`` expires first.
+        """
+        if not self._done.wait(timeout):
+            raise queue.Empty('%r has not completed' % self)
+        if self.error is not None:
+            raise self.error
+        return self.response
+
+    def _finish(self, response=None, error=None):
+        self.response = response
+        self.error = error
+        self.finished = http_limits.monotonic()
+        self._done.set()
+
+
+class PriorityScheduler(object):
+
+    def __init__(self, make_req, workers=4, priorities=None, max_queue=1000,
+                 log_name=__name__):
+        """Run requests on a fixed pool of workers ordered by priority.
+
+        Every priority class has a weight and its own queue. Workers pick
+        requests using weighted fair queuing, each class receives a share
+        of the workers in proportion to its weight whenever it has queued
+        requests, so a low priority class is slowed down but never starved.
+
+        Every class queue holds at most ``max_queue`` requests, ``submit``
+        blocks or raises ``queue.Full`` once it is full. The depth of every
+        queue and a histogram of the time requests waited before starting
+        are reported by ``stats``.
+
+        :param make_req: ``object`` A ``cloudlib.http.MakeRequest``.
+        :param workers: ``int``
+        :param priorities: ``dict`` Weight of every priority class, defaults
+                                    to ``PRIORITIES``.
+        :param max_queue: ``int``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.make_req = make_req
+        self.priorities = dict(priorities or PRIORITIES)
+        self.max_queue = max_queue
+
+        self._queues = dict(
+            (name, collections.deque()) for name in self.priorities
+        )
+        # Virtual finish time of the last request queued for every class
+        self._finish_tags = dict((name, 0.0) for name in self.priorities)
+        self._virtual_time = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._waits = dict(
+            (name, http_metrics.Histogram()) for name in self.priorities
+        )
+        self._stats = dict(
+            (name, {'submitted': 0, 'completed': 0, 'failed': 0,
+                    'rejected': 0})
+            for name in self.priorities
+        )
+
+        self._threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def stats(self):
+        """Return the counters, queue depth and wait times of every class.
+
+        :return: ``dict``
+        """
+        stats = {}
+        with self._cond:
+            for name in self.priorities:
+                stats[name] = self._stats[name].copy()
+                stats[name]['depth'] = len(self._queues[name])
+        for name in self.priorities:
+            stats[name]['wait'] = self._waits[name].as_dict()
+        return stats
+
+    def depth(self, priority=None):
+        """Return the number of queued requests.
+
+        :param priority: ``str`` Only count this class.
+        :return: ``int``
+        """
+        with self._cond:
+            if priority is not None:
+                return len(self._queues[priority])
+            return sum(len(q) for q in self._queues.values())
+
+    def submit(self, method, url, priority='normal', headers=None,
+               body=None, kwargs=None, block=True, timeout=None):
+        """Queue a request and return its ``ScheduledRequest``.
+
+        :param method: ``str``
+        :param url: ``str``
+        :param priority: ``str``
+        :param headers: ``dict``
+        :param body: ``object``
+        :param kwargs: ``dict``
+        :param block: ``bol`` Wait for room when the class queue is full.
+        :param timeout: ``float`` Seconds to wait for room.
+        :return: ``object``
+        """
+        if priority not in self.priorities:
+            raise ValueError(
+                'Unknown priority [ %s ], valid priorities are %s' % (
+                    priority, sorted(self.priorities)
+                )
+            )
+
+        request = ScheduledRequest(
+            method, url, priority, headers=headers, body=body, kwargs=kwargs
+        )
+        with self._cond:
+            pending = self._queues[priority]
+            if block and len(pending) >= self.max_queue:
+                deadline = None
+                if timeout is not None:
+                    deadline = http_limits.monotonic() + timeout
+                while len(pending) >= self.max_queue and not self._closed:
+                    remaining = None
+                    if deadline is not None:
+                        remaining = deadline - http_limits.monotonic()
+                        if remaining <= 0:
+                            break
+                    self._cond.wait(remaining)
+
+            if self._closed:
+                raise SchedulerClosed('The scheduler has been closed')
+            elif len(pending) >= self.max_queue:
+                self._stats[priority]['rejected'] += 1
+                self.log.warn(
+                    'Rejected %s request for %s, the queue is full',
+                    priority, url
+                )
+                raise queue.Full(
+                    'The [ %s ] queue is full with %s requests' % (
+                        priority, len(pending)
+                    )
+                )
+
+            # A class which was idle starts from the current virtual time so
+            # it can not claim the share it did not use.
+            start = max(self._virtual_time, self._finish_tags[priority])
+            tag = start + 1.0 / self.priorities[priority]
+            self._finish_tags[priority] = tag
+            pending.append((tag, request))
+            self._stats[priority]['submitted'] += 1
+            self._cond.notify_all()
+        return request
+
+    def _next(self):
+        """Return the queued request with the lowest finish tag.
+
+        :return: ``object`` || ``None`` None once closed and drained.
+        """
+        with self._cond:
+            while True:
+                heads = [
+                    (q[0][0], name) for name, q in self._queues.items() if q
+                ]
+                if heads:
+                    tag, name = min(heads)
+                    _, request = self._queues[name].popleft()
+                    self._virtual_time = tag
+                    # Wake submitters waiting for room in a full queue
+                    self._cond.notify_all()
+                    return request
+                elif self._closed:
+                    return None
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            request = self._next()
+            if request is None:
+                return
+
+            request.started = http_limits.monotonic()
+            self._waits[request.priority].observe(request.wait)
+            try:
+                resp = self.make_req._request(
+                    method=request.method,
+                    url=request.url,
+                    headers=request.headers,
+                    body=request.body,
+                    kwargs=request.kwargs
+                )
+            except Exception as exp:
+                self._count(request.priority, 'failed')
+                request._finish(error=exp)
+            else:
+                self._count(request.priority, 'completed')
+                request._finish(response=resp)
+
+    def _count(self, priority, name):
+        with self._cond:
+            self._stats[priority][name] += 1
+
+    def close(self, wait=True):
+        """Stop accepting requests and stop the workers.
+
+        Queued requests are still run unless ``wait`` is False, in which
+        case they fail with ``SchedulerClosed``.
+
+        :param wait: ``bol`` Wait for the workers to finish.
+        """
+        dropped = []
+        with self._cond:
+            self._closed = True
+            if not wait:
+                for pending in self._queues.values():
+                    dropped.extend(request for _, request in pending)
+                    pending.clear()
+            self._cond.notify_all()
+
+        for request in dropped:
+            request._finish(error=SchedulerClosed('The scheduler was closed'))
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -0,0 +1,230 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> config = {
+...     'connect_timeout': 5,
+...     'read_timeout': 60,
+...     'adaptive_timeout': {
+...         'percentile': 99,
+...         'multiplier': 3,
+...         'max_read': 120
+...     }
+... }
+>>> make_req = http.MakeRequest(config=config)
+>>> get_req = make_req.get('https://api.github.com/orgs/openstack')
+>>> print(make_req.adaptive_timeout.timeout('api.github.com'))
+"""
+
+import threading
+
+import requests
+
+from cloudlib import http_metrics
+from cloudlib import logger
+
+
+def split_timeout(timeout):
+    """Return the connect and read parts of a ``requests`` timeout.
+
+    :param timeout: ``float`` || ``tuple`` || ``None``
+    :return: ``tuple`` (connect, read)
+    """
+    if isinstance(timeout, (tuple, list)):
+        return timeout[0], timeout[1]
+    return timeout, timeout
+
+
+def config_timeout(config):
+    """Return the default request timeout set in ``config``.
+
+    ``timeout`` applies to both connecting and reading unless
+    ``connect_timeout`` or ``read_timeout`` are set.
+
+    :param config: ``dict``
+    :return: ``float`` || ``tuple``
+    """
+    timeout = config.get('timeout', 60)
+    if 'connect_timeout' in config or 'read_timeout' in config:
+        connect, read = split_timeout(timeout)
+        timeout = (
+            config.get('connect_timeout', connect),
+            config.get('read_timeout', read)
+        )
+    return timeout
+
+
+def total_timeout(timeout):
+    """Return a single timeout covering both parts of ``timeout``.
+
+    :param timeout: ``float`` || ``tuple`` || ``None``
+    :return: ``float`` || ``None``
+    """
+    connect, read = split_timeout(timeout)
+    if connect is None or read is None:
+        return None
+    elif isinstance(timeout, (tuple, list)):
+        return connect + read
+    return timeout
+
+
+class AdaptiveTimeout(object):
+
+    def __init__(self, percentile=99, multiplier=3, min_samples=20,
+                 min_connect=0.5, max_connect=10, min_read=1, max_read=60,
+                 log_name=__name__):
+        """Learn the connect and read timeouts of every host.
+
+        The time taken to open connections, including the TLS handshake,
+        and the time a server takes to start answering are tracked per host
+        in ``cloudlib.http_metrics.Histogram`` sketches. Once a phase has
+        ``min_samples`` observations its timeout is ``multiplier`` times the
+        ``percentile`` latency, kept between the min and max bounds. Until
+        then the configured timeout is used.
+
+        The read timeout limits the wait for each block of data, not the
+        whole transfer, so large downloads are not cut short.
+
+        A request which times out is recorded as taking the timeout it was
+        given, so a host which slows down raises its own timeout.
+
+        Instances are ``post_request`` hooks of ``http.MakeRequest``.
+
+        :param percentile: ``float``
+        :param multiplier: ``float``
+        :param min_samples: ``int``
+        :param min_connect: ``float``
+        :param max_connect: ``float``
+        :param min_read: ``float``
+        :param max_read: ``float``
+        :param log_name: ``str`` This is used to log against an existing log
+                                 handler.
+        """
+        self.log = logger.getLogger(log_name)
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.bounds = {
+            'connect': (min_connect, max_connect),
+            'read': (min_read, max_read)
+        }
+
+        self._latency = {}
+        self._lock = threading.Lock()
+        self._stats = {'observed': 0, 'timeouts': 0, 'adapted': 0}
+
+    @property
+    def stats(self):
+        """Return a copy of the timeout counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _histogram(self, host, phase):
+        with self._lock:
+            key = (host, phase)
+            if key not in self._latency:
+                self._latency[key] = http_metrics.Histogram()
+            return self._latency[key]
+
+    def observe(self, host, phase, seconds):
+        """Record the latency of a ``connect`` or ``read`` phase.
+
+        :param host: ``str``
+        :param phase: ``str``
+        :param seconds: ``float``
+        """
+        self._histogram(host, phase).observe(seconds)
+
+    def _learned(self, host, phase):
+        histogram = self._histogram(host, phase)
+        if histogram.count < self.min_samples:
+            return None
+
+        low, high = self.bounds[phase]
+        value = histogram.percentile(self.percentile) * self.multiplier
+        value = max(value, low)
+        if high is not None:
+            value = min(value, high)
+        return value
+
+    def timeout(self, host, default=None):
+        """Return the ``(connect, read)`` timeout for a request to ``host``.
+
+        :param host: ``str``
+        :param default: ``float`` || ``tuple`` Used for phases which do not
+                                              have enough samples.
+        :return: ``tuple``
+        """
+        connect, read = split_timeout(default)
+        learned_connect = self._learned(host, 'connect')
+        learned_read = self._learned(host, 'read')
+        if learned_connect is not None or learned_read is not None:
+            self._count('adapted')
+        if learned_connect is not None:
+            connect = learned_connect
+        if learned_read is not None:
+            read = learned_read
+        return connect, read
+
+    def __call__(self, timing):
+        """Record the phases of a finished request.
+
+        :param timing: ``object`` A ``http_metrics.RequestTiming``.
+        """
+        if isinstance(timing.error, requests.Timeout):
+            self._count('timeouts')
+            connect, read = split_timeout(timing.timeout)
+            if isinstance(timing.error, requests.ConnectTimeout):
+                if connect is not None:
+                    self.observe(timing.host, 'connect', connect)
+            elif read is not None:
+                self.observe(timing.host, 'read', read)
+            return
+
+        if timing.error is not None or timing.ttfb is None:
+            return
+
+        self._count('observed')
+        setup = (timing.connect or 0) + (timing.tls or 0)
+        # Reused connections do not report a connect time
+        if timing.connect:
+            self.observe(timing.host, 'connect', setup)
+        waited = timing.ttfb - setup - (timing.dns or 0)
+        self.observe(timing.host, 'read', max(waited, 0))
+
+
+def build_adaptive_timeout(config, log_name=__name__):
+    """Return the adaptive timeout described by ``config``.
+
+    ``adaptive_timeout`` may be an ``AdaptiveTimeout``, a dictionary of its
+    arguments or True to use the defaults.
+
+    :param config: ``dict``
+    :param log_name: ``str``
+    :return: ``object`` || ``None``
+    """
+    adaptive = config.get('adaptive_timeout')
+    if adaptive is True:
+        adaptive = AdaptiveTimeout(log_name=log_name)
+    elif isinstance(adaptive, dict):
+        adaptive = AdaptiveTimeout(log_name=log_name, **adaptive)
+    return adaptive or None
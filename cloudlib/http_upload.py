@@ -0,0 +1,219 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Example Usage:
+>>> from cloudlib import http
+>>> make_req = http.MakeRequest()
+>>> resp, digest = make_req.upload(
+...     'https://example.com/backups/backup.tar.gz',
+...     local_file='/var/backups/backup.tar.gz'
+... )
+
+>>> # Bodies can also be passed to post, put and patch directly.
+>>> from cloudlib import http_upload
+>>> def lines():
+...     for i in range(1000):
+...         yield ('line %s\\n' % i).encode('utf-8')
+>>> body = http_upload.IterBody(lines(), hash_type='sha256')
+>>> resp = make_req.post('https://example.com/logs', body=body)
+>>> print(body.hexdigest())
+"""
+
+import hashlib
+import mmap
+import os
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadBody(object):
+
+    # Set when the body can be sent again from the start
+    rewindable = False
+
+    def __init__(self, hash_type='md5', progress=None, throttle=None):
+        """Base of the streamed request bodies.
+
+        Every block handed to the transport is fed into the hasher and
+        reported to ``progress`` in the same pass, so the body is never
+        held in memory.
+
+        :param hash_type: ``str`` Any algorithm supported by ``hashlib``, or
+                                  ``None`` to skip hashing.
+        :param progress: ``callable`` Called with the bytes sent so far and
+                                      the total size, ``None`` if unknown.
+        :param throttle: ``callable`` Called with the size of every block
+                                      before it is sent, may block to limit
+                                      the bandwidth used.
+        """
+        self.hash_type = hash_type
+        self.progress = progress
+        self.throttle = throttle
+        self.bytes_read = 0
+        self._hash = None
+        self._reset_hash()
+
+    def _reset_hash(self):
+        if self.hash_type is not None:
+            self._hash = hashlib.new(self.hash_type)
+
+    @property
+    def total(self):
+        return None
+
+    def _consumed(self, data):
+        if data:
+            if self.throttle is not None:
+                self.throttle(len(data))
+            self.bytes_read += len(data)
+            if self._hash is not None:
+                self._hash.update(data)
+            if self.progress is not None:
+                self.progress(self.bytes_read, self.total)
+        return data
+
+    def hexdigest(self):
+        """Return the hex digest of everything sent so far.
+
+        :return: ``str`` || ``None``
+        """
+        if self._hash is not None:
+            return self._hash.hexdigest()
+
+    def rewind(self):
+        """Start the body over, used when a request is retried."""
+        raise IOError('%s can not be rewound' % self.__class__.__name__)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class FileBody(UploadBody):
+
+    rewindable = True
+
+    def __init__(self, local_file, chunk_size=CHUNK_SIZE, use_mmap=False,
+                 hash_type='md5', progress=None, offset=0, length=None,
+                 throttle=None):
+        """Stream the content of ``local_file``.
+
+        The size of the file is known so it is sent with a
+        ``Content-Length`` header. When ``use_mmap`` is True the file is
+        mapped into memory and blocks are sliced from the mapping instead
+        of being read with system calls, the pages are loaded lazily by the
+        kernel so memory use does not grow with the file size.
+
+        Only part of the file is sent when ``offset`` or ``length`` are
+        set, which is used to upload the parts of a multipart upload.
+
+        :param local_file: ``str``
+        :param chunk_size: ``int``
+        :param use_mmap: ``bol``
+        :param hash_type: ``str``
+        :param progress: ``callable``
+        :param offset: ``int`` First byte of the file to send.
+        :param length: ``int`` Number of bytes to send, defaults to the rest
+                               of the file.
+        :param throttle: ``callable``
+        """
+        super(FileBody, self).__init__(
+            hash_type=hash_type, progress=progress, throttle=throttle
+        )
+        self.local_file = local_file
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self._file = open(local_file, 'rb')
+        file_size = os.fstat(self._file.fileno()).st_size
+        self._size = max(file_size - offset, 0)
+        if length is not None:
+            self._size = min(self._size, length)
+        self._file.seek(offset)
+        self._map = None
+        # Empty files can not be mapped
+        if use_mmap and self._size:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+    @property
+    def total(self):
+        return self._size
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size=-1):
+        """Return up to ``size`` bytes of the file.
+
+        :param size: ``int``
+        :return: ``bytes``
+        """
+        remaining = self._size - self.bytes_read
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+
+        if self._map is not None:
+            start = self.offset + self.bytes_read
+            data = self._map[start:start + size]
+        else:
+            data = self._file.read(size)
+        return self._consumed(data)
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b'')
+
+    def rewind(self):
+        self._file.seek(self.offset)
+        self.bytes_read = 0
+        self._reset_hash()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class IterBody(UploadBody):
+
+    def __init__(self, iterator, hash_type='md5', progress=None,
+                 throttle=None):
+        """Stream the blocks produced by ``iterator``.
+
+        The size is not known up front so the body is sent using chunked
+        transfer encoding. Text blocks are encoded as utf-8.
+
+        :param iterator: ``object`` Any iterable of bytes or text.
+        :param hash_type: ``str``
+        :param progress: ``callable``
+        :param throttle: ``callable``
+        """
+        super(IterBody, self).__init__(
+            hash_type=hash_type, progress=progress, throttle=throttle
+        )
+        self.iterator = iterator
+
+    def __iter__(self):
+        for data in self.iterator:
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
+            if data:
+                yield self._consumed(data)
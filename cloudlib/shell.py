@@ -12,15 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import errno
 import hashlib
 import os
 import subprocess
+import threading
+import time
+
+# Added for python3 support
+try:
+    import Queue as queue
+except ImportError:
+    import queue
 
 import cloudlib
 from cloudlib import logger
 
 
+monotonic = getattr(time, 'monotonic', time.time)
+
+
+CommandResult = collections.namedtuple(
+    'CommandResult',
+    ['index', 'command', 'output', 'success', 'returncode', 'duration']
+)
+
+
 class ShellCommands(object):
 
     def __init__(self, log_name=__name__, debug=False):
@@ -60,6 +78,25 @@ class ShellCommands(object):
         :param execute: ``str``
         :param return_code: ``int``
         """
+        output, success, _ = self._run_command(
+            command=command,
+            shell=shell,
+            env=env,
+            execute=execute,
+            return_code=return_code
+        )
+        return output, success
+
+    def _run_command(self, command, shell, env, execute, return_code):
+        """Run a shell command and return its outcome and return code.
+
+        :param command: ``str``
+        :param shell: ``bol``
+        :param env: ``dict``
+        :param execute: ``str``
+        :param return_code: ``int``
+        :return: ``tuple`` (output, success, returncode)
+        """
         self.log.info('Command: [ %s ]', command)
 
         if env is None:
@@ -87,10 +124,85 @@ class ShellCommands(object):
 
         if process.returncode not in return_code:
             self.log.debug('Command Output: %s, Error Msg: %s', output, error)
-            return error, False
+            return error, False, process.returncode
         else:
             self.log.debug('Command Output: %s', output)
-            return output, True
+            return output, True, process.returncode
+
+    def _run_many_worker(self, work_q, result_q, options):
+        while True:
+            try:
+                index, command = work_q.get_nowait()
+            except queue.Empty:
+                return
+
+            start = monotonic()
+            try:
+                output, success, returncode = self._run_command(
+                    command=command, **options
+                )
+            except Exception as exp:
+                self.log.error('Command [ %s ] failed to start %s',
+                               command, exp)
+                output, success, returncode = str(exp), False, None
+            result_q.put(
+                CommandResult(
+                    index=index,
+                    command=command,
+                    output=output,
+                    success=success,
+                    returncode=returncode,
+                    duration=monotonic() - start
+                )
+            )
+
+    def run_many(self, commands, max_parallel=4, shell=True, env=None,
+                 execute='/bin/bash', return_code=None):
+        """Run several independent shell commands at the same time.
+
+        At most ``max_parallel`` commands run at once. A ``CommandResult``
+        is yielded for every command as soon as it finishes, so results do
+        not come back in the order of ``commands``, use its ``index`` to
+        match them. ``output`` and ``success`` are the values
+        ``run_command`` would have returned for the same ``return_code``.
+        ``returncode`` is None when the command could not be started.
+
+        The remaining options are passed to every command, see
+        ``run_command``.
+
+        :param commands: ``list``
+        :param max_parallel: ``int``
+        :param shell: ``bol``
+        :param env: ``dict``
+        :param execute: ``str``
+        :param return_code: ``int``
+        :return: ``iter``
+        """
+        work_q = queue.Queue()
+        for index, command in enumerate(commands):
+            work_q.put((index, command))
+
+        total = work_q.qsize()
+        if not total:
+            return
+
+        options = {
+            'shell': shell,
+            'env': env,
+            'execute': execute,
+            'return_code': return_code
+        }
+        result_q = queue.Queue()
+        for _ in range(max(1, min(max_parallel, total))):
+            thread = threading.Thread(
+                target=self._run_many_worker,
+                args=(work_q, result_q, options)
+            )
+            thread.daemon = True
+            thread.start()
+
+        for _ in range(total):
+            yield result_q.get()
 
     def mkdir_p(self, path):
         """Python implementation of `mkdir -p <path>`
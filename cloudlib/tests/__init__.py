@@ -12,6 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import threading
+
+import requests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+    import SocketServer as socketserver
+except ImportError:
+    import http.server as server
+    import socketserver
+
 
 def test_Exception_exception():
     """Raise Exception exception."""
@@ -119,6 +132,20 @@ class FakeHttpResponse(object):
         self.response = 'response'
         self.request = 'FakeRequest'
 
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        content = self.content
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError('%s %s' % (self.status_code, self.reason))
+
+    def close(self):
+        pass
+
 
 class FakeHttp(object):
     """Setup a FAKE http request."""
@@ -144,6 +171,96 @@ class FakeHttp(object):
         return FakeHttpResponse(*args, **kwargs)
 
 
+class LocalServer(socketserver.ThreadingMixIn, server.HTTPServer):
+    """Serve a request handler on a free local port from a thread."""
+    daemon_threads = True
+
+    def __init__(self, handler, poll_interval=0.01):
+        server.HTTPServer.__init__(self, ('127.0.0.1', 0), handler)
+        self.port = self.server_address[1]
+        self.url = 'http://127.0.0.1:%s/' % self.port
+        self.stopped = False
+        self.thread = threading.Thread(
+            target=self.serve_forever, args=(poll_interval,)
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        if not self.stopped:
+            self.stopped = True
+            self.shutdown()
+            self.server_close()
+
+
+class FakeRangeHttp(object):
+    """Setup a FAKE http server object which honors Range headers."""
+    def __init__(self, content, accept_ranges='bytes'):
+        self.content = content
+        self.accept_ranges = accept_ranges
+        self.ranges = []
+        self.fail_ranges = []
+
+    def head(self, *args, **kwargs):
+        resp = FakeHttpResponse()
+        resp.content = b''
+        resp.headers = {
+            'Content-Length': str(len(self.content)),
+            'Accept-Ranges': self.accept_ranges,
+            'ETag': '"fake-etag"'
+        }
+        return resp
+
+    def get(self, *args, **kwargs):
+        resp = FakeHttpResponse()
+        resp.content = self.content
+        range_header = kwargs.get('headers', {}).get('Range')
+        if range_header is not None:
+            start, end = range_header.split('=')[1].split('-')
+            self.ranges.append((int(start), int(end)))
+            if (int(start), int(end)) in self.fail_ranges:
+                resp.status_code = 500
+            else:
+                resp.status_code = 206
+                resp.content = self.content[int(start):int(end) + 1]
+        return resp
+
+
+class FakePagedHttp(object):
+    """Setup a FAKE http list endpoint which returns items in pages."""
+    def __init__(self, items, page_size=2, key=None, link=False):
+        self.items = items
+        self.page_size = page_size
+        self.key = key
+        self.link = link
+        self.requests = []
+
+    def get(self, url, headers=None, params=None, **kwargs):
+        params = dict(params or {})
+        if '?start=' in url:
+            url, start = url.split('?start=')
+            params['offset'] = start
+        self.requests.append((url, params))
+
+        start = int(params.get('offset', 0))
+        if 'marker' in params:
+            ids = [i['id'] for i in self.items]
+            start = ids.index(params['marker']) + 1
+        limit = int(params.get('limit', self.page_size))
+        page = self.items[start:start + limit]
+
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        body = page if self.key is None else {self.key: page}
+        resp._content = json.dumps(body).encode('utf-8')
+        if self.link and start + limit < len(self.items):
+            resp.headers['Link'] = '<%s?start=%s>; rel="next"' % (
+                url, start + limit
+            )
+        return resp
+
+
 class ParseResult(object):
     scheme = 'https'
     netloc = 'TEST.url'
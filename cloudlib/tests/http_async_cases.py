@@ -0,0 +1,345 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import ssl
+import time
+import unittest
+import zlib
+
+from urllib import parse as urlparse
+
+import mock
+import requests
+
+from cloudlib import http_async
+from cloudlib import http_breaker
+from cloudlib import tests
+
+
+class FakeAsyncServer(object):
+    """A minimal HTTP/1.1 server used to answer the async client."""
+
+    def __init__(self):
+        self.server = None
+        self.connections = 0
+        self.requests = []
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self.handle, '127.0.0.1', 0
+        )
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return 'http://%s:%s' % (host, port)
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(' ')
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b'\r\n':
+                        break
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(
+                    int(headers.get('content-length', 0))
+                )
+                self.requests.append((method, path, headers, body))
+                if path == '/delay':
+                    await asyncio.sleep(0.2)
+                writer.write(self.respond(method, path, body))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    @staticmethod
+    def respond(method, path, body):
+        if path.startswith('/redirect'):
+            location = urlparse.parse_qs(
+                urlparse.urlsplit(path).query
+            ).get('to', ['/'])[0]
+            return b''.join([
+                b'HTTP/1.1 302 Found\r\n',
+                b'Location: %s\r\n' % location.encode('utf-8'),
+                b'Content-Length: 0\r\n\r\n'
+            ])
+        elif path == '/chunked':
+            return (
+                b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                b'4\r\ntest\r\n4\r\nbody\r\n0\r\n\r\n'
+            )
+        elif path == '/deflate':
+            content = zlib.compress(b'testbody' * 1000)
+            return b''.join([
+                b'HTTP/1.1 200 OK\r\nContent-Encoding: deflate\r\n',
+                b'Content-Length: %d\r\n\r\n' % len(content),
+                content
+            ])
+        elif path == '/slow':
+            return b''
+
+        content = body or b'testbody'
+        if method == 'HEAD':
+            content = b''
+        return b''.join([
+            b'HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n',
+            b'Content-Length: %d\r\n\r\n' % len(body or b'testbody'),
+            content
+        ])
+
+
+class TestAsyncMakeRequest(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_async.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.fakeserver = FakeAsyncServer()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def run_client(self, func, config=None):
+        async def runner():
+            url = await self.fakeserver.start()
+            try:
+                async with http_async.AsyncMakeRequest(config) as make_req:
+                    return await func(make_req, url)
+            finally:
+                await self.fakeserver.stop()
+
+        return asyncio.run(runner())
+
+    def test_custom_headers(self):
+        config = {'headers': {'X-Test-Header': 'TEST'}}
+        make_req = http_async.AsyncMakeRequest(config=config)
+        self.assertEqual(make_req.headers['X-Test-Header'], 'TEST')
+        self.assertEqual(make_req.headers['User-Agent'], 'cloudlib')
+
+    def test_timeout_set(self):
+        config = {'timeout': 120}
+        make_req = http_async.AsyncMakeRequest(config=config)
+        self.assertEqual(make_req.request_kwargs['timeout'], 120)
+
+    def test_get_request(self):
+        resp = self.run_client(lambda m, u: m.get(u + '/'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'testbody')
+        self.assertEqual(resp.text, 'testbody')
+
+    def test_get_request_headers(self):
+        self.run_client(lambda m, u: m.get(u, headers={'test1': 'test1'}))
+        method, path, headers, _ = self.fakeserver.requests[0]
+        self.assertEqual(headers['test1'], 'test1')
+        self.assertEqual(headers['user-agent'], 'cloudlib')
+
+    def test_get_request_params(self):
+        self.run_client(
+            lambda m, u: m.get(u + '/', kwargs={'params': {'a': 1}})
+        )
+        self.assertEqual(self.fakeserver.requests[0][1], '/?a=1')
+
+    def test_post_request_body(self):
+        resp = self.run_client(lambda m, u: m.post(u, body='TestBody'))
+        self.assertEqual(resp.content, b'TestBody')
+        self.assertEqual(self.fakeserver.requests[0][0], 'POST')
+
+    def test_unsupported_body(self):
+        self.assertRaises(
+            TypeError, http_async.AsyncMakeRequest._encode_body, 1, {}
+        )
+        self.assertEqual(
+            http_async.AsyncMakeRequest._encode_body(bytearray(b'ab'), {}),
+            b'ab'
+        )
+
+    def test_head_request(self):
+        resp = self.run_client(lambda m, u: m.head(u))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, b'')
+
+    def test_option_request(self):
+        self.run_client(lambda m, u: m.option(u))
+        self.assertEqual(self.fakeserver.requests[0][0], 'OPTIONS')
+
+    def test_chunked_response(self):
+        resp = self.run_client(lambda m, u: m.get(u + '/chunked'))
+        self.assertEqual(resp.content, b'testbody')
+
+    def test_compressed_response(self):
+        resp = self.run_client(lambda m, u: m.get(u + '/deflate'))
+        self.assertEqual(resp.content, b'testbody' * 1000)
+        headers = self.fakeserver.requests[0][2]
+        self.assertIn('gzip', headers['accept-encoding'])
+
+    def test_ssl_context_reused(self):
+        make_req = http_async.AsyncMakeRequest()
+        verified = make_req._ssl_context(True)
+        self.assertIs(make_req._ssl_context(True), verified)
+        self.assertIs(make_req._ssl_context(None), verified)
+        unverified = make_req._ssl_context(False)
+        self.assertIsNot(unverified, verified)
+        self.assertEqual(unverified.verify_mode, ssl.CERT_NONE)
+        self.assertEqual(verified.verify_mode, ssl.CERT_REQUIRED)
+
+    def test_redirect(self):
+        resp = self.run_client(lambda m, u: m.get(u + '/redirect'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.history), 1)
+
+    def test_redirect_other_origin(self):
+        async def redirect(make_req, url):
+            # localhost and 127.0.0.1 are different hosts to the client
+            other = url.replace('127.0.0.1', 'localhost') + '/'
+            return await make_req.get(
+                '%s/redirect?to=%s' % (url, urlparse.quote(other)),
+                headers={'Authorization': 'Bearer token', 'X-Test': 'test'}
+            )
+
+        self.run_client(redirect)
+        first, second = [r[2] for r in self.fakeserver.requests]
+        self.assertEqual(first['authorization'], 'Bearer token')
+        self.assertNotIn('authorization', second)
+        self.assertEqual(second['x-test'], 'test')
+
+    def test_redirect_same_origin_keeps_auth(self):
+        self.run_client(lambda m, u: m.get(
+            u + '/redirect', headers={'X-Auth-Token': 'token'}
+        ))
+        headers = self.fakeserver.requests[1][2]
+        self.assertEqual(headers['x-auth-token'], 'token')
+
+    def test_redirect_post_to_get(self):
+        self.run_client(lambda m, u: m.post(
+            u + '/redirect',
+            body='TestBody',
+            headers={'Content-Type': 'text/plain'}
+        ))
+        method, path, headers, body = self.fakeserver.requests[1]
+        self.assertEqual(method, 'GET')
+        self.assertEqual(body, b'')
+        self.assertNotIn('content-type', headers)
+        self.assertNotIn('content-length', headers)
+
+    def test_connection_reuse(self):
+        async def many(make_req, url):
+            for _ in range(5):
+                await make_req.get(url)
+
+        self.run_client(many)
+        self.assertEqual(self.fakeserver.connections, 1)
+        self.assertEqual(len(self.fakeserver.requests), 5)
+
+    def test_concurrent_requests(self):
+        async def many(make_req, url):
+            return await asyncio.gather(
+                *[make_req.get(url) for _ in range(20)]
+            )
+
+        resps = self.run_client(many, config={'pool_maxsize': 4})
+        self.assertEqual(len(resps), 20)
+        self.assertTrue(self.fakeserver.connections <= 4)
+
+    def test_max_per_host(self):
+        async def many(make_req, url):
+            return await asyncio.gather(
+                *[make_req.get(url) for _ in range(10)]
+            )
+
+        resps = self.run_client(many, config={'max_per_host': 1})
+        self.assertEqual(len(resps), 10)
+        self.assertEqual(self.fakeserver.connections, 1)
+
+    def test_max_per_host_not_timed(self):
+        async def many(make_req, url):
+            return await asyncio.gather(*[
+                make_req.get(url + '/delay', kwargs={'timeout': 0.5})
+                for _ in range(4)
+            ])
+
+        # Waiting for the host slot does not count against the timeout
+        resps = self.run_client(many, config={'max_per_host': 1})
+        self.assertEqual([i.status_code for i in resps], [200] * 4)
+
+    def test_queued_requests_not_breaker_failures(self):
+        async def many(make_req, url):
+            await asyncio.gather(*[
+                make_req.get(url + '/delay', kwargs={'timeout': 0.5})
+                for _ in range(4)
+            ])
+            return make_req.breaker.states()
+
+        config = {
+            'max_per_host': 1,
+            'circuit_breaker': {'failure_threshold': 1}
+        }
+        states = self.run_client(many, config=config)
+        circuit = list(states.values())[0]
+        self.assertEqual(circuit['state'], 'closed')
+        self.assertEqual(circuit['failures'], 0)
+
+    def test_rate_limit(self):
+        async def many(make_req, url):
+            return await asyncio.gather(
+                *[make_req.get(url) for _ in range(3)]
+            )
+
+        config = {'rate_limit': {'rate': 20, 'burst': 1}}
+        start = time.time()
+        self.run_client(many, config=config)
+        self.assertTrue(time.time() - start >= 0.09)
+
+    def test_timeout(self):
+        self.assertRaises(
+            requests.Timeout,
+            self.run_client,
+            lambda m, u: m.get(u + '/slow', kwargs={'timeout': 0.1})
+        )
+
+    def test_circuit_breaker(self):
+        async def refused(make_req, url):
+            await self.fakeserver.stop()
+            for _ in range(2):
+                try:
+                    await make_req.get(url)
+                except requests.ConnectionError:
+                    pass
+            await self.fakeserver.start()
+            return await make_req.get(url)
+
+        self.assertRaises(
+            http_breaker.CircuitOpenError,
+            self.run_client,
+            refused,
+            config={'circuit_breaker': {'failure_threshold': 2}}
+        )
+
+    def test_request_failure(self):
+        self.assertRaises(
+            requests.RequestException,
+            self.run_client,
+            lambda m, u: m._request('BadMethod', u)
+        )
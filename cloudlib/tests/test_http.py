@@ -12,12 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
 import mock
 import requests
 
+import cloudlib
 from cloudlib import http
+from cloudlib import http_adapter
 from cloudlib import tests
 
 
@@ -46,10 +54,17 @@ class TestHttpMakeRequest(unittest.TestCase):
 
     def test_enable_debug(self):
         config = {'debug': True}
-        http.MakeRequest(config=config)
-        debug_level = http.httplib.HTTPConnection.debuglevel
-        self.assertEqual(1, debug_level)
-        http.httplib.HTTPConnection.debuglevel = 0
+        make_request = http.MakeRequest(config=config)
+        adapter = make_request.session.get_adapter('http://localhost')
+        pool_classes = adapter.poolmanager.pool_classes_by_scheme
+        for pool_cls in pool_classes.values():
+            self.assertEqual(1, pool_cls.ConnectionCls.debuglevel)
+        # Debugging must not leak into other clients
+        self.assertEqual(0, http_adapter.connection.HTTPConnection.debuglevel)
+        make_request = http.MakeRequest()
+        adapter = make_request.session.get_adapter('http://localhost')
+        pool_cls = adapter.poolmanager.pool_classes_by_scheme['http']
+        self.assertEqual(0, pool_cls.ConnectionCls.debuglevel)
 
     def test_timeout_set(self):
         config = {'timeout': 120}
@@ -57,6 +72,35 @@ class TestHttpMakeRequest(unittest.TestCase):
         timeout = make_request.request_kwargs['timeout']
         self.assertEqual(config['timeout'], timeout)
 
+    def test_pool_config(self):
+        config = {'pool_connections': 2, 'pool_maxsize': 20}
+        make_request = http.MakeRequest(config=config)
+        adapter = make_request.session.get_adapter(self.url)
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 20)
+        self.assertEqual(adapter._pool_block, False)
+
+    def test_session_shared_adapter(self):
+        http_adapter = self.make_req.session.get_adapter(self.url)
+        https_adapter = self.make_req.session.get_adapter('https://test')
+        self.assertIs(http_adapter, https_adapter)
+
+    def test_keep_alive_disabled(self):
+        config = {'keep_alive': False}
+        make_request = http.MakeRequest(config=config)
+        self.assertEqual(make_request.session.headers['Connection'], 'close')
+
+    def test_close(self):
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            self.make_req.close()
+        self.assertTrue(mock_session.close.called)
+
+    def test_context_manager(self):
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            with self.make_req as make_request:
+                self.assertIs(make_request, self.make_req)
+        self.assertTrue(mock_session.close.called)
+
     def test_report_error(self):
         self.assertRaises(
             requests.RequestException,
@@ -66,146 +110,146 @@ class TestHttpMakeRequest(unittest.TestCase):
         )
 
     def test_get_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.get = self.fakehttp.get
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
             resp = self.make_req.get(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_get_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.get = self.fakehttp.get
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
             resp = self.make_req.get(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_get_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.get = self.fakehttp.get
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
             resp = self.make_req.get(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_head_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.head = self.fakehttp.head
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = self.fakehttp.head
             resp = self.make_req.head(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_head_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.head = self.fakehttp.head
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = self.fakehttp.head
             resp = self.make_req.head(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_head_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.head = self.fakehttp.head
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = self.fakehttp.head
             resp = self.make_req.head(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_put_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.put = self.fakehttp.put
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.put = self.fakehttp.put
             resp = self.make_req.put(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_put_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.put = self.fakehttp.put
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.put = self.fakehttp.put
             resp = self.make_req.put(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_put_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.put = self.fakehttp.put
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.put = self.fakehttp.put
             resp = self.make_req.put(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_put_request_body(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.put = self.fakehttp.put
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.put = self.fakehttp.put
             resp = self.make_req.put(self.url, body='TestBody')
         self.assertEqual(resp.status_code, 200)
 
     def test_delete_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.delete = self.fakehttp.delete
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.delete = self.fakehttp.delete
             resp = self.make_req.delete(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_delete_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.delete = self.fakehttp.delete
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.delete = self.fakehttp.delete
             resp = self.make_req.delete(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_delete_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.delete = self.fakehttp.delete
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.delete = self.fakehttp.delete
             resp = self.make_req.delete(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_post_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.post = self.fakehttp.post
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.post = self.fakehttp.post
             resp = self.make_req.post(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_post_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.post = self.fakehttp.post
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.post = self.fakehttp.post
             resp = self.make_req.post(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_post_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.post = self.fakehttp.post
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.post = self.fakehttp.post
             resp = self.make_req.post(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_post_request_body(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.post = self.fakehttp.post
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.post = self.fakehttp.post
             resp = self.make_req.post(self.url, body='TestBody')
         self.assertEqual(resp.status_code, 200)
 
     def test_patch_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.patch = self.fakehttp.patch
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.patch = self.fakehttp.patch
             resp = self.make_req.patch(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_patch_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.patch = self.fakehttp.patch
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.patch = self.fakehttp.patch
             resp = self.make_req.patch(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_patch_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.patch = self.fakehttp.patch
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.patch = self.fakehttp.patch
             resp = self.make_req.patch(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
     def test_patch_request_body(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.patch = self.fakehttp.patch
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.patch = self.fakehttp.patch
             resp = self.make_req.patch(self.url, body='TestBody')
         self.assertEqual(resp.status_code, 200)
 
     def test_option_request(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.option = self.fakehttp.option
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.options = self.fakehttp.option
             resp = self.make_req.option(self.url)
         self.assertEqual(resp.status_code, 200)
 
     def test_option_request_headers(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.option = self.fakehttp.option
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.options = self.fakehttp.option
             resp = self.make_req.option(self.url, headers={'test1': 'test1'})
         self.assertEqual(resp.status_code, 200)
 
     def test_option_request_kwargs(self):
-        with mock.patch('cloudlib.http.requests') as mock_request:
-            mock_request.option = self.fakehttp.option
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.options = self.fakehttp.option
             resp = self.make_req.option(self.url, kwargs={'timeout': 1})
         self.assertEqual(resp.status_code, 200)
 
@@ -217,6 +261,408 @@ class TestHttpMakeRequest(unittest.TestCase):
             self.url
         )
 
+    def test_batch_request(self):
+        batch = [('get', self.url), ('post', self.url, None, 'TestBody')]
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            mock_session.post = self.fakehttp.post
+            results = list(self.make_req.batch(batch, workers=2))
+        self.assertEqual(len(results), 2)
+        for result in results:
+            self.assertTrue(result.ok)
+            self.assertEqual(result.response.status_code, 200)
+
+    def test_batch_request_ordered(self):
+        batch = [('get', '%s/%s' % (self.url, i)) for i in range(20)]
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            results = list(
+                self.make_req.batch(batch, workers=4, ordered=True)
+            )
+        self.assertEqual([r.index for r in results], list(range(20)))
+        self.assertEqual([r.url for r in results], [b[1] for b in batch])
+
+    def test_batch_request_failure(self):
+        batch = [('get', self.url), ('BadMethod', self.url)]
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            del mock_session.badmethod
+            results = list(self.make_req.batch(batch, ordered=True))
+        self.assertTrue(results[0].ok)
+        self.assertFalse(results[1].ok)
+        self.assertTrue(
+            isinstance(results[1].error, requests.RequestException)
+        )
+
+    def test_batch_request_stop_early(self):
+        batch = [('get', self.url) for _ in range(50)]
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            results = self.make_req.batch(batch, workers=2)
+            self.assertTrue(next(results).ok)
+            results.close()
+
+    def test_download(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        md5sum = hashlib.md5(b'testbody').hexdigest()
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            digest = self.make_req.download(
+                self.url, local_file=local_file, md5sum=md5sum
+            )
+        self.assertEqual(digest, md5sum)
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), b'testbody')
+        self.assertEqual(os.listdir(tmpdir), ['download'])
+
+    def test_download_chunk_size(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        make_req = http.MakeRequest(config={'chunk_size': 3})
+        fake_resp = tests.FakeHttpResponse()
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.return_value = fake_resp
+            with mock.patch.object(
+                    fake_resp, 'iter_content', wraps=fake_resp.iter_content
+            ) as iter_content:
+                make_req.download(self.url, local_file=local_file)
+        iter_content.assert_called_with(chunk_size=3)
+        call_kwargs = mock_session.get.call_args[1]
+        self.assertTrue(call_kwargs['stream'])
+
+    def test_download_checksum_mismatch(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            self.assertRaises(
+                cloudlib.MD5CheckMismatch,
+                self.make_req.download,
+                self.url,
+                local_file=local_file,
+                md5sum='00000000'
+            )
+        self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_download_http_error(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fake_resp = tests.FakeHttpResponse()
+        fake_resp.status_code = 404
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get.return_value = fake_resp
+            self.assertRaises(
+                requests.RequestException,
+                self.make_req.download,
+                self.url,
+                local_file=os.path.join(tmpdir, 'download')
+            )
+        self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_ranged_download(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        content = os.urandom(1000)
+        fakehttp = tests.FakeRangeHttp(content)
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = fakehttp.head
+            mock_session.get = fakehttp.get
+            digest = self.make_req.ranged_download(
+                self.url,
+                local_file=local_file,
+                segments=4,
+                md5sum=hashlib.md5(content).hexdigest()
+            )
+        self.assertEqual(digest, hashlib.md5(content).hexdigest())
+        self.assertEqual(
+            sorted(fakehttp.ranges),
+            [(0, 249), (250, 499), (500, 749), (750, 999)]
+        )
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(os.listdir(tmpdir), ['download'])
+
+    def test_ranged_download_workers(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        content = os.urandom(800)
+        fakehttp = tests.FakeRangeHttp(content)
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = fakehttp.head
+            mock_session.get = fakehttp.get
+            self.make_req.ranged_download(
+                self.url,
+                local_file=os.path.join(tmpdir, 'download'),
+                segments=8,
+                workers=1
+            )
+        # A single worker fetches the segments one after the other
+        self.assertEqual(
+            fakehttp.ranges,
+            [(start, start + 99) for start in range(0, 800, 100)]
+        )
+
+    def test_ranged_download_resume(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        content = os.urandom(1000)
+        fakehttp = tests.FakeRangeHttp(content)
+        fakehttp.fail_ranges = [(250, 499)]
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = fakehttp.head
+            mock_session.get = fakehttp.get
+            self.assertRaises(
+                requests.RequestException,
+                self.make_req.ranged_download,
+                self.url,
+                local_file=local_file,
+                segments=4
+            )
+            self.assertEqual(
+                sorted(os.listdir(tmpdir)),
+                ['download.part', 'download.state']
+            )
+
+            fakehttp.ranges = []
+            fakehttp.fail_ranges = []
+            self.make_req.ranged_download(
+                self.url, local_file=local_file, segments=4
+            )
+        self.assertEqual(fakehttp.ranges, [(250, 499)])
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_ranged_download_no_range_support(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        local_file = os.path.join(tmpdir, 'download')
+        fakehttp = tests.FakeRangeHttp(b'testbody', accept_ranges='none')
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = fakehttp.head
+            mock_session.get = fakehttp.get
+            self.make_req.ranged_download(self.url, local_file=local_file)
+        self.assertEqual(fakehttp.ranges, [])
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), b'testbody')
+
+    def test_ranged_download_checksum_mismatch(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        fakehttp = tests.FakeRangeHttp(os.urandom(100))
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.head = fakehttp.head
+            mock_session.get = fakehttp.get
+            self.assertRaises(
+                cloudlib.MD5CheckMismatch,
+                self.make_req.ranged_download,
+                self.url,
+                local_file=os.path.join(tmpdir, 'download'),
+                md5sum='00000000'
+            )
+        self.assertEqual(os.listdir(tmpdir), [])
+
+    def paginate(self, fakehttp, **kwargs):
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = fakehttp.get
+            return list(self.make_req.paginate(self.url, **kwargs))
+
+    def test_paginate_link_header(self):
+        items = [{'id': i} for i in range(5)]
+        fakehttp = tests.FakePagedHttp(items, link=True)
+        self.assertEqual(self.paginate(fakehttp), items)
+        self.assertEqual(len(fakehttp.requests), 3)
+
+    def test_paginate_marker(self):
+        items = [{'id': 'id%s' % i} for i in range(5)]
+        fakehttp = tests.FakePagedHttp(items, key='servers')
+        result = self.paginate(
+            fakehttp, items='servers', marker_param='marker', limit=2
+        )
+        self.assertEqual(result, items)
+        self.assertEqual(
+            [r[1].get('marker') for r in fakehttp.requests],
+            [None, 'id1', 'id3']
+        )
+
+    def test_paginate_offset(self):
+        items = [{'id': i} for i in range(6)]
+        fakehttp = tests.FakePagedHttp(items)
+        result = self.paginate(fakehttp, offset_param='offset', limit=3)
+        self.assertEqual(result, items)
+        self.assertEqual(
+            [r[1].get('offset') for r in fakehttp.requests],
+            [None, 3, 6]
+        )
+
+    def test_paginate_next_page_function(self):
+        items = [{'id': i} for i in range(4)]
+        fakehttp = tests.FakePagedHttp(items)
+        pages = ['%s/page2' % self.url]
+
+        def next_page(resp, page_items):
+            if pages:
+                return pages.pop()
+
+        result = self.paginate(fakehttp, next_page=next_page)
+        self.assertEqual(result, items[:2] * 2)
+        self.assertEqual(fakehttp.requests[1][0], '%s/page2' % self.url)
+
+    def test_paginate_prefetch(self):
+        items = [{'id': i} for i in range(5)]
+        fakehttp = tests.FakePagedHttp(items, link=True)
+        self.assertEqual(self.paginate(fakehttp, prefetch=True), items)
+
+    def test_paginate_lazy(self):
+        items = [{'id': i} for i in range(6)]
+        fakehttp = tests.FakePagedHttp(items, link=True)
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get = fakehttp.get
+            pager = self.make_req.paginate(self.url)
+            self.assertEqual(next(pager), items[0])
+            self.assertEqual(len(fakehttp.requests), 1)
+
+    def coalesced_gets(self, make_req, count=5, **get_kwargs):
+        calls = []
+
+        def get(*args, **kwargs):
+            calls.append(args)
+            time.sleep(0.1)
+            return tests.FakeHttpResponse()
+
+        results = []
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            threads = [
+                threading.Thread(
+                    target=lambda: results.append(
+                        make_req.get(self.url, **get_kwargs)
+                    )
+                )
+                for _ in range(count)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(results), count)
+        return calls
+
+    def test_coalesce_per_call(self):
+        calls = self.coalesced_gets(self.make_req, coalesce=True)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.make_req.single_flight.stats['coalesced'], 4)
+
+    def test_coalesce_disabled(self):
+        calls = self.coalesced_gets(self.make_req)
+        self.assertEqual(len(calls), 5)
+
+    def test_coalesce_url_pattern(self):
+        make_req = http.MakeRequest(config={'coalesce': ['example\\.com']})
+        self.assertEqual(len(self.coalesced_gets(make_req)), 1)
+
+        make_req = http.MakeRequest(config={'coalesce': ['other\\.com']})
+        self.assertEqual(len(self.coalesced_gets(make_req)), 5)
+
+    def test_coalesce_different_headers(self):
+        make_req = http.MakeRequest(config={'coalesce': True})
+        calls = []
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = lambda *a, **k: calls.append(a) or \
+                tests.FakeHttpResponse()
+            make_req.get(self.url, headers={'X-Auth-Token': 'one'})
+            make_req.get(self.url, headers={'X-Auth-Token': 'two'})
+        self.assertEqual(len(calls), 2)
+
+    def test_hooks(self):
+        events = []
+
+        def pre_request(method, url, headers, kwargs):
+            headers['X-Hooked'] = 'yes'
+            events.append(('pre', method, url))
+
+        config = {
+            'hooks': {
+                'pre_request': [pre_request],
+                'post_request': [events.append]
+            }
+        }
+        make_req = http.MakeRequest(config=config)
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.return_value = tests.FakeHttpResponse()
+            make_req.get(self.url)
+            self.assertEqual(
+                mock_session.get.call_args[1]['headers']['X-Hooked'], 'yes'
+            )
+        self.assertEqual(events[0], ('pre', 'get', self.url))
+        timing = events[1]
+        self.assertEqual(timing.method, 'GET')
+        self.assertEqual(timing.host, 'example.com')
+        self.assertEqual(timing.status_code, 200)
+        self.assertEqual(timing.bytes_received, len('testbody'))
+        self.assertTrue(timing.total >= 0)
+
+    def test_hooks_on_error(self):
+        timings = []
+        self.make_req.add_hook('post_request', timings.append)
+        with mock.patch.object(self.make_req, 'session') as mock_session:
+            mock_session.get.side_effect = requests.ConnectionError('down')
+            self.assertRaises(
+                requests.ConnectionError, self.make_req.get, self.url
+            )
+        self.assertEqual(len(timings), 1)
+        self.assertIsInstance(timings[0].error, requests.ConnectionError)
+        self.assertIsNone(timings[0].status_code)
+
+    def test_hook_raises(self):
+        def pre_request(method, url, headers, kwargs):
+            raise RuntimeError('no token')
+
+        config = {
+            'max_per_host': 1,
+            'circuit_breaker': {
+                'failure_threshold': 1, 'recovery_timeout': 0
+            }
+        }
+        make_req = http.MakeRequest(config=config)
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.side_effect = requests.ConnectionError('down')
+            self.assertRaises(requests.ConnectionError, make_req.get, self.url)
+
+            # The circuit is half-open, the hook takes the only trial
+            make_req.add_hook('pre_request', pre_request)
+            self.assertRaises(RuntimeError, make_req.get, self.url)
+            self.assertEqual(make_req.host_limiter.active('example.com'), 0)
+            self.assertEqual(
+                make_req.breaker.state('example.com'), 'half-open'
+            )
+
+            make_req.hooks['pre_request'].remove(pre_request)
+            mock_session.get.side_effect = None
+            mock_session.get.return_value = tests.FakeHttpResponse()
+            make_req.get(self.url)
+        self.assertEqual(make_req.breaker.state('example.com'), 'closed')
+
+    def test_add_hook_unknown_event(self):
+        self.assertRaises(
+            ValueError, self.make_req.add_hook, 'bad_event', lambda t: t
+        )
+
+    def test_metrics(self):
+        make_req = http.MakeRequest(config={'metrics': True})
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = self.fakehttp.get
+            for _ in range(3):
+                make_req.get(self.url)
+        snapshot = make_req.metrics.snapshot()
+        self.assertEqual(snapshot['example.com GET']['requests'], 3)
+        self.assertEqual(snapshot['example.com GET']['total']['count'], 3)
+
     def test_parse_url_double_slash_url(self):
         url = http.parse_url('//example.com')
         self.assertEqual(type(url), http.urlparse.ParseResult)
@@ -236,3 +682,65 @@ class TestHttpMakeRequest(unittest.TestCase):
         test_path = 'this%20is%20a%20test'
         url = http.html_encode(path='this is a test')
         self.assertEqual(url, test_path)
+
+    def test_html_encode_keeps_slash(self):
+        self.assertEqual(http.html_encode(path=u'a b/c\xe9'), 'a%20b/c%C3%A9')
+
+    def test_parse_url_cached(self):
+        url = http.parse_url('example.com/v1')
+        self.assertIs(http.parse_url('example.com/v1'), url)
+        self.assertEqual(url.netloc, 'example.com')
+        self.assertEqual(http.unparse_url(url), 'http://example.com/v1')
+
+    def test_parse_url_cache_bounded(self):
+        for i in range(http.URL_CACHE_SIZE + 10):
+            http.parse_url('http://example.com/%s' % i)
+        self.assertEqual(len(http._parsed_urls), http.URL_CACHE_SIZE)
+
+    def test_get_url(self):
+        url = http.parse_url('https://example.com/v1')
+        self.assertEqual(
+            http.MakeRequest._get_url(url), 'https://example.com/v1'
+        )
+        endpoint = http.Endpoint('https://example.com/v1', {'a': 1})
+        self.assertEqual(
+            http.MakeRequest._get_url(endpoint), 'https://example.com/v1?a=1'
+        )
+
+
+class TestEndpoint(unittest.TestCase):
+    def test_url(self):
+        endpoint = http.Endpoint('https://example.com/v1/AUTH_test/')
+        self.assertEqual(endpoint.url(), 'https://example.com/v1/AUTH_test/')
+        self.assertEqual(
+            endpoint.url('container', 'path to/object'),
+            'https://example.com/v1/AUTH_test/container/path%20to/object'
+        )
+        self.assertEqual(
+            endpoint.url('container', 1),
+            'https://example.com/v1/AUTH_test/container/1'
+        )
+
+    def test_params(self):
+        endpoint = http.Endpoint(
+            'https://example.com/v1?format=json', params={'limit': 10}
+        )
+        self.assertEqual(
+            endpoint.url('items'),
+            'https://example.com/v1/items?format=json&limit=10'
+        )
+        self.assertEqual(
+            endpoint.url('items', limit=None, tag=['a', 'b']),
+            'https://example.com/v1/items?format=json&tag=a&tag=b'
+        )
+        self.assertEqual(endpoint.params, {'limit': 10})
+
+    def test_join(self):
+        endpoint = http.Endpoint('example.com/v1', params={'limit': 10})
+        child = endpoint.join('container', marker='obj')
+        self.assertEqual(str(child), 'http://example.com/v1/container')
+        self.assertEqual(
+            child.url('object'),
+            'http://example.com/v1/container/object?limit=10&marker=obj'
+        )
+        self.assertEqual(endpoint.params, {'limit': 10})
@@ -0,0 +1,20 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+# The asyncio client needs Python 3.7 or greater, its tests are kept in a
+# module which is not discovered so older versions never compile them.
+if sys.version_info >= (3, 7):
+    from cloudlib.tests.http_async_cases import TestAsyncMakeRequest  # noqa
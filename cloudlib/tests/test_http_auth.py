@@ -0,0 +1,289 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+import requests
+from requests import adapters
+
+from cloudlib import http
+from cloudlib import http_auth
+from cloudlib import tests
+
+
+class Fetcher(object):
+    """Return numbered tokens, optionally blocking until released."""
+
+    def __init__(self, expires_in=100, gate=None):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.gate = gate
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        if self.gate is not None:
+            self.gate.wait(5)
+        with self.lock:
+            self.calls += 1
+            return 'token%d' % self.calls, self.expires_in
+
+
+class TestTokenProvider(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_auth.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        http_auth._tokens.clear()
+        self.now = 1000.0
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        http_auth._tokens.clear()
+        self.logger_patched.stop()
+
+    def provider(self, fetch, **kwargs):
+        provider = http_auth.TokenProvider(fetch, **kwargs)
+        provider.clock = lambda: self.now
+        return provider
+
+    def wait_refresh(self, fetch, calls):
+        for _ in range(100):
+            if fetch.calls >= calls and \
+                    not http_auth._tokens.get('default').refreshing:
+                return
+            time.sleep(0.01)
+
+    def test_cached(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch)
+        self.assertEqual(provider.token(), 'token1')
+        self.assertEqual(provider.token(), 'token1')
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(provider.stats['hits'], 1)
+
+    def test_shared_by_key(self):
+        fetch = Fetcher()
+        self.assertEqual(self.provider(fetch).token(), 'token1')
+        self.assertEqual(self.provider(fetch).token(), 'token1')
+        self.assertEqual(self.provider(fetch, key='other').token(), 'token2')
+
+    def test_fetch_results(self):
+        provider = self.provider(lambda: 'plain', ttl=10)
+        provider.token()
+        self.assertEqual(http_auth._tokens.get('default').expires, 1010)
+
+        provider = self.provider(
+            lambda: {'access_token': 'oauth', 'expires_in': 20}, key='oauth'
+        )
+        self.assertEqual(provider.token(), 'oauth')
+        self.assertEqual(http_auth._tokens.get('oauth').expires, 1020)
+
+    def test_expired(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch)
+        provider.token()
+        self.now += 100
+        self.assertEqual(provider.token(), 'token2')
+
+    def test_refresh_ahead(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch, refresh_ahead=0.5)
+        provider.token()
+        self.now += 60
+        # The cached token is returned while a new one is fetched
+        self.assertEqual(provider.token(), 'token1')
+        self.wait_refresh(fetch, 2)
+        self.assertEqual(provider.token(), 'token2')
+        self.assertEqual(provider.stats['refreshes'], 1)
+
+    def test_refresh_failure_keeps_token(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch, refresh_ahead=0.5)
+        provider.token()
+        provider.fetch = mock.Mock(side_effect=ValueError('down'))
+        self.now += 60
+        provider.token()
+        for _ in range(100):
+            if provider.stats['errors']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(provider.stats['errors'], 1)
+        self.assertEqual(provider.token(), 'token1')
+
+    def test_refresh_failure_backoff(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch, refresh_ahead=0.5, refresh_backoff=10)
+        provider.token()
+        provider.fetch = mock.Mock(side_effect=ValueError('down'))
+        self.now += 60
+        for _ in range(50):
+            self.assertEqual(provider.token(), 'token1')
+            self.wait_refresh(fetch, 1)
+        self.assertEqual(provider.fetch.call_count, 1)
+
+        self.now += 10
+        provider.token()
+        self.wait_refresh(fetch, 1)
+        self.assertEqual(provider.fetch.call_count, 2)
+
+    def test_expired_during_failed_refresh(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch, refresh_ahead=0.5)
+        provider.token()
+
+        gate = threading.Event()
+        started = threading.Event()
+        results = iter([ValueError('down'), ('token2', 100)])
+
+        def fetch_once():
+            result = next(results)
+            if isinstance(result, Exception):
+                started.set()
+                gate.wait(5)
+                raise result
+            return result
+
+        provider.fetch = fetch_once
+        self.now += 60
+        provider.token()
+        self.assertTrue(started.wait(5))
+
+        # The token expires while the background refresh is failing
+        self.now += 50
+        tokens = []
+        thread = threading.Thread(target=lambda: tokens.append(
+            provider.token()
+        ))
+        thread.start()
+        time.sleep(0.05)
+        gate.set()
+        thread.join(5)
+        self.assertEqual(tokens, ['token2'])
+
+    def test_single_flight(self):
+        gate = threading.Event()
+        fetch = Fetcher(gate=gate)
+        provider = self.provider(fetch)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(provider.token()))
+            for _ in range(10)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['token1'] * 10)
+        self.assertEqual(fetch.calls, 1)
+
+    def test_fetch_error(self):
+        provider = self.provider(mock.Mock(side_effect=ValueError('down')))
+        self.assertRaises(ValueError, provider.token)
+        self.assertEqual(provider.stats['errors'], 1)
+
+    def test_disk_cache(self):
+        fetch = Fetcher()
+        cache_dir = os.path.join(self.temp_dir, 'tokens')
+        provider = self.provider(fetch, cache_dir=cache_dir)
+        self.assertEqual(provider.token(), 'token1')
+        with open(provider.cache_file) as f:
+            self.assertEqual(json.load(f)['value'], 'token1')
+        self.assertEqual(os.stat(provider.cache_file).st_mode & 0o777, 0o600)
+
+        # A new process starts with an empty memory cache
+        http_auth._tokens.clear()
+        provider = self.provider(fetch, cache_dir=cache_dir)
+        self.assertEqual(provider.token(), 'token1')
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(provider.stats['disk_hits'], 1)
+
+        self.now += 100
+        http_auth._tokens.clear()
+        self.assertEqual(provider.token(), 'token2')
+
+    def test_invalidate(self):
+        fetch = Fetcher()
+        provider = self.provider(fetch, cache_dir=self.temp_dir)
+        provider.token()
+        provider.invalidate()
+        self.assertFalse(os.path.exists(provider.cache_file))
+        self.assertEqual(provider.token(), 'token2')
+
+    def test_header(self):
+        headers = {}
+        self.provider(Fetcher())('get', 'http://example.com', headers, {})
+        self.assertEqual(headers, {'Authorization': 'Bearer token1'})
+
+        headers = {}
+        provider = self.provider(Fetcher(), header='X-Auth-Token', scheme=None)
+        provider('get', 'http://example.com', headers, {})
+        self.assertEqual(headers, {'X-Auth-Token': 'token1'})
+
+    def test_build_auth(self):
+        self.assertIsNone(http_auth.build_auth({}))
+        provider = http_auth.build_auth(
+            {'auth': {'fetch': Fetcher(), 'key': 'user'}}
+        )
+        self.assertEqual(provider.key, 'user')
+        self.assertIs(http_auth.build_auth({'auth': provider}), provider)
+
+
+class TestMakeRequestAuth(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        http_auth._tokens.clear()
+
+    def tearDown(self):
+        http_auth._tokens.clear()
+        self.logger_patched.stop()
+
+    def test_token_sent(self):
+        sent = []
+
+        class RecordingAdapter(adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                sent.append(request.headers['Authorization'])
+                resp = requests.Response()
+                resp.status_code = 200
+                resp.request = request
+                resp._content = b''
+                return resp
+
+            def close(self):
+                pass
+
+        fetch = Fetcher()
+        for _ in range(3):
+            config = {
+                'transport': RecordingAdapter(),
+                'auth': {'fetch': fetch}
+            }
+            with http.MakeRequest(config=config) as make_req:
+                make_req.get('http://cloudlib.test/')
+        self.assertEqual(sent, ['Bearer token1'] * 3)
+        self.assertEqual(fetch.calls, 1)
@@ -0,0 +1,186 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_breaker
+from cloudlib import tests
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_breaker.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.clock = FakeClock()
+        self.breaker = http_breaker.CircuitBreaker(
+            failure_threshold=2, recovery_timeout=10
+        )
+        self.breaker.clock = self.clock
+        self.error = requests.ConnectionError('reset')
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def fail(self, host='example.com'):
+        self.breaker.before(host)
+        self.breaker.record(host, exp=self.error)
+
+    def test_opens_after_threshold(self):
+        self.fail()
+        self.assertEqual(self.breaker.state('example.com'), 'closed')
+        self.fail()
+        self.assertEqual(self.breaker.state('example.com'), 'open')
+        self.assertRaises(
+            http_breaker.CircuitOpenError,
+            self.breaker.before,
+            'example.com'
+        )
+        self.breaker.before('other.com')
+
+    def test_success_resets_failures(self):
+        self.fail()
+        self.breaker.record('example.com', resp=tests.FakeHttpResponse())
+        self.fail()
+        self.assertEqual(self.breaker.state('example.com'), 'closed')
+
+    def test_failure_status(self):
+        resp = tests.FakeHttpResponse()
+        resp.status_code = 503
+        for _ in range(2):
+            self.breaker.before('example.com')
+            self.breaker.record('example.com', resp=resp)
+        self.assertEqual(self.breaker.state('example.com'), 'open')
+
+    def test_neutral_exception(self):
+        for _ in range(3):
+            self.breaker.before('example.com')
+            self.breaker.record('example.com', exp=AttributeError())
+        self.assertEqual(self.breaker.state('example.com'), 'closed')
+
+    def test_half_open_success_closes(self):
+        self.fail()
+        self.fail()
+        self.clock.now += 10
+        self.assertEqual(self.breaker.state('example.com'), 'half-open')
+        self.breaker.before('example.com')
+        self.assertRaises(
+            http_breaker.CircuitOpenError,
+            self.breaker.before,
+            'example.com'
+        )
+        self.breaker.record('example.com', resp=tests.FakeHttpResponse())
+        self.assertEqual(self.breaker.state('example.com'), 'closed')
+
+    def test_half_open_failure_opens(self):
+        self.fail()
+        self.fail()
+        self.clock.now += 10
+        self.fail()
+        self.assertEqual(self.breaker.state('example.com'), 'open')
+        self.clock.now += 5
+        self.assertEqual(self.breaker.state('example.com'), 'open')
+
+    def test_stale_success_ignored(self):
+        slow = self.breaker.before('example.com')
+        self.fail()
+        self.fail()
+
+        # A request sent while the circuit was closed finishes late
+        self.breaker.record(
+            'example.com', resp=tests.FakeHttpResponse(), generation=slow
+        )
+        self.assertEqual(self.breaker.state('example.com'), 'open')
+
+        self.clock.now += 10
+        trial = self.breaker.before('example.com')
+        self.breaker.record(
+            'example.com', resp=tests.FakeHttpResponse(), generation=slow
+        )
+        self.assertEqual(self.breaker.state('example.com'), 'half-open')
+        self.breaker.record(
+            'example.com', resp=tests.FakeHttpResponse(), generation=trial
+        )
+        self.assertEqual(self.breaker.state('example.com'), 'closed')
+
+    def test_states(self):
+        self.fail()
+        self.fail()
+        self.assertRaises(
+            http_breaker.CircuitOpenError,
+            self.breaker.before,
+            'example.com'
+        )
+        states = self.breaker.states()
+        self.assertEqual(states['example.com']['state'], 'open')
+        self.assertEqual(states['example.com']['failures'], 2)
+        self.assertEqual(states['example.com']['rejected'], 1)
+
+
+class TestMakeRequestBreaker(unittest.TestCase):
+    def setUp(self):
+        self.url = 'http://example.com'
+
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_breaker_disabled(self):
+        self.assertEqual(http.MakeRequest().breaker, None)
+
+    def test_open_circuit_fails_fast(self):
+        make_req = http.MakeRequest(
+            config={'circuit_breaker': {'failure_threshold': 1}}
+        )
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.side_effect = requests.Timeout('slow')
+            self.assertRaises(requests.Timeout, make_req.get, self.url)
+            self.assertRaises(
+                http_breaker.CircuitOpenError, make_req.get, self.url
+            )
+        self.assertEqual(mock_session.get.call_count, 1)
+
+    def test_open_circuit_not_retried(self):
+        make_req = http.MakeRequest(
+            config={
+                'circuit_breaker': {'failure_threshold': 1},
+                'retry': {'total': 3}
+            }
+        )
+        make_req.retry.sleep = mock.Mock()
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.side_effect = requests.ConnectionError('reset')
+            self.assertRaises(
+                http_breaker.CircuitOpenError, make_req.get, self.url
+            )
+        self.assertEqual(mock_session.get.call_count, 1)
+        self.assertEqual(make_req.retry.stats['retries'], 1)
@@ -0,0 +1,193 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from cloudlib import http
+from cloudlib import http_auth
+from cloudlib import http_cache
+from cloudlib import tests
+
+
+class FakeConditionalHttp(object):
+    """Setup a FAKE http request which honors If-None-Match."""
+    def __init__(self):
+        self.requests = []
+
+    def get(self, *args, **kwargs):
+        headers = kwargs.get('headers', {})
+        self.requests.append(headers)
+        resp = tests.FakeHttpResponse()
+        resp.url = args[0]
+        resp.content = b'testbody'
+        if headers.get('If-None-Match') == '"v1"':
+            resp.status_code = 304
+            resp.reason = 'Not Modified'
+            resp.content = b''
+        resp.headers = {'ETag': '"v1"', 'Content-Type': 'text/plain'}
+        resp.elapsed = None
+        return resp
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.url = 'http://example.com'
+
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.fakehttp = FakeConditionalHttp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def make_request(self, auth=None, **cache_config):
+        make_req = http.MakeRequest(
+            config={'cache': cache_config, 'auth': auth}
+        )
+        patched = mock.patch.object(make_req, 'session')
+        mock_session = patched.start()
+        self.addCleanup(patched.stop)
+        mock_session.get = self.fakehttp.get
+        return make_req
+
+    def test_cache_disabled(self):
+        self.assertEqual(http.MakeRequest().cache, None)
+
+    def test_revalidate_served_from_cache(self):
+        make_req = self.make_request()
+        first = make_req.get(self.url)
+        second = make_req.get(self.url)
+        self.assertEqual(first.content, b'testbody')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.content, b'testbody')
+        self.assertEqual(second.text, 'testbody')
+        self.assertFalse('If-None-Match' in self.fakehttp.requests[0])
+        self.assertEqual(self.fakehttp.requests[1]['If-None-Match'], '"v1"')
+        stats = make_req.cache.stats
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['stores'], 1)
+
+    def test_vary_headers(self):
+        make_req = self.make_request(vary_headers=['Accept'])
+        make_req.get(self.url, headers={'Accept': 'text/plain'})
+        make_req.get(self.url, headers={'Accept': 'application/json'})
+        self.assertFalse('If-None-Match' in self.fakehttp.requests[1])
+        self.assertEqual(make_req.cache.stats['hits'], 0)
+
+    def test_auth_in_key(self):
+        self.addCleanup(http_auth._tokens.clear)
+        make_req = self.make_request(
+            auth={'fetch': lambda: 'token1', 'key': 'one'},
+            cache_dir=self.tmpdir
+        )
+        make_req.get(self.url)
+        self.assertEqual(
+            self.fakehttp.requests[0]['Authorization'], 'Bearer token1'
+        )
+
+        # Another credential sharing the cache directory
+        make_req = self.make_request(
+            auth={'fetch': lambda: 'token2', 'key': 'two'},
+            cache_dir=self.tmpdir
+        )
+        make_req.get(self.url)
+        self.assertFalse('If-None-Match' in self.fakehttp.requests[1])
+        self.assertEqual(make_req.cache.stats['hits'], 0)
+
+    def test_encoding_headers_not_stored(self):
+        resp = tests.FakeHttpResponse()
+        resp.url = self.url
+        resp.content = b'testbody'
+        resp.headers = {
+            'ETag': '"v1"',
+            'Content-Encoding': 'gzip',
+            'Content-Length': '28'
+        }
+        entry = http_cache.CacheEntry.from_response(resp)
+        self.assertEqual(dict(entry.headers), {'ETag': '"v1"'})
+
+    def test_params_in_key(self):
+        make_req = self.make_request()
+        make_req.get(self.url, kwargs={'params': {'page': 1}})
+        make_req.get(self.url, kwargs={'params': {'page': 2}})
+        self.assertFalse('If-None-Match' in self.fakehttp.requests[1])
+
+    def test_stream_not_cached(self):
+        make_req = self.make_request()
+        make_req.get(self.url, kwargs={'stream': True})
+        self.assertEqual(make_req.cache.stats['stores'], 0)
+
+    def test_disk_tier(self):
+        make_req = self.make_request(cache_dir=self.tmpdir)
+        make_req.get(self.url)
+        self.assertEqual(len(os.listdir(self.tmpdir)), 1)
+
+        make_req = self.make_request(cache_dir=self.tmpdir)
+        resp = make_req.get(self.url)
+        self.assertEqual(resp.content, b'testbody')
+        self.assertEqual(make_req.cache.stats['disk_hits'], 1)
+        self.assertEqual(make_req.cache.stats['hits'], 1)
+
+    def test_memory_eviction(self):
+        make_req = self.make_request(memory_max_bytes=10)
+        make_req.get(self.url + '/1')
+        make_req.get(self.url + '/2')
+        self.assertEqual(len(make_req.cache.memory), 1)
+        self.assertEqual(make_req.cache.stats['memory_evictions'], 1)
+
+    def test_disk_eviction(self):
+        cache = http_cache.ResponseCache(
+            cache_dir=self.tmpdir, disk_max_bytes=200
+        )
+        entry = http_cache.CacheEntry(
+            url=self.url,
+            status_code=200,
+            reason='OK',
+            headers={'ETag': '"v1"'},
+            content=b'x' * 100
+        )
+        cache.set('one', entry)
+        cache.set('two', entry)
+        self.assertEqual(os.listdir(self.tmpdir), ['two'])
+        self.assertEqual(cache.stats['disk_evictions'], 1)
+
+    def test_entry_dump_load(self):
+        entry = http_cache.CacheEntry(
+            url=self.url,
+            status_code=200,
+            reason='OK',
+            headers={'ETag': '"v1"', 'Last-Modified': 'yesterday'},
+            content=b'test\nbody'
+        )
+        loaded = http_cache.CacheEntry.load(entry.dump())
+        self.assertEqual(loaded.content, b'test\nbody')
+        self.assertEqual(
+            loaded.conditional_headers(),
+            {'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'}
+        )
+
+    def test_no_store(self):
+        resp = tests.FakeHttpResponse()
+        resp.headers = {'ETag': '"v1"', 'Cache-Control': 'no-store'}
+        self.assertFalse(http_cache.ResponseCache.cacheable(resp))
@@ -0,0 +1,254 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import requests
+from requests import adapters
+
+from cloudlib import http
+from cloudlib import http_cassette
+from cloudlib import http_encoding
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+class CassetteHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, body, encoding=None):
+        self.server.count += 1
+        self.send_response(200)
+        self.send_header('X-Count', str(self.server.count))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/gzip':
+            self._reply(http_encoding.gzip_compress(b'compressed'), 'gzip')
+        elif self.path == '/binary':
+            self._reply(bytes(bytearray(range(256))))
+        else:
+            self._reply(b'count %d' % (self.server.count + 1))
+
+    do_HEAD = do_GET
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self._reply(b'posted ' + body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCassette(unittest.TestCase):
+    def setUp(self):
+        for name in ('http', 'http_cassette'):
+            patched = mock.patch('cloudlib.%s.logger.getLogger' % name)
+            patched.start().return_value = tests.Logger()
+            self.addCleanup(patched.stop)
+
+        self.server = tests.LocalServer(CassetteHandler)
+        self.server.count = 0
+        self.url = self.server.url
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'cassette.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        self.server.stop()
+
+    def record(self, config, func):
+        with http.MakeRequest(config={'cassette': config}) as make_req:
+            return func(make_req)
+
+    def test_record_and_replay(self):
+        def run(make_req):
+            return [
+                make_req.get(self.url + 'first').content,
+                make_req.get(self.url + 'first').content,
+                make_req.get(self.url + 'second').content,
+                make_req.head(self.url + 'first').headers['Content-Length']
+            ]
+
+        recorded = self.record(self.path, run)
+        self.assertEqual(self.server.count, 4)
+        self.server.stop()
+
+        # The cassette exists so the same config now replays
+        with http.MakeRequest(config={'cassette': self.path}) as make_req:
+            replayed = run(make_req)
+            stats = make_req.session.get_adapter(self.url).cassette.stats
+        self.assertEqual(replayed, recorded)
+        self.assertEqual(
+            recorded, [b'count 1', b'count 2', b'count 3', '7']
+        )
+        self.assertEqual(stats['played'], 4)
+        self.assertEqual(stats['interactions'], 4)
+
+    def test_repeats_last_recording(self):
+        self.record(self.path, lambda m: m.get(self.url))
+        with http.MakeRequest(config={'cassette': self.path}) as make_req:
+            for _ in range(3):
+                self.assertEqual(make_req.get(self.url).content, b'count 1')
+        self.assertEqual(self.server.count, 1)
+
+    def test_replay_miss(self):
+        self.record(self.path, lambda m: m.get(self.url))
+        config = {'path': self.path, 'mode': 'replay'}
+        with http.MakeRequest(config={'cassette': config}) as make_req:
+            self.assertRaises(
+                http_cassette.CassetteMiss,
+                make_req.get,
+                self.url + 'other'
+            )
+        self.assertEqual(self.server.count, 1)
+
+    def test_encoded_bodies(self):
+        path = os.path.join(self.temp_dir, 'nested', 'cassette.json.gz')
+
+        def run(make_req):
+            gzip_resp = make_req.get(self.url + 'gzip')
+            binary_resp = make_req.get(self.url + 'binary')
+            return (
+                gzip_resp.headers['Content-Encoding'],
+                gzip_resp.content,
+                binary_resp.content
+            )
+
+        recorded = self.record(path, run)
+        self.server.stop()
+        self.assertEqual(self.record(path, run), recorded)
+        self.assertEqual(recorded[1], b'compressed')
+
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read().decode('utf-8'))
+        bodies = [i['response']['body'] for i in data['interactions']]
+        self.assertTrue(all('base64' in body for body in bodies))
+
+    def test_streamed_replay(self):
+        local_file = os.path.join(self.temp_dir, 'download')
+        self.record(self.path, lambda m: m.get(self.url))
+        self.server.stop()
+        with http.MakeRequest(config={'cassette': self.path}) as make_req:
+            make_req.download(self.url, local_file)
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), b'count 1')
+
+    def test_match_body(self):
+        def run(make_req):
+            return [
+                make_req.post(self.url, body='one').content,
+                make_req.post(self.url, body='two').content
+            ]
+
+        config = {'path': self.path, 'match_body': True}
+        recorded = self.record(config, run)
+        self.assertEqual(recorded, [b'posted one', b'posted two'])
+
+        with http.MakeRequest(config={'cassette': config}) as make_req:
+            self.assertEqual(
+                make_req.post(self.url, body='two').content, b'posted two'
+            )
+            self.assertRaises(
+                http_cassette.CassetteMiss,
+                make_req.post,
+                self.url,
+                body='three'
+            )
+
+    def test_append(self):
+        self.record(self.path, lambda m: m.get(self.url + 'first'))
+        config = {'path': self.path, 'mode': 'append'}
+        self.record(config, lambda m: [
+            m.get(self.url + 'first'), m.get(self.url + 'second')
+        ])
+        self.assertEqual(self.server.count, 2)
+        cassette = http_cassette.Cassette(self.path)
+        self.assertEqual(cassette.mode, 'replay')
+        self.assertEqual(cassette.stats['interactions'], 2)
+
+    def test_request_headers_not_stored(self):
+        self.record(self.path, lambda m: m.get(
+            self.url, headers={'X-Auth-Token': 'secret'}
+        ))
+        with open(self.path) as f:
+            self.assertNotIn('secret', f.read())
+
+    def test_invalid_mode(self):
+        self.assertRaises(
+            ValueError, http_cassette.Cassette, self.path, mode='live'
+        )
+
+    def test_build_cassette(self):
+        self.assertIsNone(http_cassette.build_cassette({}))
+        cassette = http_cassette.build_cassette({'cassette': self.path})
+        self.assertEqual(cassette.mode, 'record')
+        self.assertIs(
+            http_cassette.build_cassette({'cassette': cassette}), cassette
+        )
+
+
+class TestTransport(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_transport_adapter(self):
+        class StaticAdapter(adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                resp = requests.Response()
+                resp.status_code = 200
+                resp.url = request.url
+                resp.request = request
+                resp._content = b'static'
+                return resp
+
+            def close(self):
+                pass
+
+        config = {'transport': StaticAdapter()}
+        with http.MakeRequest(config=config) as make_req:
+            resp = make_req.get('http://cloudlib.test/')
+        self.assertEqual(resp.content, b'static')
+
+    def test_transport_callable(self):
+        wrapped = []
+
+        def transport(adapter):
+            wrapped.append(adapter)
+            return adapter
+
+        http.MakeRequest(config={'transport': transport})
+        self.assertEqual(len(wrapped), 1)
+        self.assertIsInstance(wrapped[0], adapters.HTTPAdapter)
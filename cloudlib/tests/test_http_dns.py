@@ -0,0 +1,243 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import threading
+import time
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_dns
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+class FakeResolver(object):
+    def __init__(self, addresses=None, ttl=None, delay=0):
+        self.addresses = addresses or ['127.0.0.1']
+        self.ttl = ttl
+        self.delay = delay
+        self.fail = False
+        self.calls = []
+
+    def __call__(self, host, port):
+        self.calls.append((host, port))
+        time.sleep(self.delay)
+        if self.fail:
+            raise socket.gaierror('Name or service not known')
+        if self.ttl is not None:
+            return self.addresses, self.ttl
+        return self.addresses
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestDNSCache(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_dns.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.resolver = FakeResolver()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def dns_cache(self, **kwargs):
+        dns_cache = http_dns.DNSCache(resolver=self.resolver, **kwargs)
+        dns_cache.clock = self.clock
+        return dns_cache
+
+    def test_cache_hit(self):
+        dns_cache = self.dns_cache(ttl=10)
+        self.assertEqual(dns_cache('example.com', 80), ['127.0.0.1'])
+        self.assertEqual(dns_cache('example.com', 80), ['127.0.0.1'])
+        self.assertEqual(len(self.resolver.calls), 1)
+        stats = dns_cache.stats
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+
+    def test_ttl_expires(self):
+        dns_cache = self.dns_cache(ttl=10)
+        dns_cache('example.com', 80)
+        self.clock.now += 11
+        dns_cache('example.com', 80)
+        self.assertEqual(len(self.resolver.calls), 2)
+
+    def test_resolver_ttl(self):
+        self.resolver.ttl = 2
+        dns_cache = self.dns_cache(ttl=300)
+        dns_cache('example.com', 80)
+        self.clock.now += 3
+        dns_cache('example.com', 80)
+        self.assertEqual(len(self.resolver.calls), 2)
+
+    def test_negative_cache(self):
+        self.resolver.fail = True
+        dns_cache = self.dns_cache(negative_ttl=5)
+        for _ in range(3):
+            self.assertRaises(
+                socket.gaierror, dns_cache, 'missing.example.com', 80
+            )
+        self.assertEqual(len(self.resolver.calls), 1)
+        self.assertEqual(dns_cache.stats['negative_hits'], 2)
+
+        self.resolver.fail = False
+        self.clock.now += 6
+        self.assertEqual(
+            dns_cache('missing.example.com', 80), ['127.0.0.1']
+        )
+
+    def test_concurrent_misses_share_query(self):
+        self.resolver.delay = 0.1
+        dns_cache = self.dns_cache()
+        threads = [
+            threading.Thread(target=dns_cache, args=('example.com', 80))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.resolver.calls), 1)
+
+    def test_background_refresh(self):
+        dns_cache = self.dns_cache(ttl=10, refresh=True, refresh_ahead=0.5)
+        dns_cache('example.com', 80)
+        self.resolver.addresses = ['127.0.0.2']
+        self.clock.now += 6
+        # The cached address is served while the refresh runs
+        self.assertEqual(dns_cache('example.com', 80), ['127.0.0.1'])
+        for _ in range(50):
+            if dns_cache('example.com', 80) == ['127.0.0.2']:
+                break
+            time.sleep(0.01)
+        self.assertEqual(dns_cache('example.com', 80), ['127.0.0.2'])
+        self.assertEqual(dns_cache.stats['refreshes'], 1)
+
+    def test_failed_refresh_keeps_entry(self):
+        dns_cache = self.dns_cache(ttl=10, refresh=True, refresh_ahead=0.5)
+        dns_cache('example.com', 80)
+        self.resolver.fail = True
+        self.clock.now += 6
+        dns_cache('example.com', 80)
+        time.sleep(0.1)
+        self.assertEqual(dns_cache('example.com', 80), ['127.0.0.1'])
+
+    def test_failed_refresh_backoff(self):
+        dns_cache = self.dns_cache(
+            ttl=10, negative_ttl=2, refresh=True, refresh_ahead=0.5
+        )
+        dns_cache('example.com', 80)
+        self.resolver.fail = True
+        self.clock.now += 6
+        for _ in range(50):
+            dns_cache('example.com', 80)
+            time.sleep(0.001)
+        time.sleep(0.05)
+        self.assertEqual(len(self.resolver.calls), 2)
+
+        self.clock.now += 2
+        dns_cache('example.com', 80)
+        time.sleep(0.05)
+        self.assertEqual(len(self.resolver.calls), 3)
+
+    def test_max_size(self):
+        dns_cache = self.dns_cache(max_size=2)
+        for host in ('one.com', 'two.com', 'three.com'):
+            dns_cache(host, 80)
+        self.assertEqual(dns_cache.stats['entries'], 2)
+        self.assertEqual(dns_cache.stats['evictions'], 1)
+
+    def test_invalidate(self):
+        dns_cache = self.dns_cache()
+        dns_cache('example.com', 80)
+        dns_cache('example.com', 443)
+        dns_cache('other.com', 80)
+        dns_cache.invalidate('example.com')
+        self.assertEqual(dns_cache.stats['entries'], 1)
+        dns_cache.clear()
+        self.assertEqual(dns_cache.stats['entries'], 0)
+
+    def test_build_dns_cache(self):
+        self.assertIsNone(http_dns.build_dns_cache({}))
+        dns_cache = http_dns.build_dns_cache({'dns_cache': {'ttl': 5}})
+        self.assertEqual(dns_cache.ttl, 5)
+        self.assertIs(
+            http_dns.build_dns_cache({'dns_cache': dns_cache}), dns_cache
+        )
+
+
+class FakeHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMakeRequestDNSCache(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(FakeHandler)
+        self.port = self.server.port
+
+    def tearDown(self):
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_installed_per_instance(self):
+        resolver = FakeResolver()
+        config = {'dns_cache': {'resolver': resolver}}
+        with http.MakeRequest(config=config) as make_req:
+            for _ in range(3):
+                resp = make_req.get('http://cloudlib.test:%s/' % self.port)
+                self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resolver.calls, [('cloudlib.test', self.port)])
+        self.assertEqual(make_req.dns_cache.stats['hits'], 2)
+
+        # Other clients are not affected
+        with http.MakeRequest() as make_req:
+            self.assertIsNone(make_req.dns_cache)
+            self.assertRaises(
+                requests.ConnectionError,
+                make_req.get,
+                'http://cloudlib.test:%s/' % self.port
+            )
@@ -0,0 +1,220 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+import mock
+
+from cloudlib import http
+from cloudlib import http_encoding
+from cloudlib import http_upload
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+CONTENT = b''.join(
+    b'{"id": %d, "name": "item-%d"},' % (i, i) for i in range(5000)
+)
+
+
+def gzip_data(data):
+    return http_encoding.gzip_compress(data)
+
+
+def decode_all(decoder, data, block=100):
+    decoded = b''
+    for i in range(0, len(data), block):
+        decoded += decoder.decompress(data[i:i + block])
+    return decoded + decoder.flush()
+
+
+class TestDecoders(unittest.TestCase):
+    def test_gzip(self):
+        decoder = http_encoding.get_decoder('gzip')
+        self.assertEqual(
+            decode_all(decoder, gzip_data(CONTENT)), CONTENT
+        )
+
+    def test_gzip_members(self):
+        decoder = http_encoding.get_decoder('x-gzip')
+        data = gzip_data(b'test') + gzip_data(b'body')
+        self.assertEqual(decode_all(decoder, data, block=3), b'testbody')
+
+    def test_deflate(self):
+        decoder = http_encoding.get_decoder('deflate')
+        self.assertEqual(
+            decode_all(decoder, zlib.compress(CONTENT), block=1), CONTENT
+        )
+
+    def test_raw_deflate(self):
+        obj = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = obj.compress(CONTENT) + obj.flush()
+        decoder = http_encoding.get_decoder('deflate')
+        self.assertEqual(decode_all(decoder, data), CONTENT)
+
+    def test_multiple_codings(self):
+        data = gzip_data(zlib.compress(CONTENT))
+        decoder = http_encoding.get_decoder('deflate, gzip')
+        self.assertEqual(decode_all(decoder, data), CONTENT)
+
+    def test_identity(self):
+        self.assertIsNone(http_encoding.get_decoder(None))
+        self.assertIsNone(http_encoding.get_decoder('identity'))
+
+    def test_unsupported(self):
+        self.assertRaises(ValueError, http_encoding.get_decoder, 'compress')
+
+    def test_supported_encodings(self):
+        encodings = http_encoding.supported_encodings()
+        self.assertEqual(encodings[:2], ['gzip', 'deflate'])
+        self.assertEqual('br' in encodings, http_encoding.brotli is not None)
+
+    def test_iter_gzip(self):
+        blocks = [CONTENT[i:i + 1000] for i in range(0, len(CONTENT), 1000)]
+        data = b''.join(http_encoding.iter_gzip(iter(blocks)))
+        self.assertEqual(
+            gzip.GzipFile(fileobj=io.BytesIO(data)).read(), CONTENT
+        )
+
+
+class EncodingHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers.items()))
+        accept = self.headers.get('Accept-Encoding', '')
+        if 'gzip' in accept and 'Range' not in self.headers:
+            body = gzip_data(CONTENT)
+            encoding = 'gzip'
+        else:
+            body = CONTENT
+            encoding = None
+        self.send_response(200)
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.requests.append(dict(self.headers.items()))
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            body = b''
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        else:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.bodies.append(body)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(EncodingHandler)
+        self.server.requests = []
+        self.server.bodies = []
+        self.url = self.server.url
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_accept_encoding(self):
+        make_req = http.MakeRequest()
+        self.assertEqual(
+            make_req.headers['Accept-Encoding'],
+            ', '.join(http_encoding.urllib3_encodings())
+        )
+        make_req = http.MakeRequest(config={'compression': False})
+        self.assertEqual(make_req.headers['Accept-Encoding'], 'identity')
+
+    def test_compressed_response(self):
+        with http.MakeRequest() as make_req:
+            resp = make_req.get(self.url)
+        self.assertEqual(resp.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(resp.content, CONTENT)
+
+    def test_streamed_download(self):
+        local_file = os.path.join(self.temp_dir, 'catalog')
+        with http.MakeRequest(config={'chunk_size': 1024}) as make_req:
+            digest = make_req.download(self.url, local_file)
+        with open(local_file, 'rb') as f:
+            self.assertEqual(f.read(), CONTENT)
+        self.assertEqual(digest, hashlib.md5(CONTENT).hexdigest())
+
+    def test_compression_disabled(self):
+        with http.MakeRequest(config={'compression': False}) as make_req:
+            resp = make_req.get(self.url)
+        self.assertNotIn('Content-Encoding', resp.headers)
+        self.assertEqual(resp.content, CONTENT)
+
+    def test_compress_request(self):
+        with http.MakeRequest(config={'compress_requests': True}) as make_req:
+            make_req.post(self.url, body=CONTENT)
+            make_req.post(self.url, body='small')
+        self.assertEqual(self.server.requests[0]['Content-Encoding'], 'gzip')
+        self.assertEqual(zlib.decompress(
+            self.server.bodies[0], 16 + zlib.MAX_WBITS
+        ), CONTENT)
+        self.assertNotIn('Content-Encoding', self.server.requests[1])
+        self.assertEqual(self.server.bodies[1], b'small')
+
+    def test_compress_streamed_request(self):
+        local_file = os.path.join(self.temp_dir, 'upload')
+        with open(local_file, 'wb') as f:
+            f.write(CONTENT)
+
+        config = {'compress_requests': 1}
+        with http.MakeRequest(config=config) as make_req:
+            body = http_upload.FileBody(local_file)
+            with body:
+                make_req.post(self.url, body=body)
+        self.assertEqual(self.server.requests[0]['Content-Encoding'], 'gzip')
+        self.assertTrue(len(self.server.bodies[0]) < len(CONTENT))
+        self.assertEqual(zlib.decompress(
+            self.server.bodies[0], 16 + zlib.MAX_WBITS
+        ), CONTENT)
+        self.assertEqual(body.hexdigest(), hashlib.md5(CONTENT).hexdigest())
+
+    def test_compress_requests_disabled(self):
+        with http.MakeRequest() as make_req:
+            make_req.post(self.url, body=CONTENT)
+        self.assertNotIn('Content-Encoding', self.server.requests[0])
@@ -0,0 +1,238 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_hedge
+from cloudlib import tests
+
+
+class SlowResponse(tests.FakeHttpResponse):
+    def __init__(self, name):
+        super(SlowResponse, self).__init__()
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestHedger(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_hedge.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def sequence(self, delays, fail=()):
+        """Return a callable whose calls take the given times."""
+        calls = []
+        lock = threading.Lock()
+
+        def func():
+            with lock:
+                index = len(calls)
+                resp = SlowResponse(index)
+                calls.append(resp)
+            time.sleep(delays[index])
+            if index in fail:
+                raise requests.ConnectionError('failed %s' % index)
+            return resp
+
+        return func, calls
+
+    def test_delay_needs_samples(self):
+        hedger = http_hedge.Hedger(min_samples=10)
+        self.assertIsNone(hedger.delay('example.com'))
+        for value in range(1, 11):
+            hedger.observe('example.com', value / 100.0)
+        self.assertAlmostEqual(
+            hedger.delay('example.com'), 0.1, delta=0.01
+        )
+        self.assertIsNone(hedger.delay('other.com'))
+
+    def test_delay_bounds(self):
+        hedger = http_hedge.Hedger(
+            delay=0.5, min_delay=0.1, max_delay=0.2
+        )
+        self.assertEqual(hedger.delay('example.com'), 0.2)
+        hedger.default_delay = 0.01
+        self.assertEqual(hedger.delay('example.com'), 0.1)
+
+    def test_fast_request_not_hedged(self):
+        hedger = http_hedge.Hedger(delay=0.2)
+        func, calls = self.sequence([0, 0])
+        resp = hedger.run('example.com', func)
+        self.assertEqual(resp.name, 0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(hedger.stats['hedged'], 0)
+
+    def test_slow_request_hedged(self):
+        hedger = http_hedge.Hedger(delay=0.05)
+        func, calls = self.sequence([0.5, 0])
+        start = time.time()
+        resp = hedger.run('example.com', func)
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertEqual(resp.name, 1)
+        self.assertEqual(hedger.stats['hedged'], 1)
+        self.assertEqual(hedger.stats['hedge_wins'], 1)
+
+        # The loser is closed once it answers
+        time.sleep(0.6)
+        self.assertTrue(calls[0].closed)
+        self.assertFalse(calls[1].closed)
+
+    def test_original_wins(self):
+        hedger = http_hedge.Hedger(delay=0.05)
+        func, calls = self.sequence([0.1, 0.5])
+        resp = hedger.run('example.com', func)
+        self.assertEqual(resp.name, 0)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(hedger.stats['hedge_wins'], 0)
+
+    def test_original_fails(self):
+        hedger = http_hedge.Hedger(delay=0.05)
+        func, calls = self.sequence([0.1, 0.2], fail=(0,))
+        resp = hedger.run('example.com', func)
+        self.assertEqual(resp.name, 1)
+
+    def test_both_fail(self):
+        hedger = http_hedge.Hedger(delay=0.05)
+        func, calls = self.sequence([0.1, 0.1], fail=(0, 1))
+        self.assertRaises(
+            requests.ConnectionError, hedger.run, 'example.com', func
+        )
+
+    def test_budget(self):
+        hedger = http_hedge.Hedger(delay=0.01, ratio=0, min_per_second=0)
+        func, calls = self.sequence([0.05, 0])
+        resp = hedger.run('example.com', func)
+        self.assertEqual(resp.name, 0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(hedger.stats['budget_exhausted'], 1)
+
+    def test_not_ready(self):
+        hedger = http_hedge.Hedger(delay=0.01)
+        func, calls = self.sequence([0.05, 0])
+        resp = hedger.run('example.com', func, ready=lambda: False)
+        self.assertEqual(resp.name, 0)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(hedger.stats['not_ready'], 1)
+
+    def test_race_closes_losers(self):
+        race = http_hedge.Race()
+        queued = SlowResponse(0)
+        race.put(0, queued, None)
+        race.decide()
+        self.assertTrue(queued.closed)
+
+        late = SlowResponse(1)
+        race.put(1, late, None)
+        self.assertTrue(late.closed)
+
+    def test_build_hedger(self):
+        self.assertIsNone(http_hedge.build_hedger({}))
+        self.assertIsNone(http_hedge.build_hedger({'hedge': False}))
+        hedger = http_hedge.build_hedger({'hedge': {'percentile': 99}})
+        self.assertEqual(hedger.percentile, 99)
+        self.assertIs(http_hedge.build_hedger({'hedge': hedger}), hedger)
+
+
+class TestHedgedRequests(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        self.url = 'http://example.com'
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_hedged_get(self):
+        make_req = http.MakeRequest(config={'hedge': {'delay': 0.05}})
+        calls = []
+
+        def get(url, headers=None, **kwargs):
+            calls.append(headers)
+            if len(calls) == 1:
+                time.sleep(0.5)
+            return tests.FakeHttpResponse()
+
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            start = time.time()
+            resp = make_req.get(self.url, headers={'X-Test': 'test'})
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertIsNot(calls[0], calls[1])
+        self.assertEqual(make_req.hedger.stats['hedge_wins'], 1)
+
+    def test_stream_not_hedged(self):
+        make_req = http.MakeRequest(config={'hedge': {'delay': 0.01}})
+        calls = []
+
+        def get(url, **kwargs):
+            calls.append(url)
+            time.sleep(0.05)
+            return tests.FakeHttpResponse()
+
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            make_req.get(self.url, kwargs={'stream': True})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(make_req.hedger.stats['requests'], 0)
+
+    def test_host_limit_not_hedged(self):
+        make_req = http.MakeRequest(
+            config={'hedge': {'delay': 0.01}, 'max_per_host': 1}
+        )
+        calls = []
+
+        def get(url, **kwargs):
+            calls.append(url)
+            time.sleep(0.05)
+            return tests.FakeHttpResponse()
+
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            make_req.get(self.url)
+        # The only slot is held by the original request
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(make_req.hedger.stats['not_ready'], 1)
+
+    def test_post_not_hedged(self):
+        make_req = http.MakeRequest(config={'hedge': {'delay': 0.01}})
+        calls = []
+
+        def post(url, **kwargs):
+            calls.append(url)
+            time.sleep(0.05)
+            return tests.FakeHttpResponse()
+
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.post = post
+            make_req.post(self.url, body='test')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(make_req.hedger.stats['requests'], 0)
@@ -0,0 +1,206 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_json
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+ITEMS = [
+    {'id': 1, 'name': u'caf\xe9', 'tags': ['a', 'b']},
+    {'id': 2, 'name': 'quote " and \\ slash', 'size': 12345678},
+    [1, 2.5, None, True, False],
+    'text',
+    -1.5e10,
+    123456789
+]
+
+
+def blocks(data, size):
+    data = data.encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestLoads(unittest.TestCase):
+    def test_loads(self):
+        data = json.dumps({'items': ITEMS})
+        self.assertEqual(http_json.loads(data), {'items': ITEMS})
+        self.assertEqual(
+            http_json.loads(data.encode('utf-8')), {'items': ITEMS}
+        )
+
+    def test_loads_stdlib(self):
+        with mock.patch.object(http_json, 'orjson', None):
+            self.assertEqual(http_json.backend(), 'json')
+            self.assertEqual(
+                http_json.loads(json.dumps(ITEMS).encode('utf-8')), ITEMS
+            )
+
+    def test_loads_invalid(self):
+        self.assertRaises(ValueError, http_json.loads, b'{"id": ')
+        with mock.patch.object(http_json, 'orjson', None):
+            self.assertRaises(ValueError, http_json.loads, b'{"id": ')
+
+
+class TestIterItems(unittest.TestCase):
+    def test_array(self):
+        data = json.dumps(ITEMS)
+        for size in (1, 2, 7, 4096):
+            self.assertEqual(
+                list(http_json.iter_items(blocks(data, size))), ITEMS
+            )
+
+    def test_key(self):
+        data = json.dumps({
+            'count': 6, 'next': None, 'meta': {'items': [0]}, 'items': ITEMS
+        })
+        for size in (1, 5, 4096):
+            self.assertEqual(
+                list(http_json.iter_items(blocks(data, size), key='items')),
+                ITEMS
+            )
+
+    def test_nested_key(self):
+        data = json.dumps({'data': {'total': 6, 'items': ITEMS}})
+        self.assertEqual(
+            list(http_json.iter_items(blocks(data, 3), key='data.items')),
+            ITEMS
+        )
+
+    def test_missing_key(self):
+        for data in ('{"count": 0}', '{}', '{"items": null}'):
+            self.assertEqual(
+                list(http_json.iter_items(blocks(data, 2), key='items')), []
+            )
+
+    def test_empty_array(self):
+        self.assertEqual(list(http_json.iter_items([b' [ ] '])), [])
+
+    def test_whitespace(self):
+        data = '\n[ 1 ,\n\t2 , {"a" : [ ]} ]\n'
+        self.assertEqual(
+            list(http_json.iter_items(blocks(data, 1))), [1, 2, {'a': []}]
+        )
+
+    def test_lazy(self):
+        consumed = []
+
+        def source():
+            for block in blocks(json.dumps(ITEMS), 10):
+                consumed.append(block)
+                yield block
+
+        items = http_json.iter_items(source())
+        self.assertEqual(next(items), ITEMS[0])
+        self.assertTrue(len(consumed) < len(blocks(json.dumps(ITEMS), 10)))
+
+    def test_truncated(self):
+        data = json.dumps(ITEMS)[:-20]
+        items = http_json.iter_items(blocks(data, 4))
+        self.assertRaises(ValueError, list, items)
+
+    def test_invalid(self):
+        self.assertRaises(
+            ValueError, list, http_json.iter_items([b'[1 2]'])
+        )
+        self.assertRaises(
+            ValueError, list, http_json.iter_items([b'{"a": 1}'])
+        )
+        self.assertRaises(
+            ValueError,
+            list,
+            http_json.iter_items([b'{"a": 1 "items": []}'], key='items')
+        )
+
+
+class JSONHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = json.dumps({'items': ITEMS}).encode('utf-8')
+        half = len(body) // 2
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index, part in enumerate((body[:half], body[half:])):
+            if index:
+                # Hold the rest of the body until the client has an item
+                self.server.release.wait(5)
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(part), part))
+            self.wfile.flush()
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestGetJson(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(JSONHandler)
+        self.server.release = threading.Event()
+        self.url = self.server.url
+
+    def tearDown(self):
+        self.server.release.set()
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_get_json(self):
+        self.server.release.set()
+        with http.MakeRequest() as make_req:
+            self.assertEqual(make_req.get_json(self.url), {'items': ITEMS})
+            self.assertEqual(make_req.get_json(self.url, key='items'), ITEMS)
+
+    def test_get_json_stream(self):
+        config = {'chunk_size': 16}
+        with http.MakeRequest(config=config) as make_req:
+            items = make_req.get_json(self.url, key='items', stream=True)
+            # The first item is available before the body is complete
+            self.assertEqual(next(items), ITEMS[0])
+            self.server.release.set()
+            self.assertEqual(list(items), ITEMS[1:])
+
+    def test_get_json_error(self):
+        with http.MakeRequest() as make_req:
+            self.assertRaises(
+                requests.RequestException,
+                make_req.get_json,
+                self.url + 'missing'
+            )
+            items = make_req.get_json(self.url + 'missing', stream=True)
+            self.assertRaises(requests.RequestException, list, items)
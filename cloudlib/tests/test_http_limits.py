@@ -0,0 +1,232 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from cloudlib import http
+from cloudlib import http_limits
+from cloudlib import tests
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst(self):
+        bucket = http_limits.TokenBucket(rate=1, burst=3)
+        for _ in range(3):
+            self.assertEqual(bucket.reserve(), 0)
+        self.assertTrue(bucket.reserve() > 0)
+        self.assertEqual(bucket.stats['throttled'], 1)
+
+    def test_wait_grows_with_debt(self):
+        bucket = http_limits.TokenBucket(rate=10, burst=1)
+        bucket.reserve()
+        first = bucket.reserve()
+        second = bucket.reserve()
+        self.assertAlmostEqual(second - first, 0.1, places=2)
+
+    def test_large_reservation(self):
+        bucket = http_limits.TokenBucket(rate=100, burst=100)
+        wait = bucket.reserve(300)
+        self.assertAlmostEqual(wait, 2, places=2)
+
+    def test_acquire_sleeps(self):
+        bucket = http_limits.TokenBucket(rate=1, burst=1)
+        bucket.sleep = mock.Mock()
+        bucket.acquire()
+        self.assertFalse(bucket.sleep.called)
+        bucket.acquire()
+        self.assertTrue(bucket.sleep.called)
+
+    def test_refill(self):
+        bucket = http_limits.TokenBucket(rate=1000, burst=1)
+        bucket.reserve()
+        time.sleep(0.01)
+        self.assertEqual(bucket.reserve(), 0)
+
+
+class TestHostLimiter(unittest.TestCase):
+    def test_try_acquire(self):
+        limiter = http_limits.HostLimiter(max_per_host=1)
+        self.assertTrue(limiter.try_acquire('a'))
+        self.assertFalse(limiter.try_acquire('a'))
+        self.assertTrue(limiter.try_acquire('b'))
+        limiter.release('a')
+        self.assertTrue(limiter.try_acquire('a'))
+
+    def test_available(self):
+        limiter = http_limits.HostLimiter(max_per_host=1)
+        self.assertTrue(limiter.available('a'))
+        limiter.acquire('a')
+        self.assertFalse(limiter.available('a'))
+        self.assertTrue(limiter.available('b'))
+
+    def test_waiter_called_on_release(self):
+        limiter = http_limits.HostLimiter(max_per_host=1)
+        waiter = mock.Mock()
+        limiter.try_acquire('a')
+        limiter.try_acquire('a', waiter=waiter)
+        self.assertFalse(waiter.called)
+        limiter.release('a')
+        self.assertTrue(waiter.called)
+
+    def test_acquire_blocks(self):
+        limiter = http_limits.HostLimiter(max_per_host=1)
+        limiter.acquire('a')
+        acquired = threading.Event()
+
+        def worker():
+            limiter.acquire('a')
+            acquired.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        self.assertFalse(acquired.wait(0.05))
+        limiter.release('a')
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(limiter.active('a'), 1)
+
+
+class TestBandwidth(unittest.TestCase):
+    def test_waits_for_slowest_bucket(self):
+        fast = http_limits.TokenBucket(rate=1000, burst=100)
+        slow = http_limits.TokenBucket(rate=100, burst=100)
+        bandwidth = http_limits.Bandwidth([fast, slow])
+        bandwidth.sleep = mock.Mock()
+        self.assertEqual(bandwidth.acquire(100), 0)
+        wait = bandwidth.acquire(100)
+        self.assertAlmostEqual(wait, 1, places=2)
+        bandwidth.sleep.assert_called_once_with(wait)
+        self.assertEqual(fast.stats['acquired'], 200)
+
+    def test_build_bandwidth(self):
+        self.assertIsNone(http_limits.build_bandwidth({}))
+        bandwidth = http_limits.build_bandwidth({'bandwidth': 1000})
+        self.assertEqual(bandwidth.buckets[0].rate, 1000)
+        self.assertEqual(bandwidth.buckets[0].burst, 100)
+
+        shared = http_limits.TokenBucket(rate=5000)
+        bandwidth = http_limits.build_bandwidth(
+            {'bandwidth': [{'rate': 1000, 'burst': 10}, shared]}
+        )
+        self.assertEqual(bandwidth.buckets[0].burst, 10)
+        self.assertIs(bandwidth.buckets[1], shared)
+
+
+class TestMakeRequestLimits(unittest.TestCase):
+    def setUp(self):
+        self.url = 'http://example.com'
+
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_build_limiters(self):
+        make_req = http.MakeRequest(
+            config={'rate_limit': {'rate': 5, 'burst': 10}, 'max_per_host': 2}
+        )
+        self.assertEqual(make_req.rate_limiter.rate, 5)
+        self.assertEqual(make_req.host_limiter.max_per_host, 2)
+
+    def test_max_per_host_bool(self):
+        for value in (True, False):
+            self.assertRaises(
+                ValueError, http.MakeRequest, config={'max_per_host': value}
+            )
+
+    def test_shared_limiter(self):
+        bucket = http_limits.TokenBucket(rate=5)
+        one = http.MakeRequest(config={'rate_limit': bucket})
+        two = http.MakeRequest(config={'rate_limit': bucket})
+        self.assertIs(one.rate_limiter, two.rate_limiter)
+
+    def test_limiters_disabled(self):
+        make_req = http.MakeRequest()
+        self.assertEqual(make_req.rate_limiter, None)
+        self.assertEqual(make_req.host_limiter, None)
+
+    def test_request_uses_limiters(self):
+        make_req = http.MakeRequest(
+            config={'rate_limit': {'rate': 5}, 'max_per_host': 1}
+        )
+        in_flight = []
+
+        def get(*args, **kwargs):
+            in_flight.append(make_req.host_limiter.active('example.com'))
+            return tests.FakeHttpResponse()
+
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            make_req.get(self.url)
+        self.assertEqual(in_flight, [1])
+        self.assertEqual(make_req.host_limiter.active('example.com'), 0)
+        self.assertEqual(make_req.rate_limiter.stats['acquired'], 1)
+
+    def test_max_per_host_batch(self):
+        make_req = http.MakeRequest(config={'max_per_host': 2})
+        lock = threading.Lock()
+        peak = [0]
+
+        def get(*args, **kwargs):
+            with lock:
+                peak[0] = max(
+                    peak[0], make_req.host_limiter.active('example.com')
+                )
+            time.sleep(0.01)
+            return tests.FakeHttpResponse()
+
+        batch = [('get', self.url) for _ in range(10)]
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get = get
+            results = list(make_req.batch(batch, workers=5))
+        self.assertEqual(len(results), 10)
+        self.assertEqual(peak[0], 2)
+
+    def test_shared_bandwidth(self):
+        shared = http_limits.TokenBucket(rate=1000)
+        one = http.MakeRequest(config={'bandwidth': [500, shared]})
+        two = http.MakeRequest(config={'bandwidth': shared})
+        self.assertIs(one.bandwidth.buckets[1], two.bandwidth.buckets[0])
+        self.assertIsNot(
+            one.bandwidth.buckets[0],
+            http.MakeRequest(config={'bandwidth': 500}).bandwidth.buckets[0]
+        )
+
+    def test_download_throttled(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        resp = tests.FakeHttpResponse()
+        resp.content = os.urandom(100 * 1024)
+
+        bucket = http_limits.TokenBucket(rate=50 * 1024, burst=1024)
+        config = {'bandwidth': bucket, 'chunk_size': 10 * 1024}
+        make_req = http.MakeRequest(config=config)
+        make_req.bandwidth.sleep = mock.Mock()
+        with mock.patch.object(make_req, 'session') as mock_session:
+            mock_session.get.return_value = resp
+            make_req.download(self.url, os.path.join(temp_dir, 'file'))
+        self.assertEqual(bucket.stats['acquired'], 100 * 1024)
+        self.assertEqual(bucket.stats['throttled'], 10)
+        # Nothing slept so the last block waits for the whole download
+        last_wait = make_req.bandwidth.sleep.call_args[0][0]
+        self.assertAlmostEqual(last_wait, 2, delta=0.1)
@@ -0,0 +1,183 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import socket
+import unittest
+
+import mock
+
+from cloudlib import http
+from cloudlib import http_adapter
+from cloudlib import http_metrics
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+class FakeHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'testbody'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHistogram(unittest.TestCase):
+    def test_empty(self):
+        histogram = http_metrics.Histogram()
+        self.assertIsNone(histogram.percentile(50))
+        self.assertIsNone(histogram.mean)
+        self.assertEqual(histogram.as_dict()['count'], 0)
+
+    def test_percentiles(self):
+        histogram = http_metrics.Histogram()
+        for value in range(1, 101):
+            histogram.observe(value / 100.0)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.min, 0.01)
+        self.assertEqual(histogram.max, 1.0)
+        self.assertAlmostEqual(histogram.mean, 0.505)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.05)
+        self.assertAlmostEqual(histogram.percentile(90), 0.9, delta=0.09)
+        self.assertEqual(histogram.percentile(100), 1.0)
+
+    def test_out_of_range(self):
+        histogram = http_metrics.Histogram(minimum=0.1, maximum=1)
+        histogram.observe(0.01)
+        histogram.observe(50)
+        self.assertEqual(histogram.percentile(0), 0.01)
+        self.assertEqual(histogram.percentile(100), 50)
+
+
+class TestLatencyAggregator(unittest.TestCase):
+    def timing(self, host='example.com', method='get', total=0.1,
+               error=None):
+        timing = http_metrics.RequestTiming(method, 'http://' + host, host)
+        timing.total = total
+        timing.ttfb = total / 2
+        timing.bytes_received = 10
+        timing.error = error
+        return timing
+
+    def test_aggregate(self):
+        aggregator = http_metrics.LatencyAggregator()
+        aggregator(self.timing())
+        aggregator(self.timing(total=0.3))
+        aggregator(self.timing(error=Exception('failed')))
+        aggregator(self.timing(method='post'))
+        aggregator(self.timing(host='other.com'))
+
+        snapshot = aggregator.snapshot()
+        self.assertEqual(
+            sorted(snapshot.keys()),
+            ['example.com GET', 'example.com POST', 'other.com GET']
+        )
+        series = snapshot['example.com GET']
+        self.assertEqual(series['requests'], 3)
+        self.assertEqual(series['errors'], 1)
+        self.assertEqual(series['bytes_received'], 30)
+        self.assertEqual(series['total']['count'], 3)
+        self.assertEqual(series['ttfb']['count'], 3)
+        self.assertEqual(series['dns']['count'], 0)
+        self.assertEqual(
+            aggregator.histogram('example.com', 'GET').max, 0.3
+        )
+
+    def test_shared_between_clients(self):
+        aggregator = http_metrics.LatencyAggregator()
+        make_req = http.MakeRequest(config={'metrics': aggregator})
+        other_req = http.MakeRequest(config={'metrics': aggregator})
+        self.assertIs(make_req.metrics, other_req.metrics)
+        self.assertIn(aggregator, make_req.hooks['post_request'])
+
+
+class TestRequestTimings(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(FakeHandler)
+        self.url = 'http://localhost:%s/' % self.server.port
+
+    def tearDown(self):
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_timings(self):
+        timings = []
+        with http.MakeRequest(config={'metrics': True}) as make_req:
+            make_req.add_hook('post_request', timings.append)
+            make_req.get(self.url)
+            make_req.get(self.url)
+
+        first, second = timings
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.bytes_received, len(b'testbody'))
+        self.assertTrue(first.dns > 0)
+        self.assertTrue(first.connect > 0)
+        self.assertEqual(first.tls, 0)
+        self.assertTrue(first.ttfb <= first.total)
+
+        # The second request reuses the pooled connection
+        self.assertEqual(second.dns, 0)
+        self.assertEqual(second.connect, 0)
+
+        host = 'localhost:%s' % self.server.port
+        snapshot = make_req.metrics.snapshot()
+        self.assertEqual(snapshot['%s GET' % host]['requests'], 2)
+
+    def test_bytes_sent_encoded(self):
+        with http.MakeRequest() as make_req:
+            timing = make_req._timing(
+                'post', self.url, 'localhost', u'caf\xe9', {}, 0
+            )
+        self.assertEqual(timing.bytes_sent, len(u'caf\xe9'.encode('utf-8')))
+
+    def test_custom_resolver(self):
+        resolved = []
+
+        def resolver(host, port):
+            resolved.append((host, port))
+            return ['127.0.0.1']
+
+        adapter = http_adapter.CloudlibAdapter(resolver=resolver)
+        with http.MakeRequest() as make_req:
+            make_req.session.mount('http://', adapter)
+            resp = make_req.get(self.url)
+        self.assertEqual(resp.content, b'testbody')
+        self.assertEqual(
+            resolved, [('localhost', self.server.port)]
+        )
+
+    def test_resolution_failure(self):
+        def resolver(host, port):
+            raise socket.gaierror('no such host')
+
+        adapter = http_adapter.CloudlibAdapter(resolver=resolver)
+        with http.MakeRequest() as make_req:
+            make_req.session.mount('http://', adapter)
+            self.assertRaises(
+                http.requests.ConnectionError, make_req.get, self.url
+            )
@@ -0,0 +1,281 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from xml.etree import ElementTree
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_multipart
+from cloudlib import http_retry
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+    import urlparse
+except ImportError:
+    import http.server as server
+    import urllib.parse as urlparse
+
+
+class ObjectStoreHandler(server.BaseHTTPRequestHandler):
+    """A tiny object store answering both Swift and S3 style uploads."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_PUT(self):
+        body = self.read_body()
+        with self.server.lock:
+            self.server.requests.append(('PUT', self.path))
+            failures = self.server.fail.get(self.path, 0)
+            if failures:
+                self.server.fail[self.path] = failures - 1
+                return self.reply(503)
+            self.server.objects[self.path] = body
+        self.reply(201, headers={'ETag': hashlib.md5(body).hexdigest()})
+
+    def do_POST(self):
+        body = self.read_body()
+        query = urlparse.parse_qs(
+            urlparse.urlsplit(self.path).query, keep_blank_values=True
+        )
+        with self.server.lock:
+            self.server.requests.append(('POST', self.path))
+            self.server.objects[self.path] = body
+        if 'uploads' in query:
+            self.reply(200, (
+                b'<InitiateMultipartUploadResult xmlns="http://s3.amazonaws'
+                b'.com/doc/2006-03-01/"><UploadId>upload1</UploadId>'
+                b'</InitiateMultipartUploadResult>'
+            ))
+        else:
+            self.reply(200)
+
+    def do_DELETE(self):
+        with self.server.lock:
+            self.server.requests.append(('DELETE', self.path))
+            self.server.objects.pop(self.path, None)
+        self.reply(204)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSplitParts(unittest.TestCase):
+    def test_split_parts(self):
+        parts = http_multipart.split_parts(25, part_size=10)
+        self.assertEqual(
+            [(p.number, p.offset, p.size) for p in parts],
+            [(1, 0, 10), (2, 10, 10), (3, 20, 5)]
+        )
+
+    def test_split_parts_empty(self):
+        parts = http_multipart.split_parts(0, part_size=10)
+        self.assertEqual([(p.offset, p.size) for p in parts], [(0, 0)])
+
+    def test_swift_segment_url(self):
+        strategy = http_multipart.SwiftSLOStrategy()
+        part = http_multipart.Part(3, 0, 10)
+        url, params = strategy.part_request(
+            'https://example.com/v1/AUTH_test/backups/a/b.tar', part, None
+        )
+        self.assertEqual(
+            url,
+            'https://example.com/v1/AUTH_test/backups_segments/a/b.tar/'
+            '00000003'
+        )
+        self.assertIsNone(params)
+
+
+class TestMultipartUpload(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        self.retry_logger_patched = mock.patch(
+            'cloudlib.http_retry.logger.getLogger'
+        )
+        self.retry_logger = self.retry_logger_patched.start()
+        self.retry_logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(ObjectStoreHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = []
+        self.server.objects = {}
+        self.server.fail = {}
+        self.endpoint = self.server.url.rstrip('/')
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.local_file = os.path.join(self.temp_dir, 'object')
+        self.content = os.urandom(250 * 1024)
+        with open(self.local_file, 'wb') as f:
+            f.write(self.content)
+
+        # Do not let these tests drain the process wide retry budget
+        self.retry = {'backoff_factor': 0, 'budget': http_retry.RetryBudget()}
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        self.server.stop()
+        self.retry_logger_patched.stop()
+        self.logger_patched.stop()
+
+    def swift_upload(self, config=None, **kwargs):
+        with http.MakeRequest(config=config) as make_req:
+            return make_req.multipart_upload(
+                self.endpoint + '/v1/AUTH_test/backups/object',
+                local_file=self.local_file,
+                strategy=http_multipart.SwiftSLOStrategy(),
+                part_size=100 * 1024,
+                workers=3,
+                retry=self.retry,
+                **kwargs
+            )
+
+    def test_swift_upload(self):
+        progress = []
+        resp = self.swift_upload(
+            progress=lambda sent, total: progress.append((sent, total))
+        )
+        self.assertEqual(resp.status_code, 201)
+
+        segments = [
+            self.server.objects[
+                '/v1/AUTH_test/backups_segments/object/%08d' % number
+            ]
+            for number in (1, 2, 3)
+        ]
+        self.assertEqual(b''.join(segments), self.content)
+
+        manifest = json.loads(
+            self.server.objects[
+                '/v1/AUTH_test/backups/object?multipart-manifest=put'
+            ].decode('utf-8')
+        )
+        self.assertEqual(
+            [m['size_bytes'] for m in manifest], [102400, 102400, 51200]
+        )
+        self.assertEqual(
+            manifest[0]['etag'], hashlib.md5(segments[0]).hexdigest()
+        )
+        self.assertEqual(
+            manifest[2]['path'], '/backups_segments/object/00000003'
+        )
+        self.assertEqual(progress[-1], (len(self.content), len(self.content)))
+
+    def test_swift_upload_mmap(self):
+        self.swift_upload(use_mmap=True)
+        self.assertEqual(
+            self.server.objects[
+                '/v1/AUTH_test/backups_segments/object/00000002'
+            ],
+            self.content[102400:204800]
+        )
+
+    def test_part_retry(self):
+        segment = '/v1/AUTH_test/backups_segments/object/00000002'
+        self.server.fail[segment] = 2
+        resp = self.swift_upload()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(
+            len([r for r in self.server.requests if r[1] == segment]), 3
+        )
+        self.assertEqual(
+            self.server.objects[segment], self.content[102400:204800]
+        )
+
+    def test_part_failure_aborts(self):
+        segment = '/v1/AUTH_test/backups_segments/object/00000002'
+        self.server.fail[segment] = 10
+        self.retry['total'] = 1
+        self.assertRaises(requests.RequestException, self.swift_upload)
+        methods = [r[0] for r in self.server.requests]
+        self.assertIn('DELETE', methods)
+        self.assertNotIn(
+            '/v1/AUTH_test/backups/object?multipart-manifest=put',
+            self.server.objects
+        )
+        self.assertNotIn(
+            '/v1/AUTH_test/backups_segments/object/00000001',
+            self.server.objects
+        )
+
+    def test_part_retry_ignores_client_retry(self):
+        segment = '/v1/AUTH_test/backups_segments/object/00000002'
+        self.server.fail[segment] = 10
+        self.retry['total'] = 1
+        config = {
+            'retry': {
+                'total': 3,
+                'backoff_factor': 0,
+                'budget': http_retry.RetryBudget()
+            }
+        }
+        self.assertRaises(
+            requests.RequestException, self.swift_upload, config=config
+        )
+        # Only the part retry policy applies, not both multiplied
+        self.assertEqual(
+            len([r for r in self.server.requests if r[1] == segment]), 2
+        )
+
+    def test_s3_upload(self):
+        with http.MakeRequest() as make_req:
+            resp = make_req.multipart_upload(
+                self.endpoint + '/bucket/object',
+                local_file=self.local_file,
+                strategy=http_multipart.S3Strategy(),
+                part_size=100 * 1024,
+                retry=self.retry
+            )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(
+            self.server.requests[0], ('POST', '/bucket/object?uploads=')
+        )
+
+        parts = [
+            self.server.objects[
+                '/bucket/object?partNumber=%s&uploadId=upload1' % number
+            ]
+            for number in (1, 2, 3)
+        ]
+        self.assertEqual(b''.join(parts), self.content)
+
+        complete = ElementTree.fromstring(
+            self.server.objects['/bucket/object?uploadId=upload1']
+        )
+        etags = [e.text for e in complete.iter() if e.tag.endswith('ETag')]
+        self.assertEqual(
+            etags, ['"%s"' % hashlib.md5(p).hexdigest() for p in parts]
+        )
@@ -0,0 +1,155 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import email.utils
+import time
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_retry
+from cloudlib import tests
+
+
+def fake_response(status_code=200, headers=None):
+    resp = tests.FakeHttpResponse()
+    resp.status_code = status_code
+    resp.headers = headers or {}
+    return resp
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_min_per_second(self):
+        budget = http_retry.RetryBudget(ratio=0, min_per_second=1, ttl=2)
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+    def test_ratio(self):
+        budget = http_retry.RetryBudget(ratio=0.5, min_per_second=0, ttl=10)
+        self.assertFalse(budget.withdraw())
+        for _ in range(4):
+            budget.request()
+        self.assertTrue(budget.withdraw())
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def setUp(self):
+        self.url = 'http://example.com'
+
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.budget = http_retry.RetryBudget()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def make_request(self, responses, method='get', **retry_config):
+        retry_config.setdefault('budget', self.budget)
+        make_req = http.MakeRequest(config={'retry': retry_config})
+        make_req.retry.sleep = mock.Mock()
+        patched = mock.patch.object(make_req, 'session')
+        mock_session = patched.start()
+        self.addCleanup(patched.stop)
+        getattr(mock_session, method).side_effect = responses
+        return make_req
+
+    def test_parse_retry_after_seconds(self):
+        self.assertEqual(http_retry.parse_retry_after('120'), 120)
+        self.assertEqual(http_retry.parse_retry_after(None), None)
+        self.assertEqual(http_retry.parse_retry_after('garbage'), None)
+
+    def test_parse_retry_after_date(self):
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        delay = http_retry.parse_retry_after(date)
+        self.assertTrue(55 < delay <= 60)
+
+    def test_backoff_full_jitter(self):
+        policy = http_retry.RetryPolicy(backoff_factor=1, backoff_max=5)
+        for attempt in range(6):
+            delay = policy.backoff(attempt)
+            self.assertTrue(0 <= delay <= min(5, 2 ** attempt))
+
+    def test_backoff_retry_after(self):
+        policy = http_retry.RetryPolicy(backoff_max=5)
+        resp = fake_response(429, {'Retry-After': '3'})
+        self.assertEqual(policy.backoff(0, resp=resp), 3)
+        resp = fake_response(429, {'Retry-After': '300'})
+        self.assertEqual(policy.backoff(0, resp=resp), 5)
+
+    def test_retry_status(self):
+        make_req = self.make_request(
+            [fake_response(503), fake_response(429), fake_response(200)]
+        )
+        resp = make_req.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(make_req.retry.sleep.call_count, 2)
+        stats = make_req.retry.stats
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['retries'], 2)
+
+    def test_retry_connection_error(self):
+        make_req = self.make_request(
+            [requests.ConnectionError('reset'), fake_response(200)]
+        )
+        resp = make_req.get(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(make_req.retry.stats['retries'], 1)
+
+    def test_retry_gives_up(self):
+        make_req = self.make_request(
+            [fake_response(500) for _ in range(3)], total=2
+        )
+        resp = make_req.get(self.url)
+        self.assertEqual(resp.status_code, 500)
+        self.assertEqual(make_req.retry.stats['retries'], 2)
+        self.assertEqual(make_req.retry.stats['gave_up'], 1)
+
+    def test_retry_gives_up_exception(self):
+        make_req = self.make_request(
+            [requests.Timeout('slow') for _ in range(2)], total=1
+        )
+        self.assertRaises(requests.Timeout, make_req.get, self.url)
+
+    def test_no_retry_post(self):
+        make_req = self.make_request(
+            [fake_response(503), fake_response(200)], method='post'
+        )
+        resp = make_req.post(self.url, body='TestBody')
+        self.assertEqual(resp.status_code, 503)
+
+    def test_no_retry_unreplayable_body(self):
+        make_req = self.make_request(
+            [fake_response(503), fake_response(200)], method='put'
+        )
+        resp = make_req.put(self.url, body=iter([b'TestBody']))
+        self.assertEqual(resp.status_code, 503)
+
+    def test_retry_budget_exhausted(self):
+        budget = http_retry.RetryBudget(ratio=0, min_per_second=0)
+        make_req = self.make_request(
+            [fake_response(503), fake_response(200)], budget=budget
+        )
+        resp = make_req.get(self.url)
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(make_req.retry.stats['budget_exhausted'], 1)
+
+    def test_retry_disabled(self):
+        self.assertEqual(http.MakeRequest().retry, None)
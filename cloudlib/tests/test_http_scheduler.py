@@ -0,0 +1,184 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import unittest
+
+import mock
+
+from cloudlib import http_scheduler
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+
+class GatedRequest(object):
+    """Stand in for ``MakeRequest`` which blocks until the gate opens."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+        self.lock = threading.Lock()
+
+    def _request(self, method, url, headers=None, body=None, kwargs=None):
+        self.started.set()
+        self.gate.wait(10)
+        with self.lock:
+            self.order.append(url)
+        if url == 'fail':
+            raise ValueError('failed')
+        return '%s %s' % (method, url)
+
+
+class TestPriorityScheduler(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_scheduler.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        self.make_req = GatedRequest()
+
+    def tearDown(self):
+        self.make_req.gate.set()
+        self.logger_patched.stop()
+
+    def busy_scheduler(self, **kwargs):
+        """Return a single worker scheduler whose worker is occupied."""
+        scheduler = http_scheduler.PriorityScheduler(
+            self.make_req, workers=1, **kwargs
+        )
+        scheduler.submit('get', 'blocker', priority='bulk')
+        self.assertTrue(self.make_req.started.wait(5))
+        return scheduler
+
+    def test_result(self):
+        with http_scheduler.PriorityScheduler(self.make_req) as scheduler:
+            self.make_req.gate.set()
+            request = scheduler.submit('get', 'url')
+            self.assertEqual(request.result(timeout=5), 'get url')
+            self.assertTrue(request.done())
+            self.assertTrue(request.wait >= 0)
+
+    def test_error(self):
+        with http_scheduler.PriorityScheduler(self.make_req) as scheduler:
+            self.make_req.gate.set()
+            request = scheduler.submit('get', 'fail')
+            self.assertRaises(ValueError, request.result, 5)
+        self.assertEqual(scheduler.stats['normal']['failed'], 1)
+
+    def test_result_timeout(self):
+        scheduler = self.busy_scheduler()
+        request = scheduler.submit('get', 'url')
+        self.assertRaises(queue.Empty, request.result, 0.01)
+
+    def test_weighted_order(self):
+        scheduler = self.busy_scheduler(
+            priorities={'high': 4, 'low': 1, 'bulk': 1}
+        )
+        for index in range(3):
+            scheduler.submit('get', 'low%d' % index, priority='low')
+        for index in range(6):
+            scheduler.submit('get', 'high%d' % index, priority='high')
+        self.make_req.gate.set()
+        scheduler.close()
+
+        # High gets four turns for every turn of low, low is not starved
+        self.assertEqual(
+            [i[:-1] for i in self.make_req.order[1:]],
+            ['high', 'high', 'high', 'high', 'low', 'high', 'high', 'low',
+             'low']
+        )
+
+    def test_equal_weights_interleave(self):
+        scheduler = self.busy_scheduler(priorities={'a': 1, 'bulk': 1})
+        for index in range(3):
+            scheduler.submit('get', 'a%d' % index, priority='a')
+        # Submitted last but it does not wait behind the whole of a
+        scheduler.submit('get', 'bulk', priority='bulk')
+        self.make_req.gate.set()
+        scheduler.close()
+        self.assertEqual(
+            self.make_req.order, ['blocker', 'a0', 'bulk', 'a1', 'a2']
+        )
+
+    def test_queue_full(self):
+        scheduler = self.busy_scheduler(max_queue=2)
+        scheduler.submit('get', 'one')
+        scheduler.submit('get', 'two')
+        self.assertRaises(
+            queue.Full, scheduler.submit, 'get', 'three', block=False
+        )
+        self.assertRaises(
+            queue.Full, scheduler.submit, 'get', 'three', timeout=0.05
+        )
+        # Other classes have their own queue
+        scheduler.submit('get', 'other', priority='interactive')
+
+        stats = scheduler.stats
+        self.assertEqual(stats['normal']['depth'], 2)
+        self.assertEqual(stats['normal']['rejected'], 2)
+        self.assertEqual(stats['interactive']['depth'], 1)
+        self.assertEqual(scheduler.depth(), 3)
+
+    def test_blocked_submit(self):
+        scheduler = self.busy_scheduler(max_queue=1)
+        scheduler.submit('get', 'one')
+        submitted = []
+
+        def submit():
+            submitted.append(scheduler.submit('get', 'two', timeout=5))
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        thread.join(0.1)
+        self.assertEqual(submitted, [])
+        self.make_req.gate.set()
+        thread.join(5)
+        self.assertEqual(submitted[0].result(timeout=5), 'get two')
+
+    def test_stats(self):
+        scheduler = self.busy_scheduler()
+        requests = [scheduler.submit('get', 'url%d' % i) for i in range(3)]
+        self.make_req.gate.set()
+        scheduler.close()
+
+        self.assertTrue(all(i.done() for i in requests))
+        stats = scheduler.stats['normal']
+        self.assertEqual(stats['submitted'], 3)
+        self.assertEqual(stats['completed'], 3)
+        self.assertEqual(stats['depth'], 0)
+        self.assertEqual(stats['wait']['count'], 3)
+
+    def test_unknown_priority(self):
+        with http_scheduler.PriorityScheduler(self.make_req) as scheduler:
+            self.assertRaises(
+                ValueError, scheduler.submit, 'get', 'url', priority='urgent'
+            )
+
+    def test_close_without_wait(self):
+        scheduler = self.busy_scheduler()
+        request = scheduler.submit('get', 'url')
+        scheduler.close(wait=False)
+        self.assertRaises(
+            http_scheduler.SchedulerClosed, request.result, 5
+        )
+        self.assertRaises(
+            http_scheduler.SchedulerClosed, scheduler.submit, 'get', 'url'
+        )
@@ -0,0 +1,209 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_metrics
+from cloudlib import http_timeout
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+def timing(host='example.com', connect=0.0, tls=0.0, ttfb=0.01,
+           error=None, timeout=None):
+    result = http_metrics.RequestTiming('GET', 'http://%s/' % host, host)
+    result.dns = 0.0
+    result.connect = connect
+    result.tls = tls
+    result.ttfb = ttfb
+    result.error = error
+    result.timeout = timeout
+    return result
+
+
+class TestTimeoutConfig(unittest.TestCase):
+    def test_split_timeout(self):
+        self.assertEqual(http_timeout.split_timeout(5), (5, 5))
+        self.assertEqual(http_timeout.split_timeout((1, 5)), (1, 5))
+        self.assertEqual(http_timeout.split_timeout(None), (None, None))
+
+    def test_total_timeout(self):
+        self.assertEqual(http_timeout.total_timeout(5), 5)
+        self.assertEqual(http_timeout.total_timeout((1, 5)), 6)
+        self.assertIsNone(http_timeout.total_timeout((1, None)))
+
+    def test_config_timeout(self):
+        self.assertEqual(http_timeout.config_timeout({}), 60)
+        self.assertEqual(
+            http_timeout.config_timeout({'connect_timeout': 2}), (2, 60)
+        )
+        self.assertEqual(
+            http_timeout.config_timeout(
+                {'timeout': 30, 'connect_timeout': 2, 'read_timeout': 10}
+            ),
+            (2, 10)
+        )
+
+    def test_make_request_timeout(self):
+        make_req = http.MakeRequest(
+            config={'connect_timeout': 3, 'read_timeout': 30}
+        )
+        self.assertEqual(make_req.request_kwargs['timeout'], (3, 30))
+
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch(
+            'cloudlib.http_timeout.logger.getLogger'
+        )
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_default_until_samples(self):
+        adaptive = http_timeout.AdaptiveTimeout(min_samples=5)
+        for _ in range(4):
+            adaptive(timing(connect=0.01, ttfb=0.2))
+        self.assertEqual(adaptive.timeout('example.com', (5, 60)), (5, 60))
+        self.assertEqual(adaptive.stats['adapted'], 0)
+
+    def test_learned(self):
+        adaptive = http_timeout.AdaptiveTimeout(
+            min_samples=5, multiplier=2, min_connect=0, min_read=0
+        )
+        for _ in range(10):
+            adaptive(timing(connect=0.1, tls=0.1, ttfb=0.7))
+        connect, read = adaptive.timeout('example.com', 60)
+        self.assertAlmostEqual(connect, 0.4, delta=0.04)
+        self.assertAlmostEqual(read, 1.0, delta=0.1)
+        self.assertEqual(adaptive.timeout('other.com', 60), (60, 60))
+        self.assertEqual(adaptive.stats['observed'], 10)
+
+    def test_reused_connections(self):
+        adaptive = http_timeout.AdaptiveTimeout(min_samples=5)
+        for _ in range(10):
+            adaptive(timing(ttfb=0.01))
+        connect, read = adaptive.timeout('example.com', (5, 60))
+        self.assertEqual(connect, 5)
+        self.assertEqual(read, 1)
+
+    def test_bounds(self):
+        adaptive = http_timeout.AdaptiveTimeout(
+            min_samples=1, min_connect=0.5, max_connect=2, min_read=1,
+            max_read=10
+        )
+        adaptive(timing(connect=0.001, ttfb=100))
+        self.assertEqual(adaptive.timeout('example.com'), (0.5, 10))
+
+    def test_timeouts_raise_limit(self):
+        adaptive = http_timeout.AdaptiveTimeout(
+            min_samples=1, multiplier=1, min_read=0
+        )
+        adaptive(timing(ttfb=0.1))
+        adaptive(timing(
+            error=requests.ReadTimeout('timed out'), timeout=(1, 2)
+        ))
+        adaptive(timing(
+            error=requests.ConnectTimeout('timed out'), timeout=(1, 2)
+        ))
+        connect, read = adaptive.timeout('example.com')
+        self.assertAlmostEqual(connect, 1, delta=0.1)
+        self.assertAlmostEqual(read, 2, delta=0.2)
+        self.assertEqual(adaptive.stats['timeouts'], 2)
+
+    def test_errors_ignored(self):
+        adaptive = http_timeout.AdaptiveTimeout(min_samples=1)
+        adaptive(timing(error=requests.ConnectionError('refused')))
+        adaptive(timing(ttfb=None))
+        self.assertEqual(adaptive.stats['observed'], 0)
+
+    def test_build_adaptive_timeout(self):
+        self.assertIsNone(http_timeout.build_adaptive_timeout({}))
+        adaptive = http_timeout.build_adaptive_timeout(
+            {'adaptive_timeout': {'multiplier': 5}}
+        )
+        self.assertEqual(adaptive.multiplier, 5)
+        self.assertIs(
+            http_timeout.build_adaptive_timeout(
+                {'adaptive_timeout': adaptive}
+            ),
+            adaptive
+        )
+
+
+class SlowHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path == '/slow':
+            time.sleep(1)
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMakeRequestAdaptiveTimeout(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(SlowHandler)
+        self.url = self.server.url
+
+    def tearDown(self):
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_learned_timeout_applied(self):
+        config = {
+            'timeout': 30,
+            'adaptive_timeout': {
+                'min_samples': 10, 'min_read': 0.2, 'min_connect': 0.2
+            }
+        }
+        with http.MakeRequest(config=config) as make_req:
+            for _ in range(10):
+                make_req.get(self.url)
+            connect, read = make_req.adaptive_timeout.timeout(
+                '127.0.0.1:%s' % self.server.port, 30
+            )
+            self.assertEqual(read, 0.2)
+
+            start = time.time()
+            self.assertRaises(
+                requests.ReadTimeout, make_req.get, self.url + 'slow'
+            )
+            self.assertTrue(time.time() - start < 0.9)
+            self.assertEqual(make_req.adaptive_timeout.stats['timeouts'], 1)
+
+            # An explicit timeout is left alone
+            resp = make_req.get(self.url + 'slow', kwargs={'timeout': 5})
+            self.assertEqual(resp.status_code, 200)
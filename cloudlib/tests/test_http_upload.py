@@ -0,0 +1,261 @@
+# Copyright 2015, Kevin Carter.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import mock
+import requests
+
+from cloudlib import http
+from cloudlib import http_retry
+from cloudlib import http_upload
+from cloudlib import tests
+
+# Added for python3 support
+try:
+    import BaseHTTPServer as server
+except ImportError:
+    import http.server as server
+
+
+class UploadHandler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def read_chunked(self):
+        body = b''
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def do_PUT(self):
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            body = self.read_chunked()
+        else:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.uploads.append((dict(self.headers.items()), body))
+
+        digest = hashlib.md5(body).hexdigest().encode('utf-8')
+        self.send_response(201)
+        self.send_header('Content-Length', str(len(digest)))
+        self.end_headers()
+        self.wfile.write(digest)
+
+    do_POST = do_PUT
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUploadBodies(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.local_file = os.path.join(self.temp_dir, 'upload')
+        self.content = os.urandom(100 * 1024 + 7)
+        with open(self.local_file, 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_file_body(self):
+        progress = []
+        with http_upload.FileBody(
+                self.local_file,
+                chunk_size=4096,
+                progress=lambda sent, total: progress.append((sent, total))
+        ) as body:
+            self.assertEqual(len(body), len(self.content))
+            data = b''.join(body)
+        self.assertEqual(data, self.content)
+        self.assertEqual(
+            body.hexdigest(), hashlib.md5(self.content).hexdigest()
+        )
+        self.assertEqual(len(progress), 26)
+        self.assertEqual(progress[-1], (len(self.content), len(self.content)))
+
+    def test_file_body_mmap(self):
+        with http_upload.FileBody(
+                self.local_file, use_mmap=True, hash_type='sha256'
+        ) as body:
+            self.assertIsNotNone(body._map)
+            data = b''
+            for chunk in iter(lambda: body.read(8192), b''):
+                data += chunk
+        self.assertEqual(data, self.content)
+        self.assertEqual(
+            body.hexdigest(), hashlib.sha256(self.content).hexdigest()
+        )
+
+    def test_file_body_mmap_empty(self):
+        empty_file = os.path.join(self.temp_dir, 'empty')
+        open(empty_file, 'wb').close()
+        with http_upload.FileBody(empty_file, use_mmap=True) as body:
+            self.assertEqual(body.read(), b'')
+            self.assertEqual(len(body), 0)
+
+    def test_file_body_rewind(self):
+        with http_upload.FileBody(self.local_file) as body:
+            body.read(1000)
+            body.rewind()
+            self.assertEqual(body.bytes_read, 0)
+            self.assertEqual(body.read(), self.content)
+        self.assertEqual(
+            body.hexdigest(), hashlib.md5(self.content).hexdigest()
+        )
+
+    def test_iter_body(self):
+        progress = []
+        body = http_upload.IterBody(
+            iter([b'test', 'body', b'']),
+            progress=lambda sent, total: progress.append((sent, total))
+        )
+        self.assertEqual(list(body), [b'test', b'body'])
+        self.assertEqual(
+            body.hexdigest(), hashlib.md5(b'testbody').hexdigest()
+        )
+        self.assertEqual(progress, [(4, None), (8, None)])
+        self.assertFalse(body.rewindable)
+        self.assertRaises(IOError, body.rewind)
+
+    def test_throttle(self):
+        sizes = []
+        with http_upload.FileBody(
+                self.local_file, chunk_size=8192, throttle=sizes.append
+        ) as body:
+            b''.join(body)
+        self.assertEqual(sum(sizes), len(self.content))
+        self.assertEqual(max(sizes), 8192)
+
+    def test_no_hash(self):
+        body = http_upload.IterBody(iter([b'test']), hash_type=None)
+        list(body)
+        self.assertIsNone(body.hexdigest())
+
+
+class TestUpload(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.http.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+
+        self.server = tests.LocalServer(UploadHandler)
+        self.server.uploads = []
+        self.url = self.server.url + 'upload'
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.local_file = os.path.join(self.temp_dir, 'upload')
+        self.content = os.urandom(300 * 1024)
+        with open(self.local_file, 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+        self.server.stop()
+        self.logger_patched.stop()
+
+    def test_upload_file(self):
+        with http.MakeRequest() as make_req:
+            resp, digest = make_req.upload(
+                self.url, local_file=self.local_file
+            )
+        headers, body = self.server.uploads[0]
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(body, self.content)
+        self.assertEqual(headers['Content-Length'], str(len(self.content)))
+        self.assertEqual(digest, hashlib.md5(self.content).hexdigest())
+        self.assertEqual(resp.text, digest)
+
+    def test_upload_file_mmap(self):
+        with http.MakeRequest() as make_req:
+            resp, digest = make_req.upload(
+                self.url, local_file=self.local_file, use_mmap=True
+            )
+        self.assertEqual(self.server.uploads[0][1], self.content)
+        self.assertEqual(resp.text, digest)
+
+    def test_upload_iterator(self):
+        chunks = [self.content[i:i + 1000] for i in range(0, 10000, 1000)]
+        progress = []
+        with http.MakeRequest() as make_req:
+            resp, digest = make_req.upload(
+                self.url,
+                iterator=iter(chunks),
+                method='post',
+                progress=lambda sent, total: progress.append(sent)
+            )
+        headers, body = self.server.uploads[0]
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        self.assertEqual(body, b''.join(chunks))
+        self.assertEqual(resp.text, digest)
+        self.assertEqual(progress[-1], 10000)
+
+    def test_upload_throttled(self):
+        config = {'bandwidth': {'rate': 1024 * 1024, 'burst': 64 * 1024}}
+        with http.MakeRequest(config=config) as make_req:
+            start = time.time()
+            resp, digest = make_req.upload(
+                self.url, local_file=self.local_file
+            )
+        # 300KB at 1MB/s after a 64KB burst
+        self.assertTrue(time.time() - start >= 0.2)
+        self.assertEqual(self.server.uploads[0][1], self.content)
+        bucket = make_req.bandwidth.buckets[0]
+        self.assertEqual(bucket.stats['acquired'], len(self.content))
+
+    def test_upload_retry_rewinds(self):
+        config = {
+            'retry': {
+                'total': 1,
+                'backoff_factor': 0,
+                'budget': http_retry.RetryBudget()
+            }
+        }
+        with http.MakeRequest(config=config) as make_req:
+            calls = []
+            put = make_req.session.put
+
+            def fail_once(url, data=None, **kwargs):
+                calls.append(data.bytes_read)
+                if len(calls) == 1:
+                    data.read(100)
+                    raise requests.ConnectionError('reset')
+                return put(url, data=data, **kwargs)
+
+            with mock.patch.object(make_req.session, 'put', fail_once):
+                resp, digest = make_req.upload(
+                    self.url, local_file=self.local_file
+                )
+        self.assertEqual(calls, [0, 0])
+        self.assertEqual(self.server.uploads[0][1], self.content)
+        self.assertEqual(resp.text, digest)
+
+    def test_upload_bad_arguments(self):
+        make_req = http.MakeRequest()
+        self.assertRaises(ValueError, make_req.upload, self.url)
+        self.assertRaises(
+            ValueError,
+            make_req.upload,
+            self.url,
+            local_file=self.local_file,
+            method='get'
+        )
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import io
+import time
 import unittest
 
 import mock
@@ -136,3 +137,58 @@ class TestShell(unittest.TestCase):
         self.shell.read_file('test/file')
         file_handle = self.mock_open.return_value.__enter__.return_value
         file_handle.readline.assert_called()
+
+    def test_run_many(self):
+        self.communicate.side_effect = [
+            tests.FakePopen(), tests.FakePopen(return_code=2)
+        ]
+        results = list(
+            self.shell.run_many(['one', 'two'], max_parallel=1)
+        )
+        self.assertEqual(
+            [(i.index, i.output, i.success, i.returncode) for i in results],
+            [(0, 'stdout', True, 0), (1, 'stderr', False, 2)]
+        )
+        self.assertTrue(all(i.duration >= 0 for i in results))
+
+    def test_run_many_return_code(self):
+        self.communicate.return_value = tests.FakePopen(return_code=2)
+        result, = self.shell.run_many(['one'], return_code=[0, 2])
+        self.assertEqual(result.output, 'stdout')
+        self.assertEqual(result.success, True)
+
+    def test_run_many_start_failure(self):
+        self.communicate.side_effect = OSError('no such interpreter')
+        result, = self.shell.run_many(['one'])
+        self.assertEqual(result.success, False)
+        self.assertIsNone(result.returncode)
+
+    def test_run_many_empty(self):
+        self.assertEqual(list(self.shell.run_many([])), [])
+
+
+class TestShellRunMany(unittest.TestCase):
+    def setUp(self):
+        self.logger_patched = mock.patch('cloudlib.shell.logger.getLogger')
+        self.logger = self.logger_patched.start()
+        self.logger.return_value = tests.Logger()
+        self.shell = shell.ShellCommands(debug=True)
+
+    def tearDown(self):
+        self.logger_patched.stop()
+
+    def test_parallel(self):
+        commands = ['sleep 0.3; echo %d' % i for i in range(4)]
+        start = time.time()
+        results = list(self.shell.run_many(commands, max_parallel=4))
+        self.assertTrue(time.time() - start < 1.0)
+        self.assertEqual(
+            sorted(i.output.strip() for i in results),
+            [b'0', b'1', b'2', b'3']
+        )
+
+    def test_as_completed(self):
+        commands = ['sleep 0.5; echo slow', 'echo fast']
+        results = list(self.shell.run_many(commands, max_parallel=2))
+        self.assertEqual([i.index for i in results], [1, 0])
+        self.assertTrue(results[1].duration > results[0].duration)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
 import unittest
 
 from cloudlib import utils
@@ -37,3 +39,97 @@ class TestBasicUtils(unittest.TestCase):
             base_dict=test, update_dict=test_update
         )
         self.assertEqual(return_dict, {'test': 'value', 'other': 'value'})
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = utils.LRUCache(max_size=2)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b', 'default'), 'default')
+
+    def test_evict_least_recently_used(self):
+        cache = utils.LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        evicted = cache.set('c', 3)
+        self.assertEqual(evicted, [('b', 2)])
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_size_func(self):
+        cache = utils.LRUCache(max_size=10, size_func=len)
+        cache.set('a', 'x' * 6)
+        cache.set('b', 'x' * 6)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.size, 6)
+
+    def test_oversized_value(self):
+        cache = utils.LRUCache(max_size=4, size_func=len)
+        cache.set('a', 'x' * 5)
+        self.assertEqual(len(cache), 0)
+
+    def test_pop(self):
+        cache = utils.LRUCache(max_size=2)
+        cache.set('a', 1)
+        self.assertEqual(cache.pop('a'), 1)
+        self.assertEqual(cache.size, 0)
+        self.assertEqual(cache.pop('a'), None)
+
+    def test_keys(self):
+        cache = utils.LRUCache(max_size=3)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        self.assertEqual(cache.keys(), ['b', 'a'])
+
+
+class TestSingleFlight(unittest.TestCase):
+    def run_concurrent(self, group, func, count=5):
+        results = []
+
+        def worker():
+            try:
+                results.append(group.do('key', func))
+            except Exception as exp:
+                results.append(exp)
+
+        threads = [threading.Thread(target=worker) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_single_call(self):
+        group = utils.SingleFlight()
+        self.assertEqual(group.do('key', lambda: 1), (1, False))
+        self.assertEqual(group.stats, {'calls': 1, 'coalesced': 0})
+
+    def test_concurrent_calls_shared(self):
+        group = utils.SingleFlight()
+        calls = []
+
+        def func():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'result'
+
+        results = self.run_concurrent(group, func)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(r[1] for r in results), [False] + [True] * 4)
+        self.assertTrue(all(r[0] == 'result' for r in results))
+        self.assertEqual(group.stats['coalesced'], 4)
+
+    def test_concurrent_errors_shared(self):
+        group = utils.SingleFlight()
+
+        def func():
+            time.sleep(0.1)
+            raise ValueError('failed')
+
+        results = self.run_concurrent(group, func, count=3)
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(group.do('key', lambda: 1), (1, False))
@@ -12,7 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
 import sys
+import threading
 
 
 def return_colorized(msg, color):
@@ -76,3 +78,171 @@ def dict_update(base_dict, update_dict):
         base_dict.update(update_dict)
 
     return base_dict
+
+
+class LRUCache(object):
+    """A thread safe, size bounded, least recently used mapping."""
+
+    def __init__(self, max_size=128, size_func=None):
+        """Create an LRU cache.
+
+        Items are evicted, least recently used first, once the total size
+        of all items is greater than ``max_size``. By default every item has
+        a size of 1, ``size_func`` can be used to weigh items differently,
+        for example by the length of a value.
+
+        :param max_size: ``int``
+        :param size_func: ``callable`` Returns the size of a value.
+        """
+        self.max_size = max_size
+        self.size_func = size_func
+        self.size = 0
+        self.evictions = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def _weigh(self, value):
+        if self.size_func is None:
+            return 1
+        else:
+            return self.size_func(value)
+
+    def get(self, key, default=None):
+        """Return the value for ``key`` and mark it as recently used.
+
+        :param key: ``object``
+        :param default: ``object``
+        :return: ``object``
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            else:
+                self._data[key] = value
+                return value
+
+    def set(self, key, value):
+        """Store ``value`` under ``key`` evicting old items as needed.
+
+        Values larger than ``max_size`` are not stored.
+
+        :param key: ``object``
+        :param value: ``object``
+        :return: ``list`` Items evicted to make room as (key, value).
+        """
+        weight = self._weigh(value)
+        evicted = []
+        with self._lock:
+            if key in self._data:
+                self.size -= self._weigh(self._data.pop(key))
+
+            if weight > self.max_size:
+                return evicted
+
+            self._data[key] = value
+            self.size += weight
+            while self.size > self.max_size:
+                old_key, old_value = self._data.popitem(last=False)
+                self.size -= self._weigh(old_value)
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+        return evicted
+
+    def pop(self, key, default=None):
+        """Remove ``key`` and return its value.
+
+        :param key: ``object``
+        :param default: ``object``
+        :return: ``object``
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                return default
+            else:
+                self.size -= self._weigh(value)
+                return value
+
+    def keys(self):
+        """Return the keys, least recently used first.
+
+        :return: ``list``
+        """
+        with self._lock:
+            return list(self._data.keys())
+
+    def clear(self):
+        """Remove all items."""
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+
+class SingleFlight(object):
+    """Share the result of one call among concurrent callers of a key."""
+
+    def __init__(self):
+        """Create a single flight group.
+
+        While a call for a key is running, other callers asking for the same
+        key wait for it and receive its result, or its exception, instead of
+        making the call themselves.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'calls': 0,
+            'coalesced': 0
+        }
+
+    @property
+    def stats(self):
+        """Return a copy of the call counters.
+
+        :return: ``dict``
+        """
+        with self._lock:
+            return self._stats.copy()
+
+    def do(self, key, func, *args, **kwargs):
+        """Return the result of ``func`` shared with concurrent callers.
+
+        :param key: ``object``
+        :param func: ``callable``
+        :return: ``tuple`` (result, shared)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event()}
+                self._stats['calls'] += 1
+                leader = True
+            else:
+                self._stats['coalesced'] += 1
+                leader = False
+
+        if leader:
+            try:
+                call['result'] = func(*args, **kwargs)
+            except BaseException as exp:
+                call['error'] = exp
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call['done'].set()
+            return call['result'], False
+        else:
+            call['done'].wait()
+            if 'error' in call:
+                raise call['error']
+            return call['result'], True
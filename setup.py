@@ -64,6 +64,7 @@ setuptools.setup(
         'Programming Language :: Python :: 2.6',
         'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3.4',
+        'Programming Language :: Python :: 3.7',
         'Topic :: Utilities',
         'Topic :: Software Development :: Libraries :: Python Modules'
     ]